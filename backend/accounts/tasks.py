@@ -0,0 +1,48 @@
+"""Account emails, sent by ``manage.py runworker`` instead of during the request"""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from core.taskqueue import task
+from .models import EmailVerification, PasswordResetToken
+
+FRONTEND_URL = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
+
+
+@task
+def send_verification_email(verification_id):
+    verification = EmailVerification.objects.select_related('user').filter(
+        pk=verification_id, verified_at__isnull=True
+    ).first()
+    if verification is None or verification.is_expired():
+        return
+    user = verification.user
+    send_mail(
+        subject="Verify your email - Arun Cloth Shop",
+        message=(
+            f"Namaste {user.display_name},\n\n"
+            f"Please confirm your email address by opening this link:\n"
+            f"{FRONTEND_URL}/verify-email?token={verification.token}\n\n"
+            f"The link expires in 24 hours."
+        ),
+        from_email=None,
+        recipient_list=[user.email],
+    )
+
+
+@task
+def send_password_reset_email(reset_token_id):
+    reset = PasswordResetToken.objects.select_related('user').filter(
+        pk=reset_token_id, used_at__isnull=True
+    ).first()
+    if reset is None or reset.is_expired():
+        return
+    send_mail(
+        subject="Password reset - Arun Cloth Shop",
+        message=(
+            f"Namaste {reset.user.display_name},\n\n"
+            f"Use this token to reset your password: {reset.token}\n\n"
+            f"It expires in 2 hours. If you did not ask for a reset, ignore this email."
+        ),
+        from_email=None,
+        recipient_list=[reset.user.email],
+    )
@@ -11,7 +11,9 @@ import secrets
 from datetime import timedelta
 from rest_framework.parsers import MultiPartParser, FormParser
 
+from cart import anonymous as anonymous_cart
 from .models import User, UserProfile, UserAddress, EmailVerification, PasswordResetToken
+from .tasks import send_password_reset_email, send_verification_email
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     UserProfileDetailSerializer, UserAddressSerializer, UserAddressCreateSerializer,
@@ -35,6 +37,12 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 user.last_login_ip = self.get_client_ip(request)
                 user.save()
                 
+                # Move the visitor's guest cart into their cart
+                guest_lines = anonymous_cart.load(request)
+                if guest_lines:
+                    anonymous_cart.merge_into_cart(user, guest_lines)
+                    anonymous_cart.clear(response)
+                
                 # Add user data to response
                 user_data = UserProfileSerializer(user).data
                 response.data['user'] = user_data
@@ -84,15 +92,14 @@ class UserRegistrationView(generics.CreateAPIView):
         token = secrets.token_urlsafe(32)
         expires_at = timezone.now() + timedelta(hours=24)
         
-        EmailVerification.objects.create(
+        verification = EmailVerification.objects.create(
             user=user,
             token=token,
             expires_at=expires_at
         )
         
-        # TODO: Send verification email
-        # This can be implemented with Django's email system
-        print(f"Email verification token for {user.email}: {token}")
+        # Sent by the task worker, off the request path
+        send_verification_email.enqueue_on_commit(verification_id=verification.pk)
 
 
 class UserProfileViewSet(viewsets.ModelViewSet):
@@ -236,14 +243,14 @@ def forgot_password(request):
         token = secrets.token_urlsafe(32)
         expires_at = timezone.now() + timedelta(hours=2)
         
-        PasswordResetToken.objects.create(
+        reset_token = PasswordResetToken.objects.create(
             user=user,
             token=token,
             expires_at=expires_at
         )
         
-        # TODO: Send reset email
-        print(f"Password reset token for {user.email}: {token}")
+        # Sent by the task worker, off the request path
+        send_password_reset_email.enqueue_on_commit(reset_token_id=reset_token.pk)
         
         return Response({
             'message': 'पासवर्ड रिसेट लिंक इमेलमा पठाइयो।'
@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
     'orders',
     'catalog',
     'blog',
+    'core',
 ]
 
 MIDDLEWARE = [
@@ -95,6 +98,72 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per-process; point this at Redis/Memcached when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'arunbackend',
+    }
+}
+
+# Seconds each /api/home/ section stays cached (writes invalidate sooner)
+HOME_CACHE_TIMEOUT = 60 * 15
+
+# Product search logging (see products/search_analytics.py)
+SEARCH_ANALYTICS = {
+    'ENABLED': True,
+    'BUFFER_SIZE': 10000,   # entries kept in memory between flushes
+    'BATCH_SIZE': 500,      # rows per bulk insert
+    'FLUSH_INTERVAL': 5,    # seconds
+}
+
+# Seconds a cart line holds its stock before the reservation lapses (see cart/reservations.py)
+CART_RESERVATION_TTL = 60 * 30
+
+# Seconds a serialized cart stays cached for GET /api/cart/ (cart changes invalidate sooner)
+CART_CACHE_TIMEOUT = 60 * 5
+
+# Carts untouched for this many days are removed by `manage.py sweep_carts`
+CART_RETENTION_DAYS = 60
+
+# Seconds a response is replayed for retries carrying the same Idempotency-Key (see core/idempotency.py)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+# Seconds before a request that never finished (crashed worker) loses its key to a retry
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT = 60 * 2
+
+# Seconds a customer's order dashboard stats stay cached (order changes are seen at once)
+ORDER_STATS_CACHE_TIMEOUT = 60 * 10
+
+# Order lines read per query by the accounting export (see orders/exports.py)
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+# Seconds an order change waits before its day's sales rollups are recomputed (see orders/rollups.py)
+SALES_ROLLUP_DELAY = 60
+
+# Order/quote numbers each process takes from the database at a time (see core/sequences.py)
+NUMBER_SEQUENCE_BLOCK_SIZE = 20
+
+# Background tasks (see core/taskqueue.py); run them with `manage.py runworker`
+TASK_RETRY_BACKOFF = 30         # seconds before the first retry, doubling each time
+TASK_RETRY_BACKOFF_MAX = 60 * 60
+TASK_LOCK_TIMEOUT = 60 * 10     # running tasks older than this are assumed lost and queued again
+
+# Outgoing email; the console backend prints messages until SMTP is configured
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Arun Cloth Shop <noreply@arun.yougletech.com>')
+# Links in emails point here
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+
+# Price rules used by the cart, checkout and orders (see orders/pricing.py)
+PRICING = {
+    'vat_rate': '0.13',                 # 13% VAT in Nepal
+    'base_shipping': '100.00',          # NPR
+    'free_shipping_threshold': '5000.00',
+    'wholesale_free_shipping': True,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -180,6 +249,11 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    'idempotency-key',
+    'x-cart-response',
+)
 
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
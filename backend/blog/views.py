@@ -7,6 +7,8 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from core.idempotency import idempotent
+
 from .models import BlogPost, BlogCategory, BlogComment
 from .serializers import (
     BlogPostListSerializer,
@@ -109,6 +111,7 @@ class BlogPostCommentsView(generics.ListAPIView):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def add_blog_comment(request, slug):
     """Add a comment to a blog post"""
     try:
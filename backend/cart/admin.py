@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Cart, CartItem, SavedItem
+from .models import Cart, CartItem, SavedItem, StockReservation
 
 
 @admin.register(Cart)
@@ -9,6 +9,11 @@ class CartAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'updated_at')
     search_fields = ('user__email', 'user__username', 'session_id')
     readonly_fields = ('id', 'total_items', 'total_amount', 'total_wholesale_amount', 'created_at', 'updated_at')
+    list_select_related = ('user',)
+    
+    def get_queryset(self, request):
+        # Totals are computed from the prefetched items instead of per-row queries
+        return super().get_queryset(request).prefetch_related('items')
     
     def total_items(self, obj):
         return obj.total_items
@@ -57,4 +62,13 @@ class SavedItemAdmin(admin.ModelAdmin):
         if moved_count > 0:
             self.message_user(request, f"Successfully moved {moved_count} items to cart.")
     
-    move_to_cart.short_description = "Move selected items to cart"
\ No newline at end of file
+    move_to_cart.short_description = "Move selected items to cart"
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'cart', 'quantity', 'expires_at', 'updated_at')
+    list_filter = ('expires_at',)
+    search_fields = ('product__name', 'cart__user__email')
+    list_select_related = ('product', 'cart__user')
+    raw_id_fields = ('product', 'cart')
@@ -0,0 +1,117 @@
+"""
+Guest carts for anonymous visitors, kept entirely in a signed cookie.
+
+The cookie holds ``<product id hex>:<quantity>`` pairs joined by commas and
+signed with a TimestampSigner, so browsing and filling a guest cart never
+writes to the database. On login the lines are merged into the user's Cart
+through apply_batch (see merge_into_cart).
+"""
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from products.loaders import ProductLoader
+from .batch import BatchError, apply_batch
+from .models import Cart
+from .reservations import available_quantities
+
+COOKIE_NAME = getattr(settings, 'GUEST_CART_COOKIE_NAME', 'guest_cart')
+COOKIE_MAX_AGE = getattr(settings, 'GUEST_CART_MAX_AGE', 60 * 60 * 24 * 30)
+# ~40 bytes per line keeps the cookie well under the 4KB browser limit
+MAX_LINES = 80
+
+_signer = signing.TimestampSigner(salt='cart.anonymous')
+
+
+def encode(lines):
+    """``{UUID: qty}`` -> ``'hex:qty,hex:qty'``"""
+    return ','.join(f'{product_id.hex}:{quantity}' for product_id, quantity in lines.items())
+
+
+def decode(value):
+    """Inverse of encode(); malformed pairs are skipped"""
+    lines = {}
+    for pair in value.split(','):
+        product_id, _, quantity = pair.partition(':')
+        try:
+            product_id, quantity = uuid.UUID(product_id), int(quantity)
+        except ValueError:
+            continue
+        if quantity > 0:
+            lines[product_id] = quantity
+    return lines
+
+
+def load(request):
+    """Return the guest cart of ``request`` as ``{product UUID: quantity}``"""
+    value = request.COOKIES.get(COOKIE_NAME)
+    if not value:
+        return {}
+    try:
+        return decode(_signer.unsign(value, max_age=COOKIE_MAX_AGE))
+    except signing.BadSignature:
+        return {}
+
+
+def store(response, lines):
+    """Write ``lines`` to the guest cart cookie, or drop the cookie when empty"""
+    if not lines:
+        clear(response)
+        return
+    if len(lines) > MAX_LINES:
+        raise ValueError(f"A guest cart holds at most {MAX_LINES} lines")
+    response.set_cookie(
+        COOKIE_NAME,
+        _signer.sign(encode(lines)),
+        max_age=COOKIE_MAX_AGE,
+        httponly=True,
+        secure=not settings.DEBUG,
+        samesite='Lax',
+    )
+
+
+def clear(response):
+    response.delete_cookie(COOKIE_NAME, samesite='Lax')
+
+
+def merge_into_cart(user, lines, loader=None, attempts=3):
+    """
+    Add guest cart ``lines`` to ``user``'s cart through apply_batch, so the
+    merge is one transaction that reserves the stock and bumps line and cart
+    versions like any other cart write. Quantities of products already in
+    the cart are summed and capped at the stock not held by other carts;
+    unavailable products and lines that cannot reach the minimum order
+    quantity are dropped. If another cart reserves the same stock in
+    between, the merge is recomputed, up to ``attempts`` times. Returns the
+    number of lines merged.
+    """
+    if not lines:
+        return 0
+    loader = loader or ProductLoader()
+    products = loader.get_many(lines)
+    cart, _ = Cart.objects.get_or_create(user=user)
+
+    for attempt in range(attempts):
+        with transaction.atomic():
+            current = dict(
+                cart.items.select_for_update().filter(product_id__in=products).values_list('product_id', 'quantity')
+            )
+            available = available_quantities(products.values(), exclude_cart=cart)
+            operations = []
+            for product_id, product in products.items():
+                if not product.is_available:
+                    continue
+                quantity = min(current.get(product_id, 0) + lines[product_id], available[product_id])
+                if quantity < product.minimum_order_quantity or quantity <= current.get(product_id, 0):
+                    continue
+                operations.append({
+                    'op': 'add', 'product_id': product_id, 'quantity': quantity - current.get(product_id, 0),
+                })
+            try:
+                apply_batch(cart, operations, loader=loader)
+            except BatchError:
+                continue
+            return len(operations)
+    return 0
@@ -0,0 +1,226 @@
+"""
+Batch cart operations for /api/cart/batch/ and moving saved items in bulk.
+
+All operations of a batch are resolved in memory against the cart's current
+lines, validated together against one load of the referenced products, and
+written with at most one bulk_create, one bulk_update and one delete inside
+a single transaction. Either every operation applies or none does.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products.loaders import ProductLoader
+from .models import Cart, CartItem, SavedItem
+from .reservations import InsufficientStock, available_quantities, release, reserve
+
+
+class BatchError(ValueError):
+    """Raised with a list of ``{'index': ..., 'error': ...}`` when a batch is rejected"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(errors[0]['error'] if errors else '')
+
+
+def apply_batch(cart, operations, loader=None, expected_version=None):
+    """
+    Apply validated CartOperationSerializer data to ``cart``.
+
+    ``add`` increases the quantity of an existing line (or creates it),
+    ``update`` sets quantity/colors/instructions and ``remove`` deletes the
+    line. Lines are addressed by ``item_id`` or ``product_id``. Products are
+    resolved through ``loader`` (a ProductLoader). With ``expected_version``
+    the batch only applies if the cart is still at that version (see
+    Cart.touch). Returns a dict with the number of created, updated and
+    removed lines.
+    """
+    loader = loader or ProductLoader()
+    with transaction.atomic():
+        lines = {item.product_id: item for item in cart.items.select_for_update()}
+        lines_by_id = {item.id: item for item in lines.values()}
+
+        product_ids = set(lines)
+        product_ids.update(op['product_id'] for op in operations if 'product_id' in op)
+        products = loader.get_many(product_ids)
+
+        # Resolve every operation to the final state of each product's line
+        errors = []
+        final = {}
+        last_op = {}
+        for index, op in enumerate(operations):
+            if 'item_id' in op:
+                line = lines_by_id.get(op['item_id'])
+                if line is None:
+                    errors.append({'index': index, 'error': 'कार्ट आइटम फेला परेन।'})
+                    continue
+                product_id = line.product_id
+            else:
+                product_id = op['product_id']
+
+            product = products.get(product_id)
+            if product is None or (op['op'] == 'add' and not product.is_available):
+                errors.append({'index': index, 'error': 'उत्पादन फेला परेन वा उपलब्ध छैन।'})
+                continue
+
+            if product_id in final:
+                state = final[product_id]
+            elif product_id in lines:
+                line = lines[product_id]
+                state = {
+                    'quantity': line.quantity,
+                    'preferred_colors': line.preferred_colors,
+                    'special_instructions': line.special_instructions,
+                }
+            else:
+                state = None
+
+            if op['op'] == 'remove':
+                if state is None:
+                    errors.append({'index': index, 'error': 'कार्ट आइटम फेला परेन।'})
+                    continue
+                final[product_id] = None
+            elif op['op'] == 'update':
+                if state is None:
+                    errors.append({'index': index, 'error': 'कार्ट आइटम फेला परेन।'})
+                    continue
+                final[product_id] = {
+                    'quantity': op['quantity'],
+                    'preferred_colors': op.get('preferred_colors', state['preferred_colors']),
+                    'special_instructions': op.get('special_instructions', state['special_instructions']),
+                }
+            else:
+                if state is None:
+                    state = {'quantity': 0, 'preferred_colors': '', 'special_instructions': ''}
+                final[product_id] = {
+                    'quantity': state['quantity'] + op['quantity'],
+                    'preferred_colors': op.get('preferred_colors', state['preferred_colors']),
+                    'special_instructions': op.get('special_instructions', state['special_instructions']),
+                }
+            last_op[product_id] = index
+
+        # Stock and minimum order quantity are checked on the final quantities
+        for product_id, state in final.items():
+            if state is None:
+                continue
+            product = products[product_id]
+            quantity = state['quantity']
+            if quantity > product.stock_quantity:
+                errors.append({
+                    'index': last_op[product_id],
+                    'error': f'कुल मात्रा ({quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।',
+                })
+            elif quantity < product.minimum_order_quantity:
+                errors.append({
+                    'index': last_op[product_id],
+                    'error': f'मात्रा ({quantity}) न्यूनतम अर्डर मात्रा ({product.minimum_order_quantity}) भन्दा कम छ।',
+                })
+
+        if errors:
+            raise BatchError(sorted(errors, key=lambda error: error['index']))
+
+        try:
+            reserve(cart, {product_id: state['quantity'] for product_id, state in final.items() if state})
+        except InsufficientStock as e:
+            raise BatchError([{'index': last_op[e.product_id], 'error': str(e)}])
+
+        now = timezone.now()
+        to_create, to_update, to_delete = [], [], []
+        for product_id, state in final.items():
+            line = lines.get(product_id)
+            if state is None:
+                to_delete.append(line.pk)
+            elif line is None:
+                product = products[product_id]
+                to_create.append(CartItem(
+                    cart=cart,
+                    product=product,
+                    unit_price=product.price_per_meter,
+                    wholesale_price=product.wholesale_price,
+                    **state,
+                ))
+            else:
+                for field, value in state.items():
+                    setattr(line, field, value)
+                line.version += 1
+                line.updated_at = now
+                to_update.append(line)
+
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(
+                to_update, ['quantity', 'preferred_colors', 'special_instructions', 'version', 'updated_at']
+            )
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+            release(cart, [product_id for product_id, state in final.items() if state is None])
+        if final:
+            cart.touch(expected_version)
+
+    return {'created': len(to_create), 'updated': len(to_update), 'removed': len(to_delete)}
+
+
+def move_saved_items(user, saved_items):
+    """
+    Move ``saved_items`` (a queryset of the user's SavedItems) into the user's
+    cart with one upsert, one version bump and one delete in a single
+    transaction. Quantities of products already in the cart, whose lines are
+    locked while they are read, are added together. Items that are
+    unavailable, short of stock (counting other carts' reservations) or
+    below the minimum order quantity stay saved and are returned in
+    ``skipped`` with the reason.
+    """
+    with transaction.atomic():
+        saved = list(saved_items.select_related('product'))
+        if not saved:
+            return {'moved': 0, 'skipped': []}
+
+        cart, _ = Cart.objects.get_or_create(user=user)
+        products = {item.product_id: item.product for item in saved}
+        existing = dict(
+            cart.items.select_for_update().filter(product_id__in=products).values_list('product_id', 'quantity')
+        )
+        available = available_quantities(products.values(), exclude_cart=cart)
+
+        moving, skipped = [], []
+        for item in saved:
+            product = item.product
+            quantity = existing.get(product.pk, 0) + item.quantity
+            if not product.is_available:
+                error = 'उत्पादन फेला परेन वा उपलब्ध छैन।'
+            elif quantity > available[product.pk]:
+                error = f'कुल मात्रा ({quantity}) उपलब्ध मात्रा ({max(available[product.pk], 0)}) भन्दा बढी छ।'
+            elif quantity < product.minimum_order_quantity:
+                error = f'मात्रा ({quantity}) न्यूनतम अर्डर मात्रा ({product.minimum_order_quantity}) भन्दा कम छ।'
+            else:
+                moving.append((item, quantity))
+                continue
+            skipped.append({'id': str(item.pk), 'product_id': str(product.pk), 'error': error})
+
+        if moving:
+            reserve(cart, {item.product_id: quantity for item, quantity in moving})
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart=cart,
+                        product=item.product,
+                        quantity=quantity,
+                        unit_price=item.product.price_per_meter,
+                        wholesale_price=item.product.wholesale_price,
+                        special_instructions=item.notes,
+                    )
+                    for item, quantity in moving
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity', 'updated_at'],
+            )
+            # The upsert cannot take expressions, so lines that already existed are bumped in place
+            merged = [item.product_id for item, _ in moving if item.product_id in existing]
+            if merged:
+                cart.items.filter(product_id__in=merged).update(version=F('version') + 1)
+            SavedItem.objects.filter(pk__in=[item.pk for item, _ in moving]).delete()
+            cart.touch()
+
+    return {'moved': len(moving), 'skipped': skipped}
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from cart.sweeper import CART_RETENTION_DAYS, sweep_carts
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete carts and anonymous cart sessions untouched for --days days, in small "
+        "transactions. Schedule it daily, e.g. from cron: "
+        "'30 3 * * * python manage.py sweep_carts --days 60'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=CART_RETENTION_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between chunks, to let other writers in")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+
+    def handle(self, *args, **options):
+        counts = sweep_carts(
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            pause=options['pause'],
+        )
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{verb} {count} {label} rows")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(counts.values())} rows in total"))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Incremented on every change to the items"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0003_stock_reservation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                fields=["updated_at"], name="cart_cart_updated_c46eb6_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cartsession",
+            index=models.Index(
+                fields=["updated_at"], name="cart_cartse_updated_1f96da_idx"
+            ),
+        ),
+    ]
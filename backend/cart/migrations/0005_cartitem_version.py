@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0004_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Incremented on every change to the line"
+            ),
+        ),
+    ]
@@ -1,38 +1,161 @@
+from dataclasses import dataclass
+from decimal import Decimal
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, prefetch_related_objects
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from products.models import Product
 import uuid
 
 User = get_user_model()
 
 
+@dataclass(frozen=True)
+class CartTotals:
+    """
+    Quantity and amount totals of a cart, computed in a single pass. The
+    amounts of an empty cart are the int 0, rendered as "0" by the API as
+    they always have been; any other cart's are Decimals to the paisa.
+    """
+    total_items: int = 0
+    total_amount: Decimal | int = 0
+    total_wholesale_amount: Decimal | int = 0
+
+
+def _line_total(price_field):
+    return ExpressionWrapper(
+        F(price_field) * F('quantity'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def cart_items_queryset():
+    """CartItems with everything CartItemSerializer reads already loaded"""
+    return CartItem.objects.select_related('product__category').prefetch_related(
+        'product__images'
+    ).order_by('created_at')
+
+
+def cart_items_prefetch():
+    """
+    Prefetch plan for serializing a cart: items with their product and
+    category joined, plus the products' images for main_image. Three queries
+    in total, however many lines the cart has.
+    """
+    return Prefetch('items', queryset=cart_items_queryset())
+
+
+class VersionConflict(Exception):
+    """A compare-and-swap found the row at another version than expected"""
+
+
+class CartQuerySet(models.QuerySet):
+    def with_items(self):
+        return self.prefetch_related(cart_items_prefetch())
+
+
 class Cart(models.Model):
     """Shopping cart for users"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     session_id = models.CharField(max_length=100, null=True, blank=True, 
                                 help_text="For anonymous users")
+    version = models.PositiveIntegerField(default=0, help_text="Incremented on every change to the items")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # sweep_carts scans by age
+            models.Index(fields=['updated_at']),
+        ]
+
     def __str__(self):
         return f"Cart for {self.user.email if self.user else self.session_id}"
 
+    def prefetch_items(self):
+        """(Re)load this cart's items using the cart_items_prefetch() plan"""
+        self.invalidate_totals()
+        getattr(self, '_prefetched_objects_cache', {}).pop('items', None)
+        prefetch_related_objects([self], cart_items_prefetch())
+        return self
+
+    @property
+    def totals(self):
+        """
+        CartTotals for this cart, memoized on the instance. Uses prefetched
+        items when present, otherwise one aggregate query.
+        """
+        totals = self.__dict__.get('_totals')
+        if totals is None:
+            totals = self._totals = self._compute_totals()
+        return totals
+
+    def _compute_totals(self):
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('items')
+        if prefetched is not None:
+            items = list(prefetched)
+            return CartTotals(
+                total_items=sum(item.quantity for item in items),
+                total_amount=sum(item.total_price for item in items),
+                total_wholesale_amount=sum(item.wholesale_total_price for item in items),
+            )
+
+        result = self.items.aggregate(
+            total_items=Sum('quantity'),
+            total_amount=Sum(_line_total('unit_price')),
+            total_wholesale_amount=Sum(_line_total('wholesale_price')),
+        )
+        if not result['total_items']:
+            return CartTotals()
+        cents = Decimal('0.01')
+        return CartTotals(
+            total_items=result['total_items'],
+            total_amount=Decimal(result['total_amount']).quantize(cents),
+            total_wholesale_amount=Decimal(result['total_wholesale_amount']).quantize(cents),
+        )
+
+    def invalidate_totals(self):
+        """Forget memoized totals after the cart's items change"""
+        self.__dict__.pop('_totals', None)
+
+    def touch(self, expected_version=None):
+        """
+        Record a change to the cart's items: bump the version (atomically, so
+        concurrent writers never share one), refresh updated_at and drop
+        memoized totals. Clients compare versions to detect missed changes.
+
+        With ``expected_version`` the bump is a compare-and-swap and raises
+        VersionConflict if the cart has moved on; call it inside the
+        transaction that changed the items so they roll back with it.
+        """
+        carts = Cart.objects.filter(pk=self.pk)
+        if expected_version is not None:
+            carts = carts.filter(version=expected_version)
+        if not carts.update(version=F('version') + 1, updated_at=timezone.now()):
+            raise VersionConflict
+        self.refresh_from_db(fields=['version', 'updated_at'])
+        self.invalidate_totals()
+
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals.total_items
 
     @property
     def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.totals.total_amount
 
     @property
     def total_wholesale_amount(self):
-        return sum(item.wholesale_total_price for item in self.items.all())
+        return self.totals.total_wholesale_amount
 
     def clear(self):
         """Remove all items from cart"""
         self.items.all().delete()
+        self.reservations.all().delete()
+        self.touch()
 
 
 class CartItem(models.Model):
@@ -41,6 +164,7 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    version = models.PositiveIntegerField(default=0, help_text="Incremented on every change to the line")
     
     # Store price at the time of adding to cart
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -85,6 +209,25 @@ class CartItem(models.Model):
         
         super().save(*args, **kwargs)
 
+    def compare_and_swap(self, expected_version, **changes):
+        """
+        ``UPDATE ... WHERE version = expected_version`` setting ``changes`` and
+        bumping the version. Returns False, leaving the instance untouched, if
+        another request changed the line first. Callers validate ``changes``;
+        save()'s checks do not run.
+        """
+        now = timezone.now()
+        updated = CartItem.objects.filter(pk=self.pk, version=expected_version).update(
+            version=F('version') + 1, updated_at=now, **changes
+        )
+        if not updated:
+            return False
+        for field, value in changes.items():
+            setattr(self, field, value)
+        self.version = expected_version + 1
+        self.updated_at = now
+        return True
+
 
 class SavedItem(models.Model):
     """Items saved for later (wishlist)"""
@@ -102,28 +245,41 @@ class SavedItem(models.Model):
         return f"Saved: {self.product.name} by {self.user.email}"
 
     def move_to_cart(self):
-        """Move this saved item to the user's cart"""
-        cart, created = Cart.objects.get_or_create(user=self.user)
-        
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=self.product,
-            defaults={
-                'quantity': self.quantity,
-                'unit_price': self.product.price_per_meter,
-                'wholesale_price': self.product.wholesale_price,
-            }
-        )
-        
-        if not created:
-            # If item already in cart, increase quantity
-            cart_item.quantity += self.quantity
-            cart_item.save()
-        
-        # Remove from saved items
-        self.delete()
-        
-        return cart_item
+        """
+        Move this saved item to the user's cart through move_saved_items, so
+        the stock is reserved and the line's version bumped like any other
+        cart write. Raises ValueError if it cannot be moved.
+        """
+        from .batch import move_saved_items
+
+        result = move_saved_items(self.user, SavedItem.objects.filter(pk=self.pk))
+        if result['skipped']:
+            raise ValueError(result['skipped'][0]['error'])
+        return CartItem.objects.get(cart__user_id=self.user_id, product_id=self.product_id)
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for a cart line until ``expires_at``. Available stock is
+    ``stock_quantity`` minus the unexpired reservations of other carts (see
+    cart/reservations.py); expired rows are deleted by release_reservations.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['cart', 'product']
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} for cart {self.cart_id} until {self.expires_at}"
 
 
 class CartSession(models.Model):
@@ -137,4 +293,7 @@ class CartSession(models.Model):
         return f"Anonymous cart session: {self.session_key}"
     
     class Meta:
-        ordering = ['-updated_at']
\ No newline at end of file
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
\ No newline at end of file
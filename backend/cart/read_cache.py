@@ -0,0 +1,39 @@
+"""
+Cache of the serialized cart served by GET /api/cart/.
+
+The version token is the cart row's own ``version`` column, bumped by
+Cart.touch() in the same transaction as every change to the items, so
+every worker compares against the database and none can serve a cart
+another worker has changed, whatever cache backend is configured. A read
+costs the one-row cart lookup and a cache get; the items, products and
+images are only loaded when the cached payload is missing or was built
+from an older version. The payload is stored as ``(version, data)`` per
+cart, audience (prices are staff-only) and request host (the data carries
+absolute image URLs). A payload built while a write commits is stored
+under the version read before building, so it is replaced on the next
+read. A deleted cart's payloads are never read again, as a new cart has a
+new id, and expire after CART_CACHE_TIMEOUT.
+
+Product edits do not bump carts; CART_CACHE_TIMEOUT bounds how long a cart
+can show an outdated product name, price or stock.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+CART_CACHE_TIMEOUT = getattr(settings, 'CART_CACHE_TIMEOUT', 60 * 5)
+
+
+def _payload_key(cart_id, audience, host):
+    return f"cart:{cart_id}:{audience}:{host}"
+
+
+def get_or_build(cart, audience, host, build):
+    """Return the cached data of ``cart`` for ``audience`` and ``host``, calling ``build()`` if it is stale"""
+    payload_key = _payload_key(cart.pk, audience, host)
+    payload = cache.get(payload_key)
+    if payload is not None and payload[0] == cart.version:
+        return payload[1]
+
+    data = build()
+    cache.set(payload_key, (cart.version, data), CART_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,104 @@
+"""
+Time-limited stock reservations for cart lines.
+
+Adding or changing a cart line reserves its quantity for
+CART_RESERVATION_TTL seconds. The check-and-reserve step briefly locks the
+product rows (in primary key order, so concurrent carts cannot deadlock),
+sums the other carts' unexpired reservations with one indexed aggregate and
+upserts this cart's reservations. No lock outlives that transaction: the
+reservation row itself is what holds the stock while the customer shops.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockReservation
+
+RESERVATION_TTL = getattr(settings, 'CART_RESERVATION_TTL', 60 * 30)
+
+
+class InsufficientStock(ValueError):
+    """A reservation would exceed the stock not held by other carts"""
+
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f'मात्रा ({requested}) उपलब्ध मात्रा ({max(available, 0)}) भन्दा बढी छ।')
+
+
+def reserved_quantities(product_ids, exclude_cart=None):
+    """``{product_id: quantity}`` held by unexpired reservations, in one GROUP BY"""
+    reservations = StockReservation.objects.filter(
+        product_id__in=product_ids, expires_at__gt=timezone.now()
+    )
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart=exclude_cart)
+    return dict(
+        reservations.values('product_id').annotate(reserved=Sum('quantity')).values_list('product_id', 'reserved')
+    )
+
+
+def available_quantities(products, exclude_cart=None):
+    """``{product_id: stock minus other carts' active reservations}`` for ``products``"""
+    reserved = reserved_quantities([product.pk for product in products], exclude_cart=exclude_cart)
+    return {product.pk: product.stock_quantity - reserved.get(product.pk, 0) for product in products}
+
+
+def reserve(cart, quantities):
+    """
+    Reserve ``{product_id: quantity}`` for ``cart``, replacing its previous
+    reservations of those products and extending their expiry. Raises
+    InsufficientStock (and reserves nothing) if any product falls short.
+    """
+    if not quantities:
+        return
+    product_ids = sorted(quantities)
+    with transaction.atomic():
+        stock = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values_list('pk', 'stock_quantity')
+        )
+        reserved = reserved_quantities(product_ids, exclude_cart=cart)
+        for product_id in product_ids:
+            available = stock.get(product_id, 0) - reserved.get(product_id, 0)
+            if quantities[product_id] > available:
+                raise InsufficientStock(product_id, quantities[product_id], available)
+
+        expires_at = timezone.now() + timedelta(seconds=RESERVATION_TTL)
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(cart=cart, product_id=product_id, quantity=quantities[product_id], expires_at=expires_at)
+                for product_id in product_ids
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'expires_at', 'updated_at'],
+        )
+
+
+def release(cart, product_ids=None):
+    """Drop ``cart``'s reservations, or only those of ``product_ids``"""
+    reservations = StockReservation.objects.filter(cart=cart)
+    if product_ids is not None:
+        reservations = reservations.filter(product_id__in=product_ids)
+    return reservations.delete()[0]
+
+
+def release_expired(batch_size=1000):
+    """Delete lapsed reservations in batches of ``batch_size``; returns the number deleted"""
+    released = 0
+    now = timezone.now()
+    while True:
+        batch = list(
+            StockReservation.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return released
+        released += StockReservation.objects.filter(pk__in=batch).delete()[0]
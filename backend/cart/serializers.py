@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, SavedItem
+from products.loaders import get_product_loader
 from products.serializers import ProductListSerializer
 from decimal import Decimal
 
@@ -18,9 +19,9 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'product', 'product_id', 'quantity', 'unit_price', 'wholesale_price',
             'total_price', 'wholesale_total_price', 'preferred_colors',
-            'special_instructions', 'created_at', 'updated_at'
+            'special_instructions', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
 
     def _is_staff(self):
         request = self.context.get('request')
@@ -48,29 +49,26 @@ class CartItemSerializer(serializers.ModelSerializer):
         quantity = attrs.get('quantity')
 
         if product_id and quantity:
-            from products.models import Product
-            try:
-                product = Product.objects.get(id=product_id)
-
-                if quantity > product.stock_quantity:
-                    raise serializers.ValidationError(
-                        f"मात्रा ({quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।"
-                    )
+            product = get_product_loader(self.context.get('request')).get(product_id)
+            if product is None:
+                raise serializers.ValidationError("उत्पादन फेला परेन।")
 
-                if quantity < product.minimum_order_quantity:
-                    raise serializers.ValidationError(
-                        f"मात्रा ({quantity}) न्यूनतम अर्डर मात्रा ({product.minimum_order_quantity}) भन्दा कम छ।"
-                    )
+            if quantity > product.stock_quantity:
+                raise serializers.ValidationError(
+                    f"मात्रा ({quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।"
+                )
 
-            except Product.DoesNotExist:
-                raise serializers.ValidationError("उत्पादन फेला परेन।")
+            if quantity < product.minimum_order_quantity:
+                raise serializers.ValidationError(
+                    f"मात्रा ({quantity}) न्यूनतम अर्डर मात्रा ({product.minimum_order_quantity}) भन्दा कम छ।"
+                )
 
         return attrs
 
 
 class CartSerializer(serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
-    total_items = serializers.IntegerField(read_only=True)
+    total_items = serializers.IntegerField(source='totals.total_items', read_only=True)
     total_amount = serializers.SerializerMethodField()
     total_wholesale_amount = serializers.SerializerMethodField()
 
@@ -78,9 +76,9 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = [
             'id', 'items', 'total_items', 'total_amount', 'total_wholesale_amount',
-            'created_at', 'updated_at'
+            'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
 
     def _is_staff(self):
         request = self.context.get('request')
@@ -90,10 +88,17 @@ class CartSerializer(serializers.ModelSerializer):
         return CartItemSerializer(obj.items.all(), many=True, context=self.context).data
 
     def get_total_amount(self, obj):
-        return str(obj.total_amount) if self._is_staff() else None
+        return str(obj.totals.total_amount) if self._is_staff() else None
 
     def get_total_wholesale_amount(self, obj):
-        return str(obj.total_wholesale_amount) if self._is_staff() else None
+        return str(obj.totals.total_wholesale_amount) if self._is_staff() else None
+
+
+class CartDeltaSerializer(CartSerializer):
+    """The parts of a cart that change with every mutation: totals and version"""
+
+    class Meta(CartSerializer.Meta):
+        fields = ['id', 'total_items', 'total_amount', 'total_wholesale_amount', 'version', 'updated_at']
 
 
 class AddToCartSerializer(serializers.Serializer):
@@ -101,21 +106,20 @@ class AddToCartSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1)
     preferred_colors = serializers.CharField(max_length=200, required=False, allow_blank=True)
     special_instructions = serializers.CharField(required=False, allow_blank=True)
+    # Cart version the client last saw; the change is rejected if the cart has moved on
+    cart_version = serializers.IntegerField(min_value=0, required=False)
 
     def validate_product_id(self, value):
-        from products.models import Product
-        try:
-            product = Product.objects.get(id=value, is_available=True)
-            return value
-        except Product.DoesNotExist:
+        product = get_product_loader(self.context.get('request')).get(value)
+        if product is None or not product.is_available:
             raise serializers.ValidationError("उत्पादन फेला परेन वा उपलब्ध छैन।")
+        return value
 
     def validate(self, attrs):
-        from products.models import Product
         product_id = attrs['product_id']
         quantity = attrs['quantity']
 
-        product = Product.objects.get(id=product_id)
+        product = get_product_loader(self.context.get('request')).get(product_id)
 
         if quantity > product.stock_quantity:
             raise serializers.ValidationError(
@@ -130,12 +134,51 @@ class AddToCartSerializer(serializers.Serializer):
         return attrs
 
 
-class UpdateCartItemSerializer(serializers.Serializer):
+class CartVersionSerializer(serializers.Serializer):
+    """Versions the client last saw of a cart line and of the cart; a write is rejected if either moved on"""
+    version = serializers.IntegerField(min_value=0, required=False)
+    cart_version = serializers.IntegerField(min_value=0, required=False)
+
+
+class UpdateCartItemSerializer(CartVersionSerializer):
     quantity = serializers.IntegerField(min_value=1)
     preferred_colors = serializers.CharField(max_length=200, required=False, allow_blank=True)
     special_instructions = serializers.CharField(required=False, allow_blank=True)
 
 
+class CartOperationSerializer(serializers.Serializer):
+    """One operation of a batch: add to, update or remove a cart line"""
+    OPERATION_CHOICES = ['add', 'update', 'remove']
+
+    op = serializers.ChoiceField(choices=OPERATION_CHOICES)
+    product_id = serializers.UUIDField(required=False)
+    item_id = serializers.UUIDField(required=False)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    preferred_colors = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    special_instructions = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and 'product_id' not in attrs:
+            raise serializers.ValidationError("उत्पादन ID आवश्यक छ।")
+        if attrs['op'] != 'add' and 'product_id' not in attrs and 'item_id' not in attrs:
+            raise serializers.ValidationError("आइटम ID वा उत्पादन ID आवश्यक छ।")
+        if attrs['op'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError("मात्रा आवश्यक छ।")
+        return attrs
+
+
+class BatchCartSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 200
+
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+    cart_version = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_operations(self, value):
+        if len(value) > self.MAX_OPERATIONS:
+            raise serializers.ValidationError(f"एक पटकमा बढीमा {self.MAX_OPERATIONS} वटा अपरेसन मात्र।")
+        return value
+
+
 class SavedItemSerializer(serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     product_id = serializers.UUIDField(write_only=True)
@@ -148,12 +191,10 @@ class SavedItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
     def validate_product_id(self, value):
-        from products.models import Product
-        try:
-            Product.objects.get(id=value, is_available=True)
-            return value
-        except Product.DoesNotExist:
+        product = get_product_loader(self.context.get('request')).get(value)
+        if product is None or not product.is_available:
             raise serializers.ValidationError("उत्पादन फेला परेन वा उपलब्ध छैन।")
+        return value
 
 
 class MoveToCartSerializer(serializers.Serializer):
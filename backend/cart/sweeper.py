@@ -0,0 +1,71 @@
+"""
+Removal of abandoned carts and stale anonymous cart sessions.
+
+Rows are picked by the indexed ``updated_at`` column and deleted in chunks,
+each in its own short transaction, so other writers are never blocked for
+long (on SQLite a write transaction locks the whole database). Carts still
+holding an unexpired stock reservation are kept whatever their age.
+
+Abandoned carts are deleted, not archived: a cart carries nothing an order
+does not, and a returning user simply gets a fresh, empty cart (which the
+cart cache, keyed by cart id, never confuses with the old one). Deleting a
+cart also removes its items and expired reservations with one DELETE each
+per chunk, so the work per transaction stays bounded by ``chunk_size``.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem, CartSession, StockReservation
+
+CART_RETENTION_DAYS = getattr(settings, 'CART_RETENTION_DAYS', 60)
+
+
+def _delete_in_chunks(queryset, chunk_size, pause, counts):
+    """Delete ``queryset`` ``chunk_size`` rows per transaction, adding per-model counts to ``counts``"""
+    while True:
+        chunk = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return
+        with transaction.atomic():
+            # Filtering again keeps rows that were touched since they were picked
+            _, deleted = queryset.filter(pk__in=chunk).delete()
+        for label, count in deleted.items():
+            counts[label] = counts.get(label, 0) + count
+        if pause:
+            time.sleep(pause)
+
+
+def sweep_carts(days=CART_RETENTION_DAYS, chunk_size=500, dry_run=False, pause=0):
+    """
+    Delete carts and cart sessions not updated for ``days`` days, except
+    carts with an unexpired reservation, sleeping ``pause`` seconds between
+    chunks.
+
+    Returns the number of rows removed per model label (``cart.Cart``,
+    ``cart.CartItem``, ...). With ``dry_run`` nothing is deleted and the
+    counts are what would have been removed.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    carts = (
+        Cart.objects.filter(updated_at__lt=cutoff)
+        .exclude(reservations__expires_at__gt=timezone.now())
+        .order_by()
+    )
+    sessions = CartSession.objects.filter(updated_at__lt=cutoff).order_by()
+
+    if dry_run:
+        return {
+            'cart.Cart': carts.count(),
+            'cart.CartItem': CartItem.objects.filter(cart__in=carts).count(),
+            'cart.StockReservation': StockReservation.objects.filter(cart__in=carts).count(),
+            'cart.CartSession': sessions.count(),
+        }
+
+    counts = {}
+    _delete_in_chunks(carts, chunk_size, pause, counts)
+    _delete_in_chunks(sessions, chunk_size, pause, counts)
+    return counts
@@ -1,3 +1,549 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductImage
+from . import anonymous, reservations, sweeper
+from .models import Cart, CartItem, SavedItem, StockReservation
+
+
+class CartTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='buyer@example.com', username='buyer', password='secret',
+            first_name='Test', last_name='Buyer',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Silk')
+        cache.clear()
+
+    def create_product(self, index, **fields):
+        defaults = dict(
+            name=f'Fabric {index}', slug=f'fabric-{index}', description='Fabric',
+            category=self.category, material='silk', gsm=120, width='44',
+            colors_available='red', primary_color='red', usage='saree',
+            price_per_meter=Decimal('500.00'), wholesale_price=Decimal('450.00'),
+            stock_quantity=100,
+        )
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+    def add_lines(self, count):
+        start = self.cart.items.count()
+        for i in range(start, start + count):
+            product = self.create_product(i)
+            ProductImage.objects.create(product=product, image=f'products/fabric-{i}.jpg', is_primary=True)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cart.touch()
+
+    def get_cart_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+
+class CartQueryCountTests(CartTestCase):
+    """Serializing a cart must not issue queries per line"""
+
+    def test_cart_query_count_is_flat(self):
+        self.add_lines(1)
+        single_line_queries, data = self.get_cart_queries()
+        self.assertEqual(len(data['items']), 1)
+
+        self.add_lines(29)
+        many_line_queries, data = self.get_cart_queries()
+        self.assertEqual(len(data['items']), 30)
+        self.assertEqual(data['total_items'], 60)
+        self.assertTrue(data['items'][0]['product']['main_image'].endswith('fabric-0.jpg'))
+
+        self.assertEqual(single_line_queries, many_line_queries)
+
+    def test_mutation_response_query_count_is_flat(self):
+        self.add_lines(30)
+        item = self.cart.items.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                '/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 3}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 15)
+
+
+class CartProductLoadTests(CartTestCase):
+    """Cart mutations read each product once per request, through the request's ProductLoader"""
+
+    def product_loads(self, queries):
+        # Product rows read on their own; the stock lock of cart/reservations.py reads only id and stock
+        return [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT "products_product"."id", "products_product"."name"')
+        ]
+
+    def add_item(self, product):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/cart/add_item/', {'product_id': str(product.id), 'quantity': 2}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        return queries
+
+    def test_add_item_loads_the_product_once(self):
+        product = self.create_product(0)
+        with self.assertNumQueries(17):
+            queries = self.add_item(product)
+        self.assertEqual(len(self.product_loads(queries)), 1)
+
+        # Adding to the existing line skips creating it
+        with self.assertNumQueries(15):
+            queries = self.add_item(product)
+        self.assertEqual(len(self.product_loads(queries)), 1)
+
+    def test_update_item_takes_the_product_from_the_line(self):
+        product = self.create_product(0)
+        item = CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        with self.assertNumQueries(14):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.put(
+                    '/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 5}, format='json'
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.product_loads(queries), [])
+
+
+class CartReadCacheTests(CartTestCase):
+    """GET /api/cart/ is served from cache until the cart changes"""
+
+    def test_repeated_reads_only_read_the_cart_row(self):
+        self.add_lines(3)
+        _, first = self.get_cart_queries()
+        queries, data = self.get_cart_queries()
+        self.assertEqual(queries, 1)
+        self.assertEqual(data, first)
+
+    def test_writes_by_other_workers_are_seen(self):
+        # Another process changes the cart without going through this cache
+        self.add_lines(2)
+        self.get_cart_queries()
+        CartItem.objects.filter(cart=self.cart).update(quantity=4)
+        Cart.objects.filter(pk=self.cart.pk).update(version=F('version') + 1)
+        _, data = self.get_cart_queries()
+        self.assertEqual(data['total_items'], 8)
+
+        self.cart.delete()
+        _, data = self.get_cart_queries()
+        self.assertEqual(data['items'], [])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'shop.example.com'])
+    def test_payloads_are_kept_per_host(self):
+        self.add_lines(1)
+        self.get_cart_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/cart/', HTTP_HOST='shop.example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 1)
+
+    def test_mutation_invalidates_cached_cart(self):
+        self.add_lines(2)
+        self.get_cart_queries()
+        item = self.cart.items.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                '/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 5}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        _, data = self.get_cart_queries()
+        self.assertEqual(data['total_items'], 7)
+
+
+class CartVersionTests(CartTestCase):
+    """Writes are compare-and-swaps on the line and cart versions"""
+
+    def test_stale_line_version_is_rejected_with_current_state(self):
+        self.add_lines(1)
+        item = self.cart.items.get()
+        response = self.client.put(
+            '/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 5, 'version': item.version}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # A second tab still holding the old version
+        response = self.client.put(
+            '/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 9, 'version': item.version}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['item']['quantity'], 5)
+        self.assertEqual(response.json()['item']['version'], item.version + 1)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 5)
+
+    def test_stale_cart_version_rolls_back_the_change(self):
+        self.add_lines(1)
+        item = self.cart.items.get()
+        response = self.client.put(
+            '/api/cart/update_item/',
+            {'item_id': str(item.id), 'quantity': 5, 'cart_version': self.cart.version - 1},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['version'], self.cart.version)
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.version), (2, 0))
+        self.assertFalse(self.cart.reservations.exists())
+
+    def test_adding_to_an_existing_line_bumps_its_version(self):
+        self.add_lines(1)
+        item = self.cart.items.get()
+        response = self.client.post(
+            '/api/cart/add_item/', {'product_id': str(item.product_id), 'quantity': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.version), (5, 1))
+
+
+class CartTotalsTests(CartTestCase):
+    """Totals come from one pass over the items and are memoized until the cart changes"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com', username='staff', password='secret', is_staff=True,
+        )
+
+    def test_totals_are_memoized_until_invalidated(self):
+        self.add_lines(3)
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cart.total_items, 6)
+            self.assertEqual(cart.total_amount, Decimal('3000.00'))
+            self.assertEqual(cart.total_wholesale_amount, Decimal('2700.00'))
+        self.assertEqual(len(queries), 1)
+
+        CartItem.objects.filter(cart=cart).update(quantity=1)
+        self.assertEqual(cart.total_items, 6)
+        cart.invalidate_totals()
+        self.assertEqual(cart.total_items, 3)
+
+    def test_prefetched_items_need_no_aggregate(self):
+        self.add_lines(2)
+        cart = Cart.objects.with_items().get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cart.total_amount, Decimal('2000.00'))
+        self.assertEqual(len(queries), 0)
+
+    def test_empty_cart_amounts_render_as_zero(self):
+        self.client.force_authenticate(self.staff)
+        Cart.objects.create(user=self.staff)
+        data = self.client.get('/api/cart/').json()
+        self.assertEqual((data['total_items'], data['total_amount'], data['total_wholesale_amount']), (0, '0', '0'))
+
+
+class CartDeltaTests(CartTestCase):
+    """With ``X-Cart-Response: delta`` mutations return only what changed"""
+
+    def request(self, method, path, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, data, format='json', HTTP_X_CART_RESPONSE='delta')
+        return response, queries
+
+    def assert_delta(self, response, version):
+        delta = response.json()['delta']
+        self.assertNotIn('cart', response.json())
+        self.assertEqual(delta['id'], str(self.cart.id))
+        self.assertEqual(delta['version'], version)
+        self.assertEqual(
+            set(delta), {'id', 'total_items', 'total_amount', 'total_wholesale_amount', 'version', 'updated_at',
+                         'item', 'removed_id'},
+        )
+        return delta
+
+    def test_add_update_and_remove_deltas(self):
+        self.add_lines(1)
+        product = self.create_product('chiffon', price_per_meter=Decimal('300.00'), stock_quantity=20)
+        version = Cart.objects.get(pk=self.cart.pk).version
+
+        response, _ = self.request('post', '/api/cart/add_item/', {'product_id': str(product.id), 'quantity': 4})
+        self.assertEqual(response.status_code, 201)
+        delta = self.assert_delta(response, version + 1)
+        self.assertEqual((delta['item']['product']['id'], delta['item']['quantity']), (str(product.id), 4))
+        self.assertEqual((delta['total_items'], delta['removed_id']), (6, None))
+
+        item_id = delta['item']['id']
+        response, queries = self.request('put', '/api/cart/update_item/', {'item_id': item_id, 'quantity': 6})
+        self.assertEqual(response.status_code, 200)
+        delta = self.assert_delta(response, version + 2)
+        self.assertEqual((delta['item']['quantity'], delta['item']['version']), (6, 1))
+        self.assertEqual((delta['total_items'], delta['total_amount']), (8, None))
+        # The written line is serialized as is, not read back
+        selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(sum('FROM "cart_cartitem"' in sql and '"cart_cartitem"."id" =' in sql for sql in selects), 1)
+
+        response, _ = self.request('delete', '/api/cart/remove_item/', {'item_id': item_id})
+        self.assertEqual(response.status_code, 200)
+        delta = self.assert_delta(response, version + 3)
+        self.assertEqual((delta['item'], delta['removed_id'], delta['total_items']), (None, item_id, 2))
+
+    def test_without_the_header_the_whole_cart_is_returned(self):
+        self.add_lines(2)
+        item = self.cart.items.first()
+        response = self.client.put('/api/cart/update_item/', {'item_id': str(item.id), 'quantity': 3}, format='json')
+        self.assertNotIn('delta', response.json())
+        self.assertEqual(len(response.json()['cart']['items']), 2)
+
+
+class CartBatchTests(CartTestCase):
+    """POST /api/cart/batch/ applies every operation or none"""
+
+    def batch(self, operations, **data):
+        return self.client.post('/api/cart/batch/', {'operations': operations, **data}, format='json')
+
+    def lines(self):
+        return dict(self.cart.items.values_list('product__slug', 'quantity'))
+
+    def test_mixed_operations_apply_together(self):
+        self.add_lines(3)
+        first, second, third = self.cart.items.order_by('product__slug')
+        new = self.create_product('new', stock_quantity=10)
+        response = self.batch([
+            {'op': 'add', 'product_id': str(new.id), 'quantity': 2},
+            {'op': 'add', 'product_id': str(new.id), 'quantity': 3},
+            {'op': 'update', 'item_id': str(first.id), 'quantity': 7, 'preferred_colors': 'maroon'},
+            {'op': 'remove', 'item_id': str(second.id)},
+            {'op': 'add', 'product_id': str(third.product_id), 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(), {'fabric-0': 7, 'fabric-2': 3, 'fabric-new': 5})
+        first.refresh_from_db()
+        self.assertEqual((first.preferred_colors, first.version), ('maroon', 1))
+        self.assertEqual(
+            dict(self.cart.reservations.values_list('product__slug', 'quantity')),
+            {'fabric-0': 7, 'fabric-2': 3, 'fabric-new': 5},
+        )
+
+    def test_one_invalid_operation_rolls_back_the_batch(self):
+        self.add_lines(2)
+        first, second = self.cart.items.order_by('product__slug')
+        version = Cart.objects.get(pk=self.cart.pk).version
+        response = self.batch([
+            {'op': 'remove', 'item_id': str(first.id)},
+            {'op': 'update', 'item_id': str(second.id), 'quantity': 500},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+        self.assertEqual(self.lines(), {'fabric-0': 2, 'fabric-1': 2})
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).version, version)
+
+    def test_operation_count_is_limited(self):
+        self.add_lines(1)
+        item = self.cart.items.get()
+        too_many = [{'op': 'update', 'item_id': str(item.id), 'quantity': 3}] * 201
+        response = self.batch(too_many)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('operations', response.json())
+        self.assertEqual(self.batch(too_many[:200]).status_code, 200)
+
+    def test_stale_cart_version_is_a_conflict(self):
+        self.add_lines(1)
+        item = self.cart.items.get()
+        version = Cart.objects.get(pk=self.cart.pk).version
+        response = self.batch([{'op': 'update', 'item_id': str(item.id), 'quantity': 4}], cart_version=version - 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['version'], version)
+        self.assertEqual(self.lines(), {'fabric-0': 2})
+
+
+class GuestCartMergeTests(CartTestCase):
+    """Guest cart lines join the user's cart on login like any other cart write"""
+
+    def test_merge_reserves_stock_and_caps_at_what_other_carts_leave(self):
+        self.add_lines(1)
+        existing = self.cart.items.get()
+        held = self.create_product('held', stock_quantity=10)
+        other_user = get_user_model().objects.create_user(email='other@example.com', username='other', password='x')
+        reservations.reserve(Cart.objects.create(user=other_user), {held.id: 6})
+
+        guest = APIClient()
+        for product, quantity in [(existing.product, 3), (held, 5)]:
+            response = guest.post(
+                '/api/guest-cart/add_item/', {'product_id': str(product.id), 'quantity': quantity}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+        response = guest.get('/api/guest-cart/')
+        self.assertEqual(response.json()['total_items'], 8)
+        lines = anonymous.load(response.wsgi_request)
+
+        version = Cart.objects.get(pk=self.cart.pk).version
+        self.assertEqual(anonymous.merge_into_cart(self.user, lines), 2)
+        # Only 4 of held's 10 meters are not reserved by the other cart
+        expected = {'fabric-0': 5, 'fabric-held': 4}
+        self.assertEqual(dict(self.cart.items.values_list('product__slug', 'quantity')), expected)
+        self.assertEqual(dict(self.cart.reservations.values_list('product__slug', 'quantity')), expected)
+        existing.refresh_from_db()
+        self.assertEqual(existing.version, 1)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).version, version + 1)
+
+        # Nothing more of held can be added
+        self.assertEqual(anonymous.merge_into_cart(self.user, {held.id: 2}), 0)
+        self.assertEqual(self.cart.items.get(product=held).quantity, 4)
+
+
+class StockReservationTests(CartTestCase):
+    """Cart writes hold stock for a while; other carts only get what is left"""
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product('held', stock_quantity=10)
+        other_user = get_user_model().objects.create_user(email='other@example.com', username='other', password='x')
+        self.other_cart = Cart.objects.create(user=other_user)
+
+    def test_reserving_again_replaces_the_carts_hold(self):
+        reservations.reserve(self.cart, {self.product.id: 6})
+        reservations.reserve(self.cart, {self.product.id: 8})
+        self.assertEqual(StockReservation.objects.get(cart=self.cart).quantity, 8)
+
+        with self.assertRaises(reservations.InsufficientStock) as raised:
+            reservations.reserve(self.other_cart, {self.product.id: 3})
+        self.assertEqual(raised.exception.available, 2)
+        self.assertFalse(self.other_cart.reservations.exists())
+        reservations.reserve(self.other_cart, {self.product.id: 2})
+
+        self.assertEqual(reservations.release(self.cart), 1)
+        reservations.reserve(self.other_cart, {self.product.id: 10})
+
+    def test_expired_holds_free_the_stock_and_are_released(self):
+        reservations.reserve(self.cart, {self.product.id: 10})
+        StockReservation.objects.filter(cart=self.cart).update(expires_at=timezone.now() - timedelta(seconds=1))
+        reservations.reserve(self.other_cart, {self.product.id: 10})
+
+        out = StringIO()
+        call_command('release_reservations', batch_size=1, stdout=out)
+        self.assertIn('Released 1 expired reservations', out.getvalue())
+        self.assertEqual(list(StockReservation.objects.values_list('cart_id', flat=True)), [self.other_cart.id])
+        self.assertEqual(reservations.release_expired(), 0)
+
+    def test_removing_lines_releases_their_holds(self):
+        response = self.client.post(
+            '/api/cart/add_item/', {'product_id': str(self.product.id), 'quantity': 4}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.cart.reservations.get().quantity, 4)
+
+        item_id = response.json()['cart']['items'][0]['id']
+        response = self.client.delete('/api/cart/remove_item/', {'item_id': item_id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.cart.reservations.exists())
+
+        reservations.reserve(self.cart, {self.product.id: 4})
+        self.cart.clear()
+        self.assertFalse(self.cart.reservations.exists())
+
+    def test_moving_a_saved_item_reserves_its_stock(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        reservations.reserve(self.other_cart, {self.product.id: 5})
+        saved = SavedItem.objects.create(user=self.user, product=self.product, quantity=4)
+        response = self.client.post(f'/api/saved-items/{saved.id}/move_to_cart/')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(SavedItem.objects.filter(pk=saved.pk).exists())
+
+        saved.quantity = 3
+        saved.save()
+        response = self.client.post(f'/api/saved-items/{saved.id}/move_to_cart/')
+        self.assertEqual(response.status_code, 200)
+        item = self.cart.items.get()
+        self.assertEqual(str(item.id), response.json()['cart_item_id'])
+        self.assertEqual((item.quantity, item.version), (5, 1))
+        self.assertEqual(self.cart.reservations.get().quantity, 5)
+        self.assertFalse(SavedItem.objects.filter(pk=saved.pk).exists())
+
+
+class CartSweepTests(CartTestCase):
+    """sweep_carts removes carts abandoned for longer than the retention period"""
+
+    def age(self, cart, days):
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - timedelta(days=days))
+
+    def make_cart(self, name):
+        user = get_user_model().objects.create_user(email=f'{name}@example.com', username=name, password='x')
+        return Cart.objects.create(user=user)
+
+    def test_only_old_carts_without_live_reservations_are_deleted(self):
+        self.add_lines(2)
+        product = self.cart.items.first().product
+        self.age(self.cart, 61)
+        recent = self.make_cart('recent')
+        self.age(recent, 59)
+        holding = self.make_cart('holding')
+        reservations.reserve(holding, {product.id: 1})
+        self.age(holding, 90)
+        lapsed = self.make_cart('lapsed')
+        reservations.reserve(lapsed, {product.id: 1})
+        StockReservation.objects.filter(cart=lapsed).update(expires_at=timezone.now() - timedelta(days=1))
+        self.age(lapsed, 90)
+
+        self.assertEqual(sweeper.sweep_carts(days=60, dry_run=True)['cart.Cart'], 2)
+        self.assertEqual(Cart.objects.count(), 4)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sweep_carts', days=60, chunk_size=1, stdout=out)
+        self.assertIn('Deleted 2 cart.Cart rows', out.getvalue())
+        self.assertIn('Deleted 2 cart.CartItem rows', out.getvalue())
+        self.assertEqual(set(Cart.objects.all()), {recent, holding})
+        self.assertEqual(list(StockReservation.objects.values_list('cart_id', flat=True)), [holding.id])
+
+
+class SavedItemTests(CartTestCase):
+    """The wishlist and moving it to the cart take a fixed number of queries"""
+
+    def save_products(self, count):
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            product = self.create_product(f'saved-{i}')
+            ProductImage.objects.create(product=product, image=f'products/saved-{i}.jpg', is_primary=True)
+            SavedItem.objects.create(user=self.user, product=product, quantity=2)
+
+    def count_queries(self, method, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_wishlist_query_count_is_flat(self):
+        self.save_products(1)
+        single, data = self.count_queries('get', '/api/saved-items/')
+        self.assertEqual(len(data['results']), 1)
+        self.save_products(19)
+        many, data = self.count_queries('get', '/api/saved-items/')
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(single, many)
+
+    def test_move_all_query_count_is_flat_and_bumps_versions(self):
+        self.save_products(1)
+        single, data = self.count_queries('post', '/api/saved-items/move_all_to_cart/')
+        self.assertEqual(data['moved'], 1)
+
+        # Twenty more, one of them for a product already in the cart
+        self.save_products(19)
+        SavedItem.objects.create(user=self.user, product=self.cart.items.get().product, quantity=1)
+        many, data = self.count_queries('post', '/api/saved-items/move_all_to_cart/')
+        self.assertEqual((data['moved'], data['skipped']), (20, []))
+        self.assertEqual(single + 1, many)  # the version bump of the merged line
+
+        merged = self.cart.items.get(product__slug='fabric-saved-0')
+        self.assertEqual((merged.quantity, merged.version), (3, 1))
+        self.assertEqual(set(self.cart.items.exclude(pk=merged.pk).values_list('version', flat=True)), {0})
+        self.assertFalse(SavedItem.objects.exists())
@@ -5,6 +5,7 @@ from . import views
 # Create router for ViewSets
 router = DefaultRouter()
 router.register('cart', views.CartViewSet, basename='cart')
+router.register('guest-cart', views.GuestCartViewSet, basename='guest-cart')
 router.register('saved-items', views.SavedItemViewSet, basename='saved-items')
 
 urlpatterns = [
@@ -1,14 +1,23 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from core.idempotency import idempotent
+from products.loaders import get_product_loader
 from products.models import Product
-from decimal import Decimal
-from .models import Cart, CartItem, SavedItem
+from products.serializers import ProductListSerializer
+import uuid
+from orders.pricing import price_cart
+from . import anonymous, reservations
+from .batch import BatchError, apply_batch, move_saved_items
+from .models import Cart, CartItem, SavedItem, VersionConflict
+from .read_cache import get_or_build
 from .serializers import (
-    CartSerializer, CartItemSerializer, AddToCartSerializer,
-    UpdateCartItemSerializer, SavedItemSerializer, MoveToCartSerializer
+    CartSerializer, CartItemSerializer, CartDeltaSerializer, AddToCartSerializer,
+    CartVersionSerializer, UpdateCartItemSerializer, BatchCartSerializer, SavedItemSerializer, MoveToCartSerializer
 )
 
 
@@ -16,6 +25,8 @@ class CartViewSet(viewsets.ModelViewSet):
     """Shopping cart management"""
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
+    # Compare-and-swap attempts before an add gives up with 409
+    CAS_ATTEMPTS = 3
     
     def get_queryset(self):
         # Users can only access their own cart
@@ -27,47 +38,109 @@ class CartViewSet(viewsets.ModelViewSet):
         return cart
     
     def list(self, request):
-        """Get current user's cart"""
+        """Get current user's cart (served from the cart cache while its version is unchanged)"""
         cart = self.get_object()
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        audience = 'staff' if request.user.is_staff else 'public'
+        return Response(get_or_build(
+            cart, audience, request.get_host(), lambda: self.get_serializer(cart.prefetch_items()).data
+        ))
+    
+    def wants_delta(self, request):
+        """Clients opt in with ``X-Cart-Response: delta`` or ``?response=delta``"""
+        mode = request.headers.get('X-Cart-Response') or request.query_params.get('response', '')
+        return mode.lower() == 'delta'
+    
+    def cart_response(self, request, cart, message, item=None, removed_id=None, status_code=status.HTTP_200_OK):
+        """
+        Respond to a cart mutation with the whole cart, or in delta mode with
+        just the changed line, the removed line's id, the totals and the
+        cart version. A client holding version n applies a delta only if it
+        carries n + 1 and refetches the cart otherwise.
+        """
+        if not self.wants_delta(request):
+            cart_serializer = self.get_serializer(cart.prefetch_items())
+            return Response({'message': message, 'cart': cart_serializer.data}, status=status_code)
+        
+        context = self.get_serializer_context()
+        delta = CartDeltaSerializer(cart, context=context).data
+        delta['item'] = None
+        if item is not None:
+            # The instance is current after the write; only load the product's category and images if missing
+            prefetch_related_objects([item], 'product__category', 'product__images')
+            delta['item'] = CartItemSerializer(item, context=context).data
+        delta['removed_id'] = str(removed_id) if removed_id else None
+        return Response({'message': message, 'delta': delta}, status=status_code)
+    
+    def conflict_response(self, request, cart, item_id=None):
+        """
+        409 for a write that lost a compare-and-swap, carrying the current
+        cart and, when given, the current state of line ``item_id`` (null if
+        it is gone) so the client can show it and retry.
+        """
+        cart.refresh_from_db(fields=['version', 'updated_at'])
+        data = {
+            'error': 'कार्ट अर्को अनुरोधले परिवर्तन गरिसकेको छ। कृपया पुनः प्रयास गर्नुहोस्।',
+            'cart': self.get_serializer(cart.prefetch_items()).data,
+        }
+        if item_id is not None:
+            data['item'] = next((item for item in data['cart']['items'] if item['id'] == str(item_id)), None)
+        return Response(data, status=status.HTTP_409_CONFLICT)
     
     @action(detail=False, methods=['post'])
+    @idempotent
     def add_item(self, request):
         """Add item to cart"""
-        serializer = AddToCartSerializer(data=request.data)
+        serializer = AddToCartSerializer(data=request.data, context=self.get_serializer_context())
         if serializer.is_valid():
             cart = self.get_object()
-            product = get_object_or_404(Product, id=serializer.validated_data['product_id'])
+            # Already loaded while validating; no second query
+            product = get_product_loader(request).get(serializer.validated_data['product_id'])
+            if product is None:
+                raise Http404
             
-            # Check if item already in cart
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={
-                    'quantity': serializer.validated_data['quantity'],
-                    'preferred_colors': serializer.validated_data.get('preferred_colors', ''),
-                    'special_instructions': serializer.validated_data.get('special_instructions', ''),
-                }
-            )
-            
-            if not created:
-                # Update existing item
-                cart_item.quantity += serializer.validated_data['quantity']
-                
-                # Validate total quantity doesn't exceed stock
-                if cart_item.quantity > product.stock_quantity:
-                    return Response({
-                        'error': f'कुल मात्रा ({cart_item.quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                cart_item.save()
+            try:
+                with transaction.atomic():
+                    for attempt in range(self.CAS_ATTEMPTS):
+                        # Check if item already in cart
+                        cart_item, created = CartItem.objects.get_or_create(
+                            cart=cart,
+                            product=product,
+                            defaults={
+                                'quantity': serializer.validated_data['quantity'],
+                                'preferred_colors': serializer.validated_data.get('preferred_colors', ''),
+                                'special_instructions': serializer.validated_data.get('special_instructions', ''),
+                            }
+                        )
+                        if created:
+                            break
+                        
+                        # Update existing item
+                        cart_item.product = product
+                        quantity = cart_item.quantity + serializer.validated_data['quantity']
+                        
+                        # Validate total quantity doesn't exceed stock
+                        if quantity > product.stock_quantity:
+                            return Response({
+                                'error': f'कुल मात्रा ({quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।'
+                            }, status=status.HTTP_400_BAD_REQUEST)
+                        
+                        # Only applies if nobody changed the line since we read it; otherwise re-read and add again
+                        if cart_item.compare_and_swap(cart_item.version, quantity=quantity):
+                            break
+                    else:
+                        raise VersionConflict
+                    
+                    # Hold the stock while the customer shops; other carts' holds count against it
+                    reservations.reserve(cart, {product.id: cart_item.quantity})
+                    cart.touch(serializer.validated_data.get('cart_version'))
+            except reservations.InsufficientStock as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except VersionConflict:
+                return self.conflict_response(request, cart)
             
-            cart_serializer = CartSerializer(cart)
-            return Response({
-                'message': 'उत्पादन कार्टमा थपियो।',
-                'cart': cart_serializer.data
-            }, status=status.HTTP_201_CREATED)
+            return self.cart_response(
+                request, cart, 'उत्पादन कार्टमा थपियो।', item=cart_item, status_code=status.HTTP_201_CREATED
+            )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -83,7 +156,8 @@ class CartViewSet(viewsets.ModelViewSet):
             cart = self.get_object()
             
             try:
-                cart_item = cart.items.get(id=item_id)
+                cart_item = cart.items.select_related('product').get(id=item_id)
+                get_product_loader(request).prime(cart_item.product)
                 
                 # Validate quantity doesn't exceed stock
                 new_quantity = serializer.validated_data['quantity']
@@ -98,19 +172,27 @@ class CartViewSet(viewsets.ModelViewSet):
                         'error': f'मात्रा ({new_quantity}) न्यूनतम अर्डर मात्रा ({cart_item.product.minimum_order_quantity}) भन्दा कम छ।'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                cart_item.quantity = new_quantity
-                cart_item.preferred_colors = serializer.validated_data.get('preferred_colors', cart_item.preferred_colors)
-                cart_item.special_instructions = serializer.validated_data.get('special_instructions', cart_item.special_instructions)
-                cart_item.save()
+                changes = {
+                    'quantity': new_quantity,
+                    'preferred_colors': serializer.validated_data.get('preferred_colors', cart_item.preferred_colors),
+                    'special_instructions': serializer.validated_data.get('special_instructions', cart_item.special_instructions),
+                }
+                # Without a version from the client, still refuse to overwrite a change made since we read the line
+                expected_version = serializer.validated_data.get('version', cart_item.version)
+                with transaction.atomic():
+                    reservations.reserve(cart, {cart_item.product_id: new_quantity})
+                    if not cart_item.compare_and_swap(expected_version, **changes):
+                        raise VersionConflict
+                    cart.touch(serializer.validated_data.get('cart_version'))
                 
-                cart_serializer = CartSerializer(cart)
-                return Response({
-                    'message': 'कार्ट अपडेट भयो।',
-                    'cart': cart_serializer.data
-                })
+                return self.cart_response(request, cart, 'कार्ट अपडेट भयो।', item=cart_item)
                 
             except CartItem.DoesNotExist:
                 return Response({'error': 'कार्ट आइटम फेला परेन।'}, status=status.HTTP_404_NOT_FOUND)
+            except reservations.InsufficientStock as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except VersionConflict:
+                return self.conflict_response(request, cart, item_id=item_id)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -121,20 +203,29 @@ class CartViewSet(viewsets.ModelViewSet):
         if not item_id:
             return Response({'error': 'आइटम ID आवश्यक छ।'}, status=status.HTTP_400_BAD_REQUEST)
         
+        versions = CartVersionSerializer(data=request.data)
+        if not versions.is_valid():
+            return Response(versions.errors, status=status.HTTP_400_BAD_REQUEST)
+        
         cart = self.get_object()
         
         try:
             cart_item = cart.items.get(id=item_id)
-            cart_item.delete()
+            removed_id = cart_item.id
+            expected_version = versions.validated_data.get('version', cart_item.version)
+            with transaction.atomic():
+                deleted, _ = cart.items.filter(id=removed_id, version=expected_version).delete()
+                if not deleted:
+                    raise VersionConflict
+                reservations.release(cart, [cart_item.product_id])
+                cart.touch(versions.validated_data.get('cart_version'))
             
-            cart_serializer = CartSerializer(cart)
-            return Response({
-                'message': 'आइटम कार्टबाट हटाइयो।',
-                'cart': cart_serializer.data
-            })
+            return self.cart_response(request, cart, 'आइटम कार्टबाट हटाइयो।', removed_id=removed_id)
             
         except CartItem.DoesNotExist:
             return Response({'error': 'कार्ट आइटम फेला परेन।'}, status=status.HTTP_404_NOT_FOUND)
+        except VersionConflict:
+            return self.conflict_response(request, cart, item_id=item_id)
     
     @action(detail=False, methods=['post'])
     def clear(self, request):
@@ -142,11 +233,29 @@ class CartViewSet(viewsets.ModelViewSet):
         cart = self.get_object()
         cart.clear()
         
-        cart_serializer = CartSerializer(cart)
-        return Response({
-            'message': 'कार्ट खाली गरियो।',
-            'cart': cart_serializer.data
-        })
+        return self.cart_response(request, cart, 'कार्ट खाली गरियो।')
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply many add/update/remove operations at once, all or nothing"""
+        serializer = BatchCartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        cart = self.get_object()
+        try:
+            apply_batch(
+                cart,
+                serializer.validated_data['operations'],
+                loader=get_product_loader(request),
+                expected_version=serializer.validated_data.get('cart_version'),
+            )
+        except BatchError as e:
+            return Response({'error': str(e), 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except VersionConflict:
+            return self.conflict_response(request, cart)
+        
+        return self.cart_response(request, cart, 'कार्ट अपडेट भयो।')
     
     @action(detail=False, methods=['post'])
     def save_for_later(self, request):
@@ -158,7 +267,7 @@ class CartViewSet(viewsets.ModelViewSet):
         cart = self.get_object()
         
         try:
-            cart_item = cart.items.get(id=item_id)
+            cart_item = cart.items.select_related('product').get(id=item_id)
             
             # Create saved item
             saved_item, created = SavedItem.objects.get_or_create(
@@ -177,6 +286,8 @@ class CartViewSet(viewsets.ModelViewSet):
             
             # Remove from cart
             cart_item.delete()
+            reservations.release(cart, [cart_item.product_id])
+            cart.touch()
             
             return Response({'message': 'आइटम पछिका लागि सेभ गरियो।'})
             
@@ -188,45 +299,105 @@ class CartViewSet(viewsets.ModelViewSet):
         """Get cart summary for checkout"""
         cart = self.get_object()
         
-        # Calculate pricing
-        is_wholesale = request.user.is_wholesale_customer
-        subtotal = cart.total_wholesale_amount if is_wholesale else cart.total_amount
-        
-        # Calculate discount
-        discount_amount = 0
-        if is_wholesale and request.user.wholesale_discount > 0:
-            discount_amount = subtotal * (request.user.wholesale_discount / 100)
-        
-        # Calculate tax (13% VAT in Nepal)
-        taxable_amount = subtotal - discount_amount
-        tax_amount = taxable_amount * Decimal("0.13")
-        
-        # Shipping cost (can be dynamic based on location/weight)
-        shipping_cost = self.calculate_shipping_cost(cart, request.user)
-        
-        total_amount = subtotal - discount_amount + tax_amount + shipping_cost
+        pricing = price_cart(cart, request.user)
         
         return Response({
-            'items_count': cart.total_items,
-            'subtotal': subtotal,
-            'discount_amount': discount_amount,
-            'tax_amount': tax_amount,
-            'shipping_cost': shipping_cost,
-            'total_amount': total_amount,
-            'is_wholesale_order': is_wholesale,
-            'wholesale_discount_percent': request.user.wholesale_discount if is_wholesale else 0,
+            'items_count': pricing.items_count,
+            'subtotal': pricing.subtotal,
+            'discount_amount': pricing.discount_amount,
+            'tax_amount': pricing.tax_amount,
+            'shipping_cost': pricing.shipping_cost,
+            'total_amount': pricing.total_amount,
+            'is_wholesale_order': pricing.is_wholesale,
+            'wholesale_discount_percent': pricing.wholesale_discount_percent,
         })
+
+
+class GuestCartViewSet(viewsets.ViewSet):
+    """
+    Cart for anonymous visitors, stored in a signed cookie (see cart/anonymous.py).
+    Nothing is written to the database; the lines are merged into the
+    user's cart when the login request carries the cookie. The web frontend
+    does not use it: only staff see add-to-cart there, everyone else asks
+    for a quote.
+    """
+    permission_classes = [AllowAny]
+    
+    def cart_response(self, request, lines, message=None, status_code=status.HTTP_200_OK):
+        products = Product.objects.filter(id__in=lines).select_related('category').prefetch_related('images')
+        products = {product.id: product for product in products}
+        items = [
+            {
+                'product': ProductListSerializer(products[product_id], context={'request': request}).data,
+                'quantity': quantity,
+            }
+            for product_id, quantity in lines.items()
+            if product_id in products
+        ]
+        data = {'items': items, 'total_items': sum(item['quantity'] for item in items)}
+        if message:
+            data['message'] = message
+        response = Response(data, status=status_code)
+        anonymous.store(response, {product_id: lines[product_id] for product_id in lines if product_id in products})
+        return response
     
-    def calculate_shipping_cost(self, cart, user):
-        """Calculate shipping cost based on various factors"""
-        # Simple shipping calculation - can be made more complex
-        base_shipping = 100  # Base shipping cost in NPR
+    def list(self, request):
+        """Get the visitor's guest cart"""
+        return self.cart_response(request, anonymous.load(request))
+    
+    @action(detail=False, methods=['post'])
+    def add_item(self, request):
+        """Add item to guest cart"""
+        serializer = AddToCartSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        # Free shipping for wholesale customers or orders above certain amount
-        if user.is_wholesale_customer or cart.total_amount > 5000:
-            return 0
+        lines = anonymous.load(request)
+        product = get_product_loader(request).get(serializer.validated_data['product_id'])
+        quantity = lines.get(product.id, 0) + serializer.validated_data['quantity']
+        if quantity > product.stock_quantity:
+            return Response({
+                'error': f'कुल मात्रा ({quantity}) स्टकमा उपलब्ध मात्रा ({product.stock_quantity}) भन्दा बढी छ।'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if product.id not in lines and len(lines) >= anonymous.MAX_LINES:
+            return Response({
+                'error': f'कार्टमा बढीमा {anonymous.MAX_LINES} वटा आइटम मात्र राख्न सकिन्छ। कृपया लग इन गर्नुहोस्।'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        lines[product.id] = quantity
+        return self.cart_response(request, lines, 'उत्पादन कार्टमा थपियो।', status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['put'])
+    def update_item(self, request):
+        """Set the quantity of a guest cart line"""
+        serializer = AddToCartSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        lines = anonymous.load(request)
+        product_id = serializer.validated_data['product_id']
+        if product_id not in lines:
+            return Response({'error': 'कार्ट आइटम फेला परेन।'}, status=status.HTTP_404_NOT_FOUND)
         
-        return base_shipping
+        lines[product_id] = serializer.validated_data['quantity']
+        return self.cart_response(request, lines, 'कार्ट अपडेट भयो।')
+    
+    @action(detail=False, methods=['delete'])
+    def remove_item(self, request):
+        """Remove a line from the guest cart"""
+        lines = anonymous.load(request)
+        try:
+            product_id = uuid.UUID(str(request.data.get('product_id')))
+        except ValueError:
+            return Response({'error': 'उत्पादन ID आवश्यक छ।'}, status=status.HTTP_400_BAD_REQUEST)
+        if lines.pop(product_id, None) is None:
+            return Response({'error': 'कार्ट आइटम फेला परेन।'}, status=status.HTTP_404_NOT_FOUND)
+        return self.cart_response(request, lines, 'आइटम कार्टबाट हटाइयो।')
+    
+    @action(detail=False, methods=['post'])
+    def clear(self, request):
+        """Empty the guest cart"""
+        return self.cart_response(request, {}, 'कार्ट खाली गरियो।')
 
 
 class SavedItemViewSet(viewsets.ModelViewSet):
@@ -235,7 +406,10 @@ class SavedItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return SavedItem.objects.filter(user=self.request.user)
+        # Everything the nested ProductListSerializer reads, in three queries
+        return SavedItem.objects.filter(user=self.request.user).select_related(
+            'product__category'
+        ).prefetch_related('product__images').order_by('-created_at')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -252,4 +426,28 @@ class SavedItemViewSet(viewsets.ModelViewSet):
                 'cart_item_id': str(cart_item.id)
             })
         except ValueError as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def move_all_to_cart(self, request):
+        """Move the saved items listed in ``ids`` (or all of them) to the cart at once"""
+        saved_items = SavedItem.objects.filter(user=request.user)
+        ids = request.data.get('ids')
+        if ids:
+            if not isinstance(ids, list):
+                return Response({'error': 'ids सूची हुनुपर्छ।'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                saved_items = saved_items.filter(pk__in=[uuid.UUID(str(pk)) for pk in ids])
+            except ValueError:
+                return Response({'error': 'अमान्य आइटम ID।'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = move_saved_items(request.user, saved_items)
+        except reservations.InsufficientStock as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': f"{result['moved']} आइटम कार्टमा सारियो।",
+            'moved': result['moved'],
+            'skipped': result['skipped'],
+        })
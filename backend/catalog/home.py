@@ -0,0 +1,140 @@
+# catalog/home.py
+"""
+Section builders for the aggregated home page endpoint (/api/home/).
+
+Each section is cached on its own, under a key that embeds a per-section
+version token. Writes to the underlying models bump the token (see
+catalog/signals.py), so a change to, say, a hero slide only rebuilds the
+hero section and leaves the product and blog sections warm.
+
+The tokens are HomeSectionVersion rows, not cache entries: with the default
+per-process LocMemCache a bump in one worker would not reach the others,
+which would serve old sections until HOME_CACHE_TIMEOUT. Reading them costs
+one query per request; the sections themselves still come from the cache.
+A bump is written in the transaction of the change that caused it, so other
+workers see the new token and the new data together.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from blog.models import BlogPost
+from blog.serializers import BlogPostListSerializer
+from products.models import Category, Product
+from products.serializers import CategorySerializer, ProductListSerializer
+from .models import HeroSlide, HomeSectionVersion
+from .serializers import HeroSlideSerializer
+
+HOME_CACHE_TIMEOUT = getattr(settings, "HOME_CACHE_TIMEOUT", 60 * 15)
+HOME_PRODUCTS_LIMIT = 8
+HOME_BLOG_POSTS_LIMIT = 3
+
+SECTIONS = [
+    "hero_slides",
+    "categories",
+    "featured_products",
+    "latest_products",
+    "latest_blog_posts",
+]
+
+
+def get_section_versions():
+    """Return the current version token of every section in one query."""
+    versions = dict(HomeSectionVersion.objects.values_list("section", "version"))
+    # Sections never bumped have no row yet
+    return {section: versions.get(section, 0) for section in SECTIONS}
+
+
+def bump_sections(*sections):
+    """Invalidate the given sections by giving them a fresh version token."""
+    # A timestamp rather than a counter: a number handed out in a rolled back
+    # transaction is never handed out again for other data
+    token = time.time_ns()
+    sections = set(sections)
+    updated = HomeSectionVersion.objects.filter(section__in=sections).update(version=token)
+    if updated < len(sections):
+        HomeSectionVersion.objects.bulk_create(
+            [HomeSectionVersion(section=section, version=token) for section in sections],
+            ignore_conflicts=True,
+        )
+
+
+def _build_hero_slides(context):
+    slides = HeroSlide.objects.filter(is_active=True).order_by("sort_order", "-created_at")
+    return HeroSlideSerializer(slides, many=True, context=context).data
+
+
+def _build_categories(context):
+    categories = Category.objects.filter(is_active=True).annotate(
+        available_products_count=Count("products", filter=Q(products__is_available=True))
+    ).order_by("sort_order", "name")
+    return CategorySerializer(categories, many=True, context=context).data
+
+
+def _products_queryset():
+    return Product.objects.filter(is_available=True).select_related("category").prefetch_related("images")
+
+
+def _build_featured_products(context):
+    products = _products_queryset().filter(is_featured=True)[:HOME_PRODUCTS_LIMIT]
+    return ProductListSerializer(products, many=True, context=context).data
+
+
+def _build_latest_products(context):
+    products = _products_queryset().order_by("-created_at")[:HOME_PRODUCTS_LIMIT]
+    return ProductListSerializer(products, many=True, context=context).data
+
+
+def _build_latest_blog_posts(context):
+    posts = BlogPost.objects.filter(is_published=True).select_related(
+        "author", "category"
+    ).order_by("-published_at", "-created_at")[:HOME_BLOG_POSTS_LIMIT]
+    return BlogPostListSerializer(posts, many=True, context=context).data
+
+
+BUILDERS = {
+    "hero_slides": _build_hero_slides,
+    "categories": _build_categories,
+    "featured_products": _build_featured_products,
+    "latest_products": _build_latest_products,
+    "latest_blog_posts": _build_latest_blog_posts,
+}
+
+
+def _variant(request):
+    """
+    Serialized output depends on who is asking (prices are staff-only) and on
+    the host (image URLs are absolute), so both are part of the cache key.
+    """
+    user = getattr(request, "user", None)
+    audience = "staff" if getattr(user, "is_staff", False) else "public"
+    origin = f"{request.scheme}://{request.get_host()}"
+    return hashlib.md5(f"{audience}|{origin}".encode()).hexdigest()[:12]
+
+
+def build_home(request):
+    """Compose every home page section, serving each from cache where possible."""
+    context = {"request": request}
+    versions = get_section_versions()
+    variant = _variant(request)
+    keys = {
+        section: f"home:{section}:{versions[section]}:{variant}"
+        for section in SECTIONS
+    }
+
+    cached = cache.get_many(keys.values())
+    data = {}
+    fresh = {}
+    for section, key in keys.items():
+        if key in cached:
+            data[section] = cached[key]
+        else:
+            data[section] = fresh[key] = BUILDERS[section](context)
+    if fresh:
+        cache.set_many(fresh, HOME_CACHE_TIMEOUT)
+
+    data["versions"] = {section: str(version) for section, version in versions.items()}
+    return data
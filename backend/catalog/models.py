@@ -22,3 +22,12 @@ class HeroSlide(models.Model):
 
     def __str__(self):
         return self.title or f"Slide {self.pk}"
+
+
+class HomeSectionVersion(models.Model):
+    """Version token of one /api/home/ section, replaced on every write that affects it (catalog/home.py)"""
+    section = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.section} @ {self.version}"
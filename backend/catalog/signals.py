@@ -0,0 +1,73 @@
+# catalog/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from blog.models import BlogCategory, BlogPost
+from products.models import Category, Product, ProductImage
+from products.signals import stock_status_changed
+from .home import bump_sections
+from .models import HeroSlide
+
+PRODUCT_SECTIONS = ("featured_products", "latest_products")
+
+# Product fields shown on the home product cards (ProductListSerializer)
+PRODUCT_CARD_FIELDS = [
+    "name", "slug", "short_description", "category_id", "material", "gsm",
+    "primary_color", "colors_available", "price_per_meter", "wholesale_price",
+    "minimum_order_quantity", "is_available", "is_featured", "tags",
+]
+# Category cards show how many available products each category has
+CATEGORY_COUNT_FIELDS = ["category_id", "is_available"]
+
+
+@receiver([post_save, post_delete], sender=HeroSlide)
+def invalidate_hero_slides(sender, **kwargs):
+    bump_sections("hero_slides")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    # Product cards show the category name as well
+    bump_sections("categories", *PRODUCT_SECTIONS)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_changed_product(sender, instance, created, **kwargs):
+    if created:
+        bump_sections("categories", *PRODUCT_SECTIONS)
+        return
+    changes = instance.changes(PRODUCT_CARD_FIELDS + ["stock_quantity"])
+    sections = []
+    if changes.keys() & set(CATEGORY_COUNT_FIELDS):
+        sections.append("categories")
+    # Cards show the stock too, but only running out or coming back is worth
+    # a rebuild; other stock moves show up within HOME_CACHE_TIMEOUT
+    was_in_stock = (changes.get("stock_quantity") or 0) > 0
+    if changes.keys() & set(PRODUCT_CARD_FIELDS) or (
+        "stock_quantity" in changes and was_in_stock != (instance.stock_quantity > 0)
+    ):
+        sections.extend(PRODUCT_SECTIONS)
+    if sections:
+        bump_sections(*sections)
+
+
+@receiver(stock_status_changed)
+def invalidate_stock_status(sender, product_ids, **kwargs):
+    # Checkout and cancel update stock in bulk, without post_save
+    bump_sections(*PRODUCT_SECTIONS)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product(sender, **kwargs):
+    bump_sections("categories", *PRODUCT_SECTIONS)
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_images(sender, **kwargs):
+    bump_sections(*PRODUCT_SECTIONS)
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=BlogCategory)
+def invalidate_blog_posts(sender, **kwargs):
+    bump_sections("latest_blog_posts")
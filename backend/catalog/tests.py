@@ -1,3 +1,79 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from .models import HeroSlide, HomeSectionVersion
+
+
+class HomeCacheTests(TestCase):
+    """GET /api/home/ is served from cache until a section's data changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Silk')
+        self.product = Product.objects.create(
+            name='Banarasi Silk', slug='banarasi-silk', description='Silk', category=self.category,
+            material='silk', gsm=120, width='44', colors_available='red', primary_color='red',
+            usage='saree', price_per_meter=Decimal('900.00'), wholesale_price=Decimal('800.00'),
+            stock_quantity=50, is_featured=True,
+        )
+
+    def get_home(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/home/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_repeated_reads_only_read_the_version_tokens(self):
+        first_queries, first = self.get_home()
+        self.assertGreater(first_queries, 1)
+        queries, data = self.get_home()
+        self.assertEqual(queries, 1)
+        self.assertEqual(data, first)
+
+    def test_bumps_by_other_workers_are_seen(self):
+        _, first = self.get_home()
+        # Another worker's bump reaches this one through the database, not its cache
+        HomeSectionVersion.objects.update_or_create(section='hero_slides', defaults={'version': 1})
+        _, data = self.get_home()
+        self.assertNotEqual(data['versions']['hero_slides'], first['versions']['hero_slides'])
+        self.assertEqual(data['versions']['latest_products'], first['versions']['latest_products'])
+
+    def test_stock_moves_keep_the_cache(self):
+        _, first = self.get_home()
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock_quantity = 20
+        product.save()
+        queries, data = self.get_home()
+        self.assertEqual(queries, 1)
+        self.assertEqual(data['versions'], first['versions'])
+
+    def test_running_out_of_stock_rebuilds_product_sections(self):
+        _, first = self.get_home()
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock_quantity = 0
+        product.save()
+        _, data = self.get_home()
+        self.assertNotEqual(data['versions']['featured_products'], first['versions']['featured_products'])
+        self.assertEqual(data['versions']['categories'], first['versions']['categories'])
+        self.assertFalse(data['featured_products'][0]['is_in_stock'])
+
+    def test_card_changes_rebuild_only_affected_sections(self):
+        _, first = self.get_home()
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Katan Silk'
+        product.save()
+        _, data = self.get_home()
+        self.assertEqual(data['featured_products'][0]['name'], 'Katan Silk')
+        self.assertEqual(data['versions']['categories'], first['versions']['categories'])
 
-# Create your tests here.
+        HeroSlide.objects.create(title='Dashain sale', image='hero/dashain.jpg')
+        _, again = self.get_home()
+        self.assertNotEqual(again['versions']['hero_slides'], data['versions']['hero_slides'])
+        self.assertEqual(again['versions']['latest_products'], data['versions']['latest_products'])
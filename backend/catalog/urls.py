@@ -10,6 +10,7 @@ admin_router = DefaultRouter()
 admin_router.register("hero-slides", views.AdminHeroSlideViewSet, basename="admin-hero-slides")
 
 urlpatterns = [
+    path("home/", views.HomeView.as_view(), name="home"),  # /api/home/
     path("", include(public_router.urls)),           # /api/hero-slides/
     path("admin/", include(admin_router.urls)),      # /api/admin/hero-slides/
 ]
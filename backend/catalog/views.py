@@ -2,6 +2,9 @@
 from rest_framework import viewsets, filters
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .home import build_home
 from .models import HeroSlide
 from .serializers import HeroSlideSerializer, AdminHeroSlideSerializer
 
@@ -28,3 +31,15 @@ class AdminHeroSlideViewSet(viewsets.ModelViewSet):
     search_fields = ["title", "subtitle", "button_text", "button_link"]
     ordering_fields = ["sort_order", "created_at", "title"]
     ordering = ["sort_order", "-created_at"]
+
+
+class HomeView(APIView):
+    """
+    Public: GET /api/home/
+    Hero slides, categories, featured/latest products and latest blog posts
+    in a single response. Each section is cached and versioned separately.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(build_home(request))
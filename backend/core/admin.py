@@ -0,0 +1,35 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import IdempotencyKey, NumberSequence, Task
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'method', 'path', 'scope', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('method', 'response_status')
+    search_fields = ('key', 'path', 'scope')
+    readonly_fields = [field.name for field in IdempotencyKey._meta.fields]
+
+
+@admin.register(NumberSequence)
+class NumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_value', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'next_value', 'updated_at')
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at')
+    actions = ['retry_now']
+
+    @admin.action(description="Queue selected tasks to run again now")
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(), locked_by='', locked_at=None
+        )
+        self.message_user(request, f"{count} tasks queued.")
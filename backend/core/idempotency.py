@@ -0,0 +1,172 @@
+"""
+Idempotency-Key support for non-idempotent POSTs.
+
+A client that may retry a request (flaky mobile networks) sends a unique
+``Idempotency-Key`` header with it. The first request claims the key by
+inserting an IdempotencyKey row, and the unique constraint makes that claim
+atomic across processes. When the view returns, its response is stored on
+the row and replayed to every retry until IDEMPOTENCY_KEY_TTL runs out, so
+the work behind it (an order, a stock decrement) happens once.
+
+A retry that arrives while the first request is still running gets 409 with
+Retry-After. The claim is a lease: if the first request has not finished
+within IDEMPOTENCY_IN_FLIGHT_TIMEOUT seconds (its worker crashed or was
+killed), the next retry takes the key over and runs the view again; the
+late original then neither stores nor releases the key. Reusing a key for a
+different request body gets 422. Server errors and conflicts are not
+stored: the key is released and the retry runs again. Requests without the
+header are not affected.
+
+Keys are scoped to the caller: the user, or for anonymous requests the
+session or else the client IP, so two visitors choosing the same key never
+see each other's responses. An anonymous request with neither is refused.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+IN_FLIGHT_TIMEOUT = getattr(settings, 'IDEMPOTENCY_IN_FLIGHT_TIMEOUT', 60 * 2)
+# Seconds a retry is asked to wait while the first request is still running
+IN_FLIGHT_RETRY_AFTER = 1
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _scope(request):
+    """Who the key belongs to, or None for an anonymous caller we cannot tell apart"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f'session:{session.session_key}'
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    ip = forwarded_for.split(',')[0].strip() if forwarded_for else request.META.get('REMOTE_ADDR')
+    return f'ip:{ip}'[:64] if ip else None
+
+
+def _claim(request, scope, key, fingerprint):
+    """Insert the in-flight row for ``key``, or take over a lapsed lease; returns ``(record, created)``"""
+    lookup = {
+        'scope': scope,
+        'method': request.method,
+        'path': request.path[:255],
+        'key': key,
+    }
+    now = timezone.now()
+    # A lapsed key may be claimed again
+    IdempotencyKey.objects.filter(expires_at__lte=now, **lookup).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL),
+                **lookup,
+            )
+        return record, True
+    except IntegrityError:
+        record = IdempotencyKey.objects.filter(**lookup).first()
+
+    # The first request died without finishing; whichever retry moves the lease on runs it again
+    if (
+        record is not None and record.in_flight and record.fingerprint == fingerprint
+        and record.created_at <= now - timedelta(seconds=IN_FLIGHT_TIMEOUT)
+    ):
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, created_at=record.created_at, response_status__isnull=True
+        ).update(created_at=now)
+        if taken:
+            record.created_at = now
+            return record, True
+    return record, False
+
+
+def _held(record):
+    """The key's row, if ``record``'s lease on it has not been taken over"""
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def _replay(record, fingerprint):
+    if record is not None and record.fingerprint != fingerprint:
+        return Response(
+            {'error': 'यो Idempotency-Key अर्कै अनुरोधका लागि प्रयोग भइसकेको छ।'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record is None or record.in_flight:
+        response = Response(
+            {'error': 'यही अनुरोध अझै प्रक्रियामा छ। केही क्षणपछि पुनः प्रयास गर्नुहोस्।'},
+            status=status.HTTP_409_CONFLICT,
+        )
+        response['Retry-After'] = str(IN_FLIGHT_RETRY_AFTER)
+        return response
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on ``view``: a viewset method (below
+    @action) or a function view (below @api_view).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': 'Idempotency-Key धेरै लामो छ।'}, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = _scope(request)
+        if scope is None:
+            return Response(
+                {'error': 'Idempotency-Key प्रयोग गर्न लग इन गर्नुहोस्।'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = _fingerprint(request)
+        record, created = _claim(request, scope, key, fingerprint)
+        if not created:
+            return _replay(record, fingerprint)
+
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            _held(record).delete()
+            raise
+
+        if response.status_code >= 500 or response.status_code == status.HTTP_409_CONFLICT:
+            _held(record).delete()
+        else:
+            # response.data goes through the field's encoder, as save() would
+            _held(record).update(response_status=response.status_code, response_body=response.data)
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=1000):
+    """Delete lapsed keys in batches of ``batch_size``; returns the number deleted"""
+    deleted = 0
+    now = timezone.now()
+    while True:
+        batch = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import taskqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background tasks (see core/taskqueue.py). Start one or more "
+        "workers next to the web processes; use --once from cron or in development."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=2, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--batch-size', type=int, default=10, help="Tasks claimed at a time")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due")
+
+    def handle(self, *args, **options):
+        worker = taskqueue.worker_id()
+        self.stdout.write(f"Worker {worker} started with tasks: {', '.join(sorted(taskqueue.registry))}")
+        while True:
+            taskqueue.requeue_stale()
+            count = taskqueue.run_pending(worker, limit=options['batch_size'])
+            if count:
+                self.stdout.write(f"Ran {count} tasks")
+            if options['once']:
+                return
+            # Long-running process: drop connections the database may have closed
+            close_old_connections()
+            time.sleep(options['sleep'])
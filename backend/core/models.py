@@ -0,0 +1,79 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """
+    A request made with an ``Idempotency-Key`` header (see core/idempotency.py).
+    While the first request runs ``response_status`` is null, which marks
+    the key as in flight; afterwards the response is kept until
+    ``expires_at`` and replayed for retries.
+    """
+    key = models.CharField(max_length=255)
+    # "user:<pk>", "session:<key>" or "ip:<address>": keys only collide within one caller
+    scope = models.CharField(max_length=64)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'method', 'path', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} [{self.key}]"
+
+    @property
+    def in_flight(self):
+        return self.response_status is None
+
+
+class NumberSequence(models.Model):
+    """A named counter handed out in blocks by core/sequences.py"""
+    name = models.CharField(max_length=100, primary_key=True)
+    next_value = models.BigIntegerField(default=1, help_text="First value not yet handed to any process")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class Task(models.Model):
+    """A unit of background work run by ``manage.py runworker`` (see core/taskqueue.py)"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200, help_text="Registered task name, e.g. orders.tasks.notify_new_quote")
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(help_text="Not picked up before this time (retries back off)")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due queued tasks
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts})"
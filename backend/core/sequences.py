@@ -0,0 +1,74 @@
+"""
+Gap-tolerant number sequences for order and quote numbers.
+
+Each NumberSequence row holds the next value no process has taken yet. A
+process takes NUMBER_SEQUENCE_BLOCK_SIZE values at a time with one UPDATE
+and hands them out from memory, so most numbers cost no query, and no two
+processes or nodes ever share a value. Values left in a block when a
+process exits are skipped: numbers are unique, not gapless.
+
+A block is only kept in memory when it was taken in its own committed
+transaction. Inside a caller's transaction a single value is taken instead,
+because rolling that transaction back hands the value out again. Callers
+on a hot path (checkout) take their number before opening a transaction.
+
+A process keeps one block per slot. Dated sequences (one per day) share
+their family's slot, so when the day changes yesterday's block is dropped
+instead of piling up for the life of the process.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NumberSequence
+
+BLOCK_SIZE = getattr(settings, 'NUMBER_SEQUENCE_BLOCK_SIZE', 20)
+
+_lock = threading.Lock()
+# slot -> [sequence name, next value, end of block (exclusive)]
+_blocks = {}
+_pid = os.getpid()
+
+
+def _take(name, count):
+    """Move sequence ``name`` on by ``count``; returns the first value taken"""
+    with transaction.atomic():
+        NumberSequence.objects.get_or_create(name=name)
+        NumberSequence.objects.filter(name=name).update(
+            next_value=F('next_value') + count, updated_at=timezone.now()
+        )
+        return NumberSequence.objects.values_list('next_value', flat=True).get(name=name) - count
+
+
+def next_value(name, slot=None):
+    """
+    The next value of sequence ``name``, from this process's block when it
+    has one. Sequences passing the same ``slot`` (default: the name) replace
+    each other's block.
+    """
+    global _pid
+    slot = slot or name
+    with _lock:
+        if _pid != os.getpid():
+            # A forked worker must not hand out its parent's block
+            _blocks.clear()
+            _pid = os.getpid()
+        block = _blocks.get(slot)
+        if block and block[0] == name and block[1] < block[2]:
+            block[1] += 1
+            return block[1] - 1
+        if not transaction.get_connection().in_atomic_block:
+            start = _take(name, BLOCK_SIZE)
+            _blocks[slot] = [name, start + 1, start + BLOCK_SIZE]
+            return start
+    return _take(name, 1)
+
+
+def dated_number(prefix, sequence):
+    """``<prefix><YYYYMMDD><n>`` with ``n`` from a per-day sequence, e.g. ``ARN2026101900042``"""
+    today = timezone.localdate().strftime('%Y%m%d')
+    return f'{prefix}{today}{next_value(f"{sequence}:{today}", slot=sequence):05d}'
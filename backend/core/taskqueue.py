@@ -0,0 +1,148 @@
+"""
+A durable background task queue kept in the database.
+
+Functions decorated with @task (in an app's ``tasks`` module, imported at
+startup) are queued as Task rows and run by ``manage.py runworker``, so
+requests only pay for one INSERT and no broker is needed. Queue work that
+depends on a request's writes with enqueue_on_commit(): the row is written
+after the transaction commits, so a worker never sees a task for data that
+was rolled back.
+
+Workers claim due tasks with ``SELECT ... FOR UPDATE SKIP LOCKED`` followed
+by a conditional ``UPDATE ... WHERE status = 'queued'``. The second step
+keeps claims exclusive on databases without row locks (SQLite). A failing
+task is retried with exponential backoff until max_attempts and then kept
+as ``failed`` for inspection. Tasks left ``running`` by a worker that died
+are queued again after TASK_LOCK_TIMEOUT. Successful tasks are deleted.
+Tasks must therefore be safe to run more than once.
+"""
+import functools
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_RETRY_BACKOFF = getattr(settings, 'TASK_RETRY_BACKOFF', 30)
+TASK_RETRY_BACKOFF_MAX = getattr(settings, 'TASK_RETRY_BACKOFF_MAX', 60 * 60)
+TASK_LOCK_TIMEOUT = getattr(settings, 'TASK_LOCK_TIMEOUT', 60 * 10)
+
+registry = {}
+
+
+def task(func=None, *, max_attempts=5):
+    """
+    Register ``func`` as a task. Keyword arguments must be JSON serializable;
+    the function gains ``enqueue(**kwargs)`` and ``enqueue_on_commit(**kwargs)``.
+    """
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+
+    name = f'{func.__module__}.{func.__qualname__}'
+    registry[name] = func
+    func.task_name = name
+    func.enqueue = functools.partial(enqueue, name, max_attempts=max_attempts)
+    func.enqueue_on_commit = functools.partial(enqueue_on_commit, name, max_attempts=max_attempts)
+    return func
+
+
+def enqueue(name, delay=0, max_attempts=5, unique=False, **kwargs):
+    """
+    Queue task ``name`` to run ``delay`` seconds from now. With ``unique``
+    nothing is added while the same call is still queued.
+    """
+    if unique:
+        queued = Task.objects.filter(name=name, status=Task.QUEUED, kwargs=kwargs).first()
+        if queued is not None:
+            return queued
+    return Task.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_on_commit(name, **kwargs):
+    """Queue task ``name`` once the current transaction commits (immediately outside one)"""
+    transaction.on_commit(lambda: enqueue(name, **kwargs))
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts``"""
+    return min(TASK_RETRY_BACKOFF * 2 ** (attempts - 1), TASK_RETRY_BACKOFF_MAX)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def claim(worker, limit=10):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by('run_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Task.objects.filter(pk__in=ids, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(Task.objects.filter(pk__in=ids, status=Task.RUNNING, locked_by=worker).order_by('run_at'))
+
+
+def run(task_row):
+    """Run one claimed task; delete it on success, reschedule or fail it otherwise"""
+    func = registry.get(task_row.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {task_row.name}')
+        func(**task_row.kwargs)
+    except Exception:
+        task_row.last_error = traceback.format_exc()
+        task_row.locked_by, task_row.locked_at = '', None
+        if task_row.attempts >= task_row.max_attempts:
+            task_row.status = Task.FAILED
+            logger.error('Task %s failed for good after %s attempts', task_row.name, task_row.attempts)
+        else:
+            task_row.status = Task.QUEUED
+            task_row.run_at = timezone.now() + timedelta(seconds=backoff(task_row.attempts))
+            logger.warning('Task %s failed, retrying at %s', task_row.name, task_row.run_at)
+        task_row.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at'])
+        return False
+    task_row.delete()
+    return True
+
+
+def requeue_stale(timeout=TASK_LOCK_TIMEOUT):
+    """Queue again tasks whose worker has held them for over ``timeout`` seconds"""
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def run_pending(worker=None, limit=10):
+    """Claim and run due tasks until none are left; returns the number run"""
+    worker = worker or worker_id()
+    count = 0
+    while True:
+        claimed = claim(worker, limit)
+        if not claimed:
+            return count
+        for task_row in claimed:
+            run(task_row)
+            count += 1
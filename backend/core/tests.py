@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core import mail
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import sequences, taskqueue
+from .idempotency import IN_FLIGHT_TIMEOUT, _held, idempotent
+from .models import IdempotencyKey, NumberSequence, Task
+
+calls = []
+
+
+@taskqueue.task(max_attempts=2)
+def flaky(fail):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('boom')
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@idempotent
+def create_thing(request):
+    calls.append(request.data)
+    return Response({'number': len(calls)}, status=status.HTTP_201_CREATED)
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_successful_tasks_run_once_and_are_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue_on_commit(fail=False)
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, [False])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_back_off_then_give_up(self):
+        flaky.enqueue(fail=True)
+        with self.assertLogs('core.taskqueue', 'WARNING'):
+            taskqueue.run_pending()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('RuntimeError', task.last_error)
+
+        # Not due yet
+        self.assertEqual(taskqueue.run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.taskqueue', 'ERROR'):
+            taskqueue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(calls, [True, True])
+
+    def test_registration_email_is_sent_by_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/accounts/register/', {
+                'email': 'new@example.com', 'username': 'new', 'first_name': 'New', 'last_name': 'Buyer',
+                'password': 'Str0ng-pass!', 'password_confirm': 'Str0ng-pass!', 'terms_accepted': True,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(mail.outbox), 0)
+
+        taskqueue.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/verify-email?token=', mail.outbox[0].body)
+        self.assertTrue(get_user_model().objects.filter(email='new@example.com').exists())
+
+
+class IdempotencyTests(TestCase):
+    """Retries carrying the same Idempotency-Key run the view once per caller"""
+
+    def setUp(self):
+        calls.clear()
+
+    def post(self, key='key-1', **extra):
+        request = APIRequestFactory().post('/things/', {'name': 'silk'}, format='json', HTTP_IDEMPOTENCY_KEY=key, **extra)
+        return create_thing(request)
+
+    def test_expired_in_flight_lease_is_taken_over(self):
+        self.post()
+        IdempotencyKey.objects.update(response_status=None, response_body=None)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(len(calls), 1)
+
+        # The worker running the first request died
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=IN_FLIGHT_TIMEOUT + 1))
+        record = IdempotencyKey.objects.get()
+        response = self.post()
+        self.assertEqual((response.status_code, response.data), (201, {'number': 2}))
+        self.assertEqual(self.post().data, {'number': 2})
+        self.assertEqual(len(calls), 2)
+
+        # The late original no longer owns the key
+        self.assertFalse(_held(record).exists())
+
+    def test_anonymous_callers_are_scoped_apart(self):
+        self.assertEqual(self.post(REMOTE_ADDR='10.0.0.1').data, {'number': 1})
+        self.assertEqual(self.post(REMOTE_ADDR='10.0.0.2').data, {'number': 2})
+        self.assertEqual(self.post(REMOTE_ADDR='10.0.0.1').data, {'number': 1})
+        self.assertEqual(self.post(HTTP_X_FORWARDED_FOR='192.0.2.7, 10.0.0.1').data, {'number': 3})
+        self.assertEqual(
+            set(IdempotencyKey.objects.values_list('scope', flat=True)),
+            {'ip:10.0.0.1', 'ip:10.0.0.2', 'ip:192.0.2.7'},
+        )
+
+        self.assertEqual(self.post(REMOTE_ADDR='').status_code, 400)
+        self.assertEqual(len(calls), 3)
+
+
+class SequenceTests(TransactionTestCase):
+    """Numbers come from per-process blocks taken in their own transactions"""
+
+    def setUp(self):
+        sequences._blocks.clear()
+        self.addCleanup(sequences._blocks.clear)
+
+    @mock.patch.object(sequences, 'BLOCK_SIZE', 3)
+    def test_blocks_give_unique_increasing_numbers(self):
+        mine = [sequences.next_value('invoice') for _ in range(2)]
+        # Another process takes the next block meanwhile
+        theirs = sequences._take('invoice', 3)
+        mine += [sequences.next_value('invoice') for _ in range(5)]
+
+        self.assertEqual(mine, [1, 2, 3, 7, 8, 9, 10])
+        self.assertEqual(theirs, 4)
+        self.assertEqual(mine, sorted(set(mine)))
+        self.assertEqual(NumberSequence.objects.get(name='invoice').next_value, 13)
+
+    def test_only_the_current_days_block_is_kept(self):
+        with mock.patch.object(timezone, 'localdate', return_value=date(2026, 10, 19)):
+            self.assertEqual(sequences.dated_number('ARN', 'order'), 'ARN2026101900001')
+            self.assertEqual(sequences.dated_number('ARN', 'order'), 'ARN2026101900002')
+        with mock.patch.object(timezone, 'localdate', return_value=date(2026, 10, 20)):
+            self.assertEqual(sequences.dated_number('ARN', 'order'), 'ARN2026102000001')
+        sequences.dated_number('QT', 'quote')
+        self.assertEqual(set(sequences._blocks), {'order', 'quote'})
+        self.assertEqual(sequences._blocks['order'][0], 'order:20261020')
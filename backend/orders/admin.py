@@ -1,7 +1,16 @@
-from django.contrib import admin
+from datetime import date
+
+from django.contrib import admin, messages
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils import timezone
-from .models import Order, OrderItem, OrderStatusHistory, QuoteRequest
+from . import exports
+from .models import DailyProductSales, DailySales, Order, OrderItem, OrderStatusHistory, QuoteRequest
+from .pricing import price_quote, reprice_orders
+from .rollups import order_day, queue_refresh
+from .tasks import update_customer_totals
 
 
 class OrderItemInline(admin.TabularInline):
@@ -52,17 +61,62 @@ class OrderAdmin(admin.ModelAdmin):
     )
     
     inlines = [OrderItemInline, OrderStatusHistoryInline]
-    actions = ['mark_as_confirmed', 'mark_as_shipped', 'mark_as_delivered']
+    actions = ['mark_as_confirmed', 'mark_as_shipped', 'mark_as_delivered', 'reprice']
+
+    def get_urls(self):
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view), name='orders_order_export'),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        """
+        Stream order lines for accounting:
+        export/?start=2026-01-01&end=2026-01-31&format=csv (or xlsx).
+        Defaults to the current month so far.
+        """
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
+        today = timezone.localdate()
+        try:
+            start = date.fromisoformat(request.GET.get('start') or today.replace(day=1).isoformat())
+            end = date.fromisoformat(request.GET.get('end') or today.isoformat())
+        except ValueError:
+            start = end = None
+        file_format = request.GET.get('format', 'csv')
+        if start is None or start > end or file_format not in exports.FORMATS:
+            self.message_user(request, "Use start/end as YYYY-MM-DD (start before end) and format csv or xlsx.", messages.ERROR)
+            return redirect(reverse('admin:orders_order_changelist'))
+
+        rows = exports.export_rows(start, end)
+        filename = exports.filename(start, end, file_format)
+        if file_format == 'xlsx':
+            # Spooled to a temporary file by a write-only workbook, then sent
+            return FileResponse(exports.xlsx_tempfile(rows), as_attachment=True, filename=filename)
+        response = StreamingHttpResponse(exports.iter_csv(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
     def total_amount(self, obj):
         return f"रु {obj.total_amount:.2f}"
     total_amount.short_description = 'Total Amount'
     
+    def orders_changed(self, queryset):
+        """
+        What the Order post_save receivers do, for bulk actions that write
+        with update() and so send no signals: queue a recount of the
+        customers' totals. (The updates set updated_at, which moves the
+        dashboard stats on; see orders/stats.py.)
+        """
+        for user_id in set(queryset.values_list('user_id', flat=True)):
+            update_customer_totals.enqueue_on_commit(user_id=user_id, unique=True)
+    
     def mark_as_confirmed(self, request, queryset):
         """Mark selected orders as confirmed"""
+        now = timezone.now()
         updated = queryset.filter(status='pending').update(
             status='confirmed',
-            confirmed_at=timezone.now()
+            confirmed_at=now,
+            updated_at=now
         )
         
         # Create status history for each updated order
@@ -74,15 +128,18 @@ class OrderAdmin(admin.ModelAdmin):
                 created_by=request.user
             )
         
+        self.orders_changed(queryset)
         self.message_user(request, f"{updated} orders marked as confirmed.")
     
     mark_as_confirmed.short_description = "Mark selected orders as confirmed"
     
     def mark_as_shipped(self, request, queryset):
         """Mark selected orders as shipped"""
+        now = timezone.now()
         updated = queryset.filter(status__in=['confirmed', 'processing']).update(
             status='shipped',
-            shipped_at=timezone.now()
+            shipped_at=now,
+            updated_at=now
         )
         
         for order in queryset.filter(status='shipped'):
@@ -93,16 +150,19 @@ class OrderAdmin(admin.ModelAdmin):
                 created_by=request.user
             )
         
+        self.orders_changed(queryset)
         self.message_user(request, f"{updated} orders marked as shipped.")
     
     mark_as_shipped.short_description = "Mark selected orders as shipped"
     
     def mark_as_delivered(self, request, queryset):
         """Mark selected orders as delivered"""
+        now = timezone.now()
         updated = queryset.filter(status='shipped').update(
             status='delivered',
-            delivered_at=timezone.now(),
-            actual_delivery_date=timezone.now().date()
+            delivered_at=now,
+            actual_delivery_date=now.date(),
+            updated_at=now
         )
         
         for order in queryset.filter(status='delivered'):
@@ -113,9 +173,19 @@ class OrderAdmin(admin.ModelAdmin):
                 created_by=request.user
             )
         
+        self.orders_changed(queryset)
         self.message_user(request, f"{updated} orders marked as delivered.")
     
     mark_as_delivered.short_description = "Mark selected orders as delivered"
+    
+    def reprice(self, request, queryset):
+        """Recompute amounts of selected open orders with the current price rules"""
+        updated = reprice_orders(queryset.filter(status__in=['pending', 'confirmed']))
+        self.orders_changed(queryset)
+        queue_refresh(order_day(order) for order in queryset.only('created_at'))
+        self.message_user(request, f"{updated} orders repriced.")
+    
+    reprice.short_description = "Reprice selected pending/confirmed orders"
 
 
 @admin.register(OrderStatusHistory)
@@ -178,4 +248,38 @@ class QuoteRequestAdmin(admin.ModelAdmin):
         )
         self.message_user(request, f"{updated} quote requests marked as quoted.")
     
-    mark_as_quoted.short_description = "Mark as quoted"
\ No newline at end of file
+    mark_as_quoted.short_description = "Mark as quoted"
+    
+    def save_model(self, request, obj, form, change):
+        # Fill in the total (with VAT) from the per-meter price unless given
+        if obj.quoted_price is not None and obj.quoted_total is None:
+            obj.quoted_total = price_quote(obj.quoted_price, obj.quantity_needed)
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'is_wholesale', 'payment_method', 'order_count', 'meters', 'gross_revenue')
+    list_filter = ('is_wholesale', 'payment_method')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        # Written by orders/rollups.py only
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'category', 'material', 'is_wholesale', 'order_count', 'meters', 'line_revenue')
+    list_filter = ('is_wholesale', 'material', 'category')
+    list_select_related = ('product', 'category')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
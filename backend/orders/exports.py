@@ -0,0 +1,122 @@
+"""
+Order exports for accounting: one row per order line over a date range.
+
+Rows are read with ``values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+joined to their order and customer, so no model instances are built and
+only one chunk is held in memory whatever the range. CSV is written row by
+row into a StreamingHttpResponse (or a file for ``manage.py export_orders``),
+so the first bytes leave before the last orders are read.
+
+XLSX is written with openpyxl's write-only workbook, which keeps no
+cells in memory: each row is serialised as it is appended and the sheet is
+spooled to a temporary file (xlsx_tempfile), which the admin then sends
+with a FileResponse. Unlike CSV the file can only be sent once complete, so
+the admin's response starts after the last row is read; use the management
+command for long ranges.
+"""
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'ORDER_EXPORT_CHUNK_SIZE', 2000)
+
+FORMATS = ['csv', 'xlsx']
+
+COLUMNS = [
+    ('Order number', 'order__order_number'),
+    ('Order date', 'order__created_at'),
+    ('Customer email', 'order__user__email'),
+    ('Status', 'order__status'),
+    ('Payment status', 'order__payment_status'),
+    ('Payment method', 'order__payment_method'),
+    ('Wholesale', 'order__is_wholesale_order'),
+    ('Product', 'product_name'),
+    ('SKU', 'product_sku'),
+    ('Meters', 'quantity'),
+    ('Unit price', 'unit_price'),
+    ('Wholesale price', 'wholesale_price'),
+    ('Order subtotal', 'order__subtotal'),
+    ('Order discount', 'order__discount_amount'),
+    ('Order VAT', 'order__tax_amount'),
+    ('Order shipping', 'order__shipping_cost'),
+    ('Order total', 'order__total_amount'),
+]
+HEADER = [title for title, _ in COLUMNS] + ['Line total']
+
+_INDEX = {field: i for i, (_, field) in enumerate(COLUMNS)}
+
+
+def date_range(start, end):
+    """Aware datetimes covering the local dates ``start`` to ``end`` inclusive"""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def export_rows(start, end, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the header and then one row per order line placed from ``start`` to ``end``"""
+    since, until = date_range(start, end)
+    lines = (
+        OrderItem.objects.filter(order__created_at__gte=since, order__created_at__lt=until)
+        .order_by('order__created_at', 'order_id', 'created_at')
+        .values_list(*[field for _, field in COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+    yield HEADER
+    for line in lines:
+        row = list(line)
+        created_at = _INDEX['order__created_at']
+        row[created_at] = timezone.localtime(row[created_at]).strftime('%Y-%m-%d %H:%M')
+        if row[_INDEX['order__is_wholesale_order']]:
+            price = row[_INDEX['wholesale_price']]
+        else:
+            price = row[_INDEX['unit_price']]
+        yield row + [price * row[_INDEX['quantity']]]
+
+
+class _Echo:
+    """File-like object whose write() returns the text for the stream to yield"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Encode ``rows`` as CSV lines, starting with a BOM so Excel reads Nepali text as UTF-8"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(rows, file):
+    for chunk in iter_csv(rows):
+        file.write(chunk)
+
+
+def write_xlsx(rows, file):
+    """Write ``rows`` to ``file`` (a path or binary file) with a write-only workbook"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Orders')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file)
+
+
+def xlsx_tempfile(rows):
+    """Spool the XLSX export of ``rows`` to a temporary file, returned rewound"""
+    file = tempfile.TemporaryFile()
+    write_xlsx(rows, file)
+    file.seek(0)
+    return file
+
+
+def filename(start, end, file_format):
+    return f'orders-{start:%Y%m%d}-{end:%Y%m%d}.{file_format}'
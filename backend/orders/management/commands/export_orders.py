@@ -0,0 +1,36 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import exports
+
+
+class Command(BaseCommand):
+    help = "Export order lines placed between two dates (inclusive) as CSV or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+        parser.add_argument('--format', dest='file_format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write; CSV goes to stdout when omitted")
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start, end, file_format, output = options['start'], options['end'], options['file_format'], options['output']
+        if start > end:
+            raise CommandError("--start must not be after --end")
+        rows = exports.export_rows(start, end, chunk_size=options['chunk_size'])
+
+        if file_format == 'xlsx':
+            if not output:
+                raise CommandError("XLSX needs --output")
+            exports.write_xlsx(rows, output)
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as file:
+                exports.write_csv(rows, file)
+        else:
+            exports.write_csv(rows, sys.stdout)
+            return
+
+        self.stderr.write(self.style.SUCCESS(f"Wrote {output}"))
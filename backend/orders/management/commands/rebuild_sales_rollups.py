@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.models import Order
+from orders.rollups import order_day, rebuild_in_batches
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the orders (all days with orders by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="YYYY-MM-DD (default: first order)")
+        parser.add_argument('--end', type=date.fromisoformat, help="YYYY-MM-DD (default: today)")
+        parser.add_argument('--days-per-batch', type=int, default=31)
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end'] or timezone.localdate()
+        if start is None:
+            first = Order.objects.order_by('created_at').only('created_at').first()
+            if first is None:
+                self.stdout.write("No orders yet")
+                return
+            start = order_day(first)
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        written = rebuild_in_batches(start, end, days=options['days_per_batch'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows for {start} to {end}"))
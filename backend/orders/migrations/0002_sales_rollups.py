@@ -0,0 +1,124 @@
+# Generated by Django 5.2 on 2026-10-19 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0001_initial"),
+        ("products", "0004_product_trigram"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("is_wholesale", models.BooleanField(default=False)),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash_on_delivery", "Cash on Delivery"),
+                            ("bank_transfer", "Bank Transfer"),
+                            ("online_payment", "Online Payment"),
+                            ("credit", "Credit Account"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                ("meters", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Sum of order totals",
+                        max_digits=14,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Daily sales",
+                "ordering": ["-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "is_wholesale", "payment_method"),
+                        name="unique_daily_sales",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("material", models.CharField(blank=True, max_length=50)),
+                ("is_wholesale", models.BooleanField(default=False)),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                ("meters", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Sum of line prices before tax",
+                        max_digits=14,
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="daily_sales",
+                        to="products.category",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Daily product sales",
+                "ordering": ["-date"],
+                "indexes": [
+                    models.Index(
+                        fields=["date", "category"], name="orders_dail_date_c25621_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "product", "is_wholesale"),
+                        name="unique_daily_product_sales",
+                    )
+                ],
+            },
+        ),
+    ]
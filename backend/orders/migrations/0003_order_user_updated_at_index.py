@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_initial"),
+        ("orders", "0002_sales_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "updated_at"], name="orders_orde_user_id_378d6e_idx"
+            ),
+        ),
+    ]
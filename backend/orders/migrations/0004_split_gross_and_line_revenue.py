@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_order_user_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="dailysales",
+            old_name="revenue",
+            new_name="gross_revenue",
+        ),
+        migrations.AlterField(
+            model_name="dailysales",
+            name="gross_revenue",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="Sum of order totals, with VAT and shipping, after discount",
+                max_digits=14,
+            ),
+        ),
+        migrations.RenameField(
+            model_name="dailyproductsales",
+            old_name="revenue",
+            new_name="line_revenue",
+        ),
+        migrations.AlterField(
+            model_name="dailyproductsales",
+            name="line_revenue",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                help_text="Sum of line prices, before VAT, shipping and discount",
+                max_digits=14,
+            ),
+        ),
+    ]
@@ -1,12 +1,29 @@
 from django.db import models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
-from products.models import Product
+from products.models import Category, Product
 from accounts.models import UserAddress
+from core.sequences import dated_number
+from decimal import Decimal
 import uuid
 
 User = get_user_model()
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_item_totals(self):
+        """
+        Annotate each order's meters (``items_quantity``) and line count
+        (``items_lines``), read by Order.total_items and Order.items_count
+        instead of a query per order.
+        """
+        return self.annotate(
+            items_quantity=Coalesce(Sum('items__quantity'), 0),
+            items_lines=Count('items'),
+        )
+
+
 class Order(models.Model):
     """Customer orders"""
     
@@ -19,6 +36,7 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
         ('refunded', 'Refunded'),
     ]
+    CANCELLABLE_STATUSES = ['pending', 'confirmed']
     
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -82,10 +100,14 @@ class Order(models.Model):
     shipped_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
+            # Token of the cached dashboard stats (orders/stats.py)
+            models.Index(fields=['user', 'updated_at']),
             models.Index(fields=['order_number']),
             models.Index(fields=['created_at']),
         ]
@@ -98,37 +120,43 @@ class Order(models.Model):
             self.order_number = self.generate_order_number()
         super().save(*args, **kwargs)
 
-    def generate_order_number(self):
-        """Generate unique order number"""
-        import random
-        import string
-        from django.utils import timezone
-        
-        date_str = timezone.now().strftime('%Y%m%d')
-        random_str = ''.join(random.choices(string.digits, k=4))
-        return f"ARN{date_str}{random_str}"
+    @classmethod
+    def generate_order_number(cls):
+        """Generate unique order number: ARN<date><n> from a per-day sequence"""
+        return dated_number('ARN', 'order')
 
     @property
     def total_items(self):
+        if 'items_quantity' in self.__dict__:
+            return self.items_quantity
         return sum(item.quantity for item in self.items.all())
 
+    @property
+    def items_count(self):
+        if 'items_lines' in self.__dict__:
+            return self.items_lines
+        return self.items.count()
+
     @property
     def can_cancel(self):
-        return self.status in ['pending', 'confirmed']
+        return self.status in self.CANCELLABLE_STATUSES
 
     def calculate_totals(self):
-        """Recalculate order totals"""
-        self.subtotal = sum(item.total_price for item in self.items.all())
-        
-        # Apply wholesale discount if applicable
-        if self.is_wholesale_order and self.wholesale_discount_percent > 0:
-            self.discount_amount = (self.subtotal * self.wholesale_discount_percent / 100)
-        
-        # Calculate tax (can be customized)
-        taxable_amount = self.subtotal - self.discount_amount
-        self.tax_amount = taxable_amount * 0.13  # 13% VAT in Nepal
-        
-        self.total_amount = self.subtotal - self.discount_amount + self.tax_amount + self.shipping_cost
+        """Recalculate order totals from the items (see orders/pricing.py)"""
+        from .pricing import price
+
+        items = list(self.items.all())
+        pricing = price(
+            sum((item.total_price for item in items), Decimal('0.00')),
+            sum((item.wholesale_total_price for item in items), Decimal('0.00')),
+            is_wholesale=self.is_wholesale_order,
+            wholesale_discount=self.wholesale_discount_percent,
+        )
+        self.subtotal = pricing.subtotal
+        self.discount_amount = pricing.discount_amount
+        self.tax_amount = pricing.tax_amount
+        self.shipping_cost = pricing.shipping_cost
+        self.total_amount = pricing.total_amount
         
         return self.total_amount
 
@@ -265,15 +293,10 @@ class QuoteRequest(models.Model):
             self.quote_number = self.generate_quote_number()
         super().save(*args, **kwargs)
 
-    def generate_quote_number(self):
-        """Generate unique quote number"""
-        import random
-        import string
-        from django.utils import timezone
-        
-        date_str = timezone.now().strftime('%Y%m%d')
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        return f"QT{date_str}{random_str}"
+    @classmethod
+    def generate_quote_number(cls):
+        """Generate unique quote number: QT<date><n> from a per-day sequence"""
+        return dated_number('QT', 'quote')
 
     @property
     def is_expired(self):
@@ -287,4 +310,61 @@ class QuoteRequest(models.Model):
         
         # This would create an order based on the quote
         # Implementation depends on specific business logic
-        pass
\ No newline at end of file
+        pass
+
+
+class DailySales(models.Model):
+    """
+    Daily sales rollup per wholesale/retail and payment method, maintained by
+    orders/rollups.py. Cancelled and refunded orders are not counted.
+    """
+    date = models.DateField()
+    is_wholesale = models.BooleanField(default=False)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHOD_CHOICES)
+
+    order_count = models.PositiveIntegerField(default=0)
+    meters = models.PositiveIntegerField(default=0)
+    gross_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, help_text="Sum of order totals, with VAT and shipping, after discount",
+    )
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = "Daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'is_wholesale', 'payment_method'], name='unique_daily_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.payment_method} ({'wholesale' if self.is_wholesale else 'retail'})"
+
+
+class DailyProductSales(models.Model):
+    """
+    Daily sales rollup per product and wholesale/retail. Category and
+    material are copied from the product so they can be grouped without a join.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    material = models.CharField(max_length=50, blank=True)
+    is_wholesale = models.BooleanField(default=False)
+
+    order_count = models.PositiveIntegerField(default=0)
+    meters = models.PositiveIntegerField(default=0)
+    line_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, help_text="Sum of line prices, before VAT, shipping and discount",
+    )
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product', 'is_wholesale'], name='unique_daily_product_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}"
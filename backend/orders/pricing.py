@@ -0,0 +1,188 @@
+"""
+Pricing shared by the cart summary, checkout, orders and quotes.
+
+Price rules (VAT, shipping) come from the PRICING setting and are built once
+per process. Every amount is computed by price(), so the cart summary, the
+order created from that cart and a later repricing of the order always
+agree. price_carts() and price_orders() price any number of carts or orders
+from a single GROUP BY over their lines, which is what the admin reprice
+action uses.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+CENTS = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class PriceRules:
+    vat_rate: Decimal = Decimal('0.13')  # 13% VAT in Nepal
+    base_shipping: Decimal = Decimal('100.00')
+    free_shipping_threshold: Decimal = Decimal('5000.00')
+    wholesale_free_shipping: bool = True
+
+
+@dataclass(frozen=True)
+class Pricing:
+    """Every amount on a cart summary or an order, rounded to paisa"""
+    subtotal: Decimal
+    discount_amount: Decimal
+    tax_amount: Decimal
+    shipping_cost: Decimal
+    total_amount: Decimal
+    is_wholesale: bool
+    wholesale_discount_percent: Decimal
+    items_count: int = 0
+
+
+@lru_cache(maxsize=1)
+def get_price_rules():
+    """PriceRules from settings.PRICING, built once per process"""
+    overrides = getattr(settings, 'PRICING', {})
+    return PriceRules(**{
+        name: Decimal(str(value)) if not isinstance(value, bool) else value
+        for name, value in overrides.items()
+    })
+
+
+@receiver(setting_changed)
+def _reset_price_rules(setting, **kwargs):
+    if setting == 'PRICING':
+        get_price_rules.cache_clear()
+
+
+def price(retail_amount, wholesale_amount, is_wholesale=False, wholesale_discount=0, items_count=0, rules=None):
+    """
+    Price one cart or order from its retail and wholesale line sums.
+
+    Wholesale buyers pay the wholesale amount less their discount percentage
+    and get free shipping. Everyone else gets free shipping once the retail
+    amount passes the threshold. VAT is charged on the discounted subtotal.
+    """
+    rules = rules or get_price_rules()
+    retail_amount = Decimal(retail_amount or 0)
+    wholesale_amount = Decimal(wholesale_amount or 0)
+    wholesale_discount = Decimal(wholesale_discount or 0) if is_wholesale else Decimal('0')
+
+    subtotal = (wholesale_amount if is_wholesale else retail_amount).quantize(CENTS)
+    discount_amount = Decimal('0.00')
+    if wholesale_discount > 0:
+        discount_amount = (subtotal * wholesale_discount / 100).quantize(CENTS)
+    tax_amount = ((subtotal - discount_amount) * rules.vat_rate).quantize(CENTS)
+
+    free_shipping = (is_wholesale and rules.wholesale_free_shipping) or retail_amount > rules.free_shipping_threshold
+    shipping_cost = Decimal('0.00') if free_shipping else rules.base_shipping.quantize(CENTS)
+
+    return Pricing(
+        subtotal=subtotal,
+        discount_amount=discount_amount,
+        tax_amount=tax_amount,
+        shipping_cost=shipping_cost,
+        total_amount=subtotal - discount_amount + tax_amount + shipping_cost,
+        is_wholesale=is_wholesale,
+        wholesale_discount_percent=wholesale_discount,
+        items_count=items_count or 0,
+    )
+
+
+def price_cart(cart, user):
+    """Price ``cart`` for ``user`` from its (memoized) totals"""
+    totals = cart.totals
+    return price(
+        totals.total_amount,
+        totals.total_wholesale_amount,
+        is_wholesale=user.is_wholesale_customer,
+        wholesale_discount=user.wholesale_discount,
+        items_count=totals.total_items,
+    )
+
+
+def _line_total(price_field):
+    return ExpressionWrapper(
+        F(price_field) * F('quantity'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _line_sums(lines, group_by, *extra):
+    return lines.values(group_by, *extra).annotate(
+        items_count=Sum('quantity'),
+        retail_amount=Sum(_line_total('unit_price')),
+        wholesale_amount=Sum(_line_total('wholesale_price')),
+    ).order_by()
+
+
+def price_carts(carts):
+    """``{cart_id: Pricing}`` for a queryset of carts, in one query"""
+    from cart.models import CartItem
+
+    rows = _line_sums(
+        CartItem.objects.filter(cart__in=carts),
+        'cart_id', 'cart__user__is_wholesale_customer', 'cart__user__wholesale_discount',
+    )
+    return {
+        row['cart_id']: price(
+            row['retail_amount'],
+            row['wholesale_amount'],
+            is_wholesale=row['cart__user__is_wholesale_customer'],
+            wholesale_discount=row['cart__user__wholesale_discount'],
+            items_count=row['items_count'],
+        )
+        for row in rows
+    }
+
+
+def price_orders(orders):
+    """
+    ``{order_id: Pricing}`` for a queryset of orders, in one query. Orders
+    keep the wholesale terms they were placed with.
+    """
+    from .models import OrderItem
+
+    rows = _line_sums(
+        OrderItem.objects.filter(order__in=orders),
+        'order_id', 'order__is_wholesale_order', 'order__wholesale_discount_percent',
+    )
+    return {
+        row['order_id']: price(
+            row['retail_amount'],
+            row['wholesale_amount'],
+            is_wholesale=row['order__is_wholesale_order'],
+            wholesale_discount=row['order__wholesale_discount_percent'],
+            items_count=row['items_count'],
+        )
+        for row in rows
+    }
+
+
+PRICED_ORDER_FIELDS = ['subtotal', 'discount_amount', 'tax_amount', 'shipping_cost', 'total_amount']
+
+
+def reprice_orders(orders, batch_size=500):
+    """Recompute and save the amounts of every order in ``orders``; returns the number updated"""
+    prices = price_orders(orders)
+    now = timezone.now()
+    changed = []
+    for order in orders.only('pk', *PRICED_ORDER_FIELDS).filter(pk__in=list(prices)):
+        pricing = prices[order.pk]
+        for field in PRICED_ORDER_FIELDS:
+            setattr(order, field, getattr(pricing, field))
+        # bulk_update() skips auto_now; cached dashboard stats are keyed by it
+        order.updated_at = now
+        changed.append(order)
+    orders.model.objects.bulk_update(changed, [*PRICED_ORDER_FIELDS, 'updated_at'], batch_size=batch_size)
+    return len(changed)
+
+
+def price_quote(quoted_price, quantity, rules=None):
+    """Total for a bulk quote: the negotiated per-meter price times quantity, plus VAT"""
+    rules = rules or get_price_rules()
+    subtotal = (Decimal(quoted_price) * quantity).quantize(CENTS)
+    return subtotal + (subtotal * rules.vat_rate).quantize(CENTS)
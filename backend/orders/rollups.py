@@ -0,0 +1,160 @@
+"""
+Daily sales rollups (DailySales, DailyProductSales) read by the admin
+sales summary instead of scanning orders and order lines.
+
+A day's rows are always recomputed from that day's orders, never adjusted
+by deltas: background tasks run at least once, and a delta applied twice
+would stay wrong, while a recompute can be repeated safely. rebuild() groups
+every order in a range by day with one ``values(...).annotate(...)`` query
+per table and replaces the range's rows in a transaction, so rebuilding a
+year runs a handful of queries per batch and no query per order.
+
+Order saves and deletes queue the refresh_sales_day task for the order's
+day (orders/signals.py). While one refresh of a day is still queued no
+other is added, and each waits SALES_ROLLUP_DELAY seconds, so a burst of
+checkouts is folded into one recompute. Cancelled and refunded orders are
+left out; the rollups lag the orders by the delay plus the worker's pace.
+
+Revenue is kept under two names because the two tables can't share one
+definition: DailySales.gross_revenue sums order totals (VAT and shipping
+in, discount out), which can't be split across an order's products, while
+DailyProductSales.line_revenue sums line prices before any of those.
+Summaries by day, channel or payment method report gross_revenue; by
+product, category or material, line_revenue.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .exports import date_range
+from .models import DailyProductSales, DailySales, Order, OrderItem
+from .pricing import CENTS
+
+SALES_ROLLUP_DELAY = getattr(settings, 'SALES_ROLLUP_DELAY', 60)
+
+EXCLUDED_STATUSES = ['cancelled', 'refunded']
+
+SUMMARY_GROUPS = {
+    # group: (rollup model, fields grouped by, revenue field)
+    'day': (DailySales, ['date'], 'gross_revenue'),
+    'channel': (DailySales, ['is_wholesale'], 'gross_revenue'),
+    'payment_method': (DailySales, ['payment_method'], 'gross_revenue'),
+    'product': (DailyProductSales, ['product_id', 'product__name'], 'line_revenue'),
+    'category': (DailyProductSales, ['category_id', 'category__name'], 'line_revenue'),
+    'material': (DailyProductSales, ['material'], 'line_revenue'),
+}
+
+_LINE_PRICE = ExpressionWrapper(
+    Case(When(order__is_wholesale_order=True, then=F('wholesale_price')), default=F('unit_price')) * F('quantity'),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def order_day(order):
+    """The local date ``order`` is counted on"""
+    return timezone.localdate(order.created_at)
+
+
+def queue_refresh(days):
+    """Recompute the rollups of ``days`` in the background once the current transaction commits"""
+    from .tasks import refresh_sales_day
+
+    for day in set(days):
+        refresh_sales_day.enqueue_on_commit(day=day.isoformat(), unique=True, delay=SALES_ROLLUP_DELAY)
+
+
+def _lines(since, until):
+    return (
+        OrderItem.objects.filter(order__created_at__gte=since, order__created_at__lt=until)
+        .exclude(order__status__in=EXCLUDED_STATUSES)
+        .annotate(day=TruncDate('order__created_at'))
+    )
+
+
+def _sales_rows(since, until):
+    orders = Order.objects.filter(created_at__gte=since, created_at__lt=until).exclude(status__in=EXCLUDED_STATUSES)
+    rows = {
+        (row['day'], row['is_wholesale_order'], row['payment_method']): DailySales(
+            date=row['day'], is_wholesale=row['is_wholesale_order'], payment_method=row['payment_method'],
+            order_count=row['order_count'], gross_revenue=row['gross_revenue'] or 0,
+        )
+        for row in orders.annotate(day=TruncDate('created_at'))
+        .values('day', 'is_wholesale_order', 'payment_method')
+        .annotate(order_count=Count('pk'), gross_revenue=Sum('total_amount'))
+        .order_by()
+    }
+    meters = (
+        _lines(since, until)
+        .values('day', 'order__is_wholesale_order', 'order__payment_method')
+        .annotate(meters=Sum('quantity'))
+        .order_by()
+    )
+    for row in meters:
+        key = (row['day'], row['order__is_wholesale_order'], row['order__payment_method'])
+        if key in rows:
+            rows[key].meters = row['meters']
+    return list(rows.values())
+
+
+def _product_rows(since, until):
+    return [
+        DailyProductSales(
+            date=row['day'], product_id=row['product_id'], category_id=row['product__category_id'],
+            material=row['product__material'], is_wholesale=row['order__is_wholesale_order'],
+            order_count=row['order_count'], meters=row['meters'], line_revenue=row['line_revenue'] or 0,
+        )
+        for row in _lines(since, until)
+        .values('day', 'product_id', 'product__category_id', 'product__material', 'order__is_wholesale_order')
+        .annotate(order_count=Count('order_id', distinct=True), meters=Sum('quantity'), line_revenue=Sum(_LINE_PRICE))
+        .order_by()
+    ]
+
+
+def rebuild(start, end, batch_size=500):
+    """Replace the rollups of the dates ``start`` to ``end`` inclusive; returns the rows written"""
+    since, until = date_range(start, end)
+    sales = _sales_rows(since, until)
+    products = _product_rows(since, until)
+    with transaction.atomic():
+        DailySales.objects.filter(date__range=(start, end)).delete()
+        DailyProductSales.objects.filter(date__range=(start, end)).delete()
+        DailySales.objects.bulk_create(sales, batch_size=batch_size)
+        DailyProductSales.objects.bulk_create(products, batch_size=batch_size)
+    return len(sales) + len(products)
+
+
+def rebuild_in_batches(start, end, days=31):
+    """rebuild() ``days`` at a time, so memory is bounded by one batch; returns the rows written"""
+    written = 0
+    while start <= end:
+        batch_end = min(start + timedelta(days=days - 1), end)
+        written += rebuild(start, batch_end)
+        start = batch_end + timedelta(days=1)
+    return written
+
+
+def summary(start, end, group='day', limit=None):
+    """
+    Meters, revenue and (except per category and material) order counts from
+    ``start`` to ``end`` by ``group``. Revenue is gross_revenue or
+    line_revenue depending on the group, as a decimal string.
+    """
+    model, fields, revenue = SUMMARY_GROUPS[group]
+    totals = {'meters': Sum('meters'), revenue: Sum(revenue)}
+    if group not in ('category', 'material'):
+        # Orders with several products of one category would be counted once per product
+        totals['order_count'] = Sum('order_count')
+    rows = (
+        model.objects.filter(date__range=(start, end))
+        .values(*fields)
+        .annotate(**totals)
+        .order_by(*fields if group == 'day' else [f'-{revenue}'])
+    )
+    if limit:
+        rows = rows[:limit]
+    return [{**row, revenue: str(Decimal(row[revenue] or 0).quantize(CENTS))} for row in rows]
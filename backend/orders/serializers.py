@@ -39,6 +39,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
 class OrderListSerializer(serializers.ModelSerializer):
     """Simplified serializer for order lists"""
     total_items = serializers.IntegerField(read_only=True)
+    items_count = serializers.IntegerField(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     payment_status_display = serializers.CharField(source='get_payment_status_display', read_only=True)
     
@@ -47,7 +48,7 @@ class OrderListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'status', 'status_display', 'payment_status', 
             'payment_status_display', 'payment_method', 'total_amount', 'total_items',
-            'is_wholesale_order', 'created_at', 'estimated_delivery_date'
+            'items_count', 'is_wholesale_order', 'created_at', 'estimated_delivery_date'
         ]
 
 
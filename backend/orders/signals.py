@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order
+from .rollups import order_day, queue_refresh
+from .tasks import update_customer_totals
+
+
+@receiver([post_save, post_delete], sender=Order)
+def queue_customer_totals(sender, instance, **kwargs):
+    # Recomputed by a worker once the order change is committed
+    update_customer_totals.enqueue_on_commit(user_id=instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def refresh_sales_rollups(sender, instance, **kwargs):
+    queue_refresh([order_day(instance)])
@@ -0,0 +1,56 @@
+"""
+Per-customer order statistics for GET /api/orders/dashboard_stats/.
+
+The counts per status and the amount spent come from one conditional
+aggregate over the user's orders and are cached under
+``order-stats:<user id>`` together with the token they were built from:
+the number of the user's orders and their latest ``updated_at``. A read
+first takes that token from the ``(user, updated_at)`` index and serves
+the cached figures only if it still matches, so every worker sees a change
+as soon as it is committed, whatever cache backend is configured. Any
+order save or delete moves the token on. Writers that bypass save()
+(``QuerySet.update()``, ``bulk_update()``) must set ``updated_at``
+themselves, as the admin actions and reprice_orders do.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+
+from .models import Order
+
+ORDER_STATS_CACHE_TIMEOUT = getattr(settings, 'ORDER_STATS_CACHE_TIMEOUT', 60 * 10)
+
+STATUS_COUNTS = ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled']
+
+
+def _cache_key(user_id):
+    return f"order-stats:{user_id}"
+
+
+def _token(user_id):
+    """``(order count, latest updated_at)`` of the user's orders"""
+    token = Order.objects.filter(user_id=user_id).aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+    return (token['count'], token['updated_at'])
+
+
+def build_order_stats(user_id):
+    """Count the user's orders by status and sum their paid totals in one query"""
+    totals = Order.objects.filter(user_id=user_id).aggregate(
+        total_orders=Count('pk'),
+        **{f'{status}_orders': Count('pk', filter=Q(status=status)) for status in STATUS_COUNTS},
+        total_spent=Sum('total_amount', filter=Q(payment_status='paid')),
+    )
+    totals['total_spent'] = float(totals['total_spent'] or 0)
+    return totals
+
+
+def order_stats(user_id):
+    """Return the statistics of ``user_id``, from the cache while the user's orders are unchanged"""
+    key = _cache_key(user_id)
+    token = _token(user_id)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    stats = build_order_stats(user_id)
+    cache.set(key, (token, stats), ORDER_STATS_CACHE_TIMEOUT)
+    return stats
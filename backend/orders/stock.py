@@ -0,0 +1,82 @@
+"""
+Stock movements for checkout and cancellation.
+
+Checkout takes the stock of every line at once. The product rows are locked
+in primary key order, which is the order cart/reservations.py locks them in,
+so checkouts and reservations cannot deadlock. The quantities are checked
+against stock not held by other carts and then decremented with one
+``UPDATE ... SET stock_quantity = CASE ...``. The column's ``>= 0`` check
+constraint backs this up where row locks are not available. Nothing here
+issues a statement per line.
+
+Those UPDATEs send no post_save, so products they run out of stock or bring
+back are announced with products.signals.stock_status_changed once the
+transaction commits; the home page sections listen for it.
+"""
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, PositiveIntegerField, Sum, When
+
+from cart.reservations import InsufficientStock, reserved_quantities
+from products.models import Product
+from products.signals import stock_status_changed
+
+
+def _adjust(quantities, sign):
+    """One UPDATE adding (``sign`` 1) or removing (-1) each product's quantity"""
+    def change(quantity):
+        return ExpressionWrapper(F('stock_quantity') + sign * quantity, output_field=PositiveIntegerField())
+
+    return Product.objects.filter(pk__in=list(quantities)).update(
+        stock_quantity=Case(
+            *[When(pk=product_id, then=change(quantity)) for product_id, quantity in quantities.items()],
+            default=F('stock_quantity'),
+        )
+    )
+
+
+def _announce(product_ids):
+    if product_ids:
+        transaction.on_commit(lambda: stock_status_changed.send(sender=Product, product_ids=product_ids))
+
+
+def take_stock(quantities, cart=None):
+    """
+    Remove ``{product_id: quantity}`` from stock. Other carts' unexpired
+    reservations count as unavailable; ``cart``'s own do not. Raises
+    InsufficientStock, taking nothing, if any product falls short.
+    """
+    if not quantities:
+        return
+    product_ids = sorted(quantities)
+    with transaction.atomic():
+        stock = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values_list('pk', 'stock_quantity')
+        )
+        reserved = reserved_quantities(product_ids, exclude_cart=cart)
+        for product_id in product_ids:
+            available = stock.get(product_id, 0) - reserved.get(product_id, 0)
+            if quantities[product_id] > available:
+                raise InsufficientStock(product_id, quantities[product_id], available)
+        _adjust(quantities, -1)
+        _announce([product_id for product_id in product_ids if stock[product_id] == quantities[product_id]])
+
+
+def restore_stock(order_items):
+    """Put the quantities of ``order_items`` (a queryset) back into stock"""
+    quantities = dict(
+        order_items.values('product_id').annotate(quantity=Sum('quantity')).order_by().values_list('product_id', 'quantity')
+    )
+    if not quantities:
+        return
+    with transaction.atomic():
+        sold_out = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=list(quantities), stock_quantity=0)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        _adjust(quantities, 1)
+        _announce([product_id for product_id in sold_out if quantities[product_id] > 0])
@@ -0,0 +1,54 @@
+"""Background tasks for orders and quotes, run by ``manage.py runworker``"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db.models import Count, Q, Sum
+
+from accounts.models import UserProfile
+from core.taskqueue import task
+from .models import Order, QuoteRequest
+from .rollups import rebuild
+
+
+@task
+def notify_new_quote(quote_id):
+    """Email the staff about a new quote request"""
+    quote = QuoteRequest.objects.select_related('user').filter(pk=quote_id).first()
+    if quote is None:
+        return
+    recipients = list(
+        get_user_model().objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    if not recipients:
+        return
+    send_mail(
+        subject=f"New quote request {quote.quote_number}",
+        message=(
+            f"{quote.user.email} asked for {quote.quantity_needed} m of {quote.fabric_type} "
+            f"({quote.preferred_colors}), urgency: {quote.get_urgency_display()}.\n\n"
+            f"{quote.customer_message}\n\nDeliver to: {quote.delivery_location}"
+        ),
+        from_email=None,
+        recipient_list=recipients,
+    )
+
+
+@task
+def update_customer_totals(user_id):
+    """Recompute UserProfile.total_orders and total_spent from the user's orders in one aggregate"""
+    totals = Order.objects.filter(user_id=user_id).exclude(status__in=['cancelled', 'refunded']).aggregate(
+        total_orders=Count('pk'),
+        total_spent=Sum('total_amount', filter=Q(payment_status='paid')),
+    )
+    UserProfile.objects.filter(user_id=user_id).update(
+        total_orders=totals['total_orders'],
+        total_spent=totals['total_spent'] or 0,
+    )
+
+
+@task
+def refresh_sales_day(day):
+    """Recompute the daily sales rollups of ``day`` (YYYY-MM-DD)"""
+    day = date.fromisoformat(day)
+    rebuild(day, day)
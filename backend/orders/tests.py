@@ -1,3 +1,444 @@
-from django.test import TestCase
+import csv
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.contrib import admin
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from accounts.models import UserAddress, UserProfile
+from cart.models import Cart, CartItem, StockReservation
+from core import taskqueue
+from core.models import IdempotencyKey, Task
+from products.models import Category, Product
+from . import exports
+from .admin import QuoteRequestAdmin
+from .models import DailyProductSales, DailySales, Order, QuoteRequest
+from .pricing import get_price_rules, price, price_carts, price_quote
+from .views import OrderViewSet
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='buyer@example.com', username='buyer', password='secret',
+            first_name='Test', last_name='Buyer',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.address = UserAddress.objects.create(
+            user=self.user, name='Home', address_line1='Ward 4', city='Kathmandu',
+            state='Bagmati', pincode='44600',
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Cotton')
+        self.products = []
+
+    def add_lines(self, count, stock=10, quantity=2):
+        for i in range(len(self.products), len(self.products) + count):
+            product = Product.objects.create(
+                name=f'Fabric {i}', slug=f'fabric-{i}', description='Fabric',
+                category=self.category, material='cotton', gsm=120, width='44',
+                colors_available='blue', primary_color='blue', usage='kurta',
+                price_per_meter=Decimal('300.00'), wholesale_price=Decimal('250.00'),
+                stock_quantity=stock,
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=quantity)
+            self.products.append(product)
+
+    def checkout(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/create_from_cart/', {
+                'shipping_address_id': str(self.address.id),
+                'payment_method': 'cash_on_delivery',
+            }, format='json', headers=headers)
+        return response, len(queries)
+
+
+class CheckoutTests(OrderTestCase):
+    """Checkout takes stock and writes order lines in a fixed number of queries"""
+
+    def test_checkout_query_count_is_flat(self):
+        # The first checkout of the day also creates the order number sequence
+        self.add_lines(1)
+        self.checkout()
+
+        self.add_lines(1)
+        response, single_line_queries = self.checkout()
+        self.assertEqual(response.status_code, 201)
+
+        self.add_lines(20)
+        response, many_line_queries = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(single_line_queries, many_line_queries)
+
+        order = Order.objects.get(pk=response.json()['order']['id'])
+        self.assertEqual(order.items.count(), 20)
+        self.assertFalse(self.cart.items.exists())
+        stock = set(Product.objects.filter(pk__in=[p.pk for p in self.products]).values_list('stock_quantity', flat=True))
+        self.assertEqual(stock, {8})
+
+    def test_stock_held_by_another_cart_blocks_checkout(self):
+        self.add_lines(2, stock=5, quantity=3)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com', username='other', password='secret',
+        )
+        StockReservation.objects.create(
+            cart=Cart.objects.create(user=other_user), product=self.products[1], quantity=3,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        response, _ = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+        stock = list(Product.objects.filter(pk__in=[p.pk for p in self.products]).values_list('stock_quantity', flat=True))
+        self.assertEqual(stock, [5, 5])
+
+    def test_cancel_restores_stock(self):
+        self.add_lines(3)
+        response, _ = self.checkout()
+        self.client.post(f"/api/orders/{response.json()['order']['id']}/cancel/")
+        stock = set(Product.objects.filter(pk__in=[p.pk for p in self.products]).values_list('stock_quantity', flat=True))
+        self.assertEqual(stock, {10})
+
+    def test_concurrent_cancels_restore_stock_once(self):
+        self.add_lines(2)
+        response, _ = self.checkout()
+        order_id = response.json()['order']['id']
+        # The second request read the order before the first one cancelled it
+        stale = Order.objects.get(pk=order_id)
+        self.assertEqual(self.client.post(f'/api/orders/{order_id}/cancel/').status_code, 200)
+        with mock.patch.object(OrderViewSet, 'get_object', return_value=stale):
+            response = self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(response.status_code, 400)
+        stock = set(Product.objects.filter(pk__in=[p.pk for p in self.products]).values_list('stock_quantity', flat=True))
+        self.assertEqual(stock, {10})
+        self.assertEqual(Order.objects.get(pk=order_id).status_history.filter(status='cancelled').count(), 1)
+
+    def test_selling_out_and_restocking_rebuild_home_product_sections(self):
+        cache.clear()
+        self.add_lines(1, stock=2)
+        self.add_lines(1, stock=5)
+        home = self.client.get('/api/home/').json()
+        self.assertEqual([p['is_in_stock'] for p in home['latest_products']], [True, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response, _ = self.checkout()
+        sold_out = self.client.get('/api/home/').json()
+        self.assertNotEqual(sold_out['versions']['latest_products'], home['versions']['latest_products'])
+        self.assertEqual(sold_out['versions']['categories'], home['versions']['categories'])
+        self.assertEqual(sorted(p['is_in_stock'] for p in sold_out['latest_products']), [False, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/orders/{response.json()['order']['id']}/cancel/")
+        restocked = self.client.get('/api/home/').json()
+        self.assertEqual([p['is_in_stock'] for p in restocked['latest_products']], [True, True])
+
+    def test_retried_checkout_is_replayed(self):
+        self.add_lines(2)
+        first, _ = self.checkout(**{'Idempotency-Key': 'checkout-1'})
+        self.assertEqual(first.status_code, 201)
+
+        retry, _ = self.checkout(**{'Idempotency-Key': 'checkout-1'})
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 8)
+
+    def test_in_flight_and_reused_keys_are_rejected(self):
+        self.add_lines(1)
+        IdempotencyKey.objects.create(
+            key='checkout-2', scope=f'user:{self.user.pk}', method='POST', path='/api/orders/create_from_cart/',
+            fingerprint='0' * 64, expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        response, _ = self.checkout(**{'Idempotency-Key': 'checkout-2'})
+        self.assertEqual(response.status_code, 422)
+
+        self.assertFalse(Order.objects.exists())
+
+        # Same key and body while the first request has not finished yet
+        self.checkout(**{'Idempotency-Key': 'checkout-3'})
+        IdempotencyKey.objects.filter(key='checkout-3').update(response_status=None)
+        response, _ = self.checkout(**{'Idempotency-Key': 'checkout-3'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_order_numbers_follow_a_daily_sequence(self):
+        self.add_lines(1)
+        first, _ = self.checkout()
+        self.add_lines(1)
+        second, _ = self.checkout()
+        today = timezone.localdate().strftime('%Y%m%d')
+        numbers = [first.json()['order']['order_number'], second.json()['order']['order_number']]
+        self.assertEqual(numbers, [f'ARN{today}00001', f'ARN{today}00002'])
+
+    def test_order_history_query_count_is_flat(self):
+        self.add_lines(1)
+        self.checkout()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        single_order_queries = len(queries)
+
+        for _ in range(5):
+            self.add_lines(3)
+            self.checkout()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(queries), single_order_queries)
+
+        orders = response.json()
+        orders = orders.get('results', orders)
+        self.assertEqual(len(orders), 6)
+        self.assertEqual((orders[0]['total_items'], orders[0]['items_count']), (6, 3))
+
+    def test_dashboard_stats_are_cached_until_an_order_changes(self):
+        cache.clear()
+        self.add_lines(2)
+        response, _ = self.checkout()
+        order_id = response.json()['order']['id']
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.client.get('/api/orders/dashboard_stats/').json()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual((stats['total_orders'], stats['pending_orders']), (1, 1))
+        # Only the token is read while the orders are unchanged
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/orders/dashboard_stats/')
+        self.assertEqual(len(queries), 1)
+
+        # Seen at once even when made by another worker, which does not touch this cache
+        Order.objects.filter(pk=order_id).update(status='confirmed', updated_at=timezone.now())
+        stats = self.client.get('/api/orders/dashboard_stats/').json()
+        self.assertEqual((stats['pending_orders'], stats['confirmed_orders']), (0, 1))
+
+        self.client.post(f'/api/orders/{order_id}/cancel/')
+        stats = self.client.get('/api/orders/dashboard_stats/').json()
+        self.assertEqual((stats['confirmed_orders'], stats['cancelled_orders']), (0, 1))
+
+
+class OrderExportTests(OrderTestCase):
+    """Accounting exports of order lines from the admin"""
+
+    def test_admin_export_streams_order_lines(self):
+        self.add_lines(3)
+        self.checkout()
+        self.add_lines(2)
+        self.checkout()
+        staff = get_user_model().objects.create_user(
+            email='accounts@example.com', username='accounts', password='secret', is_staff=True, is_superuser=True,
+        )
+        self.client.force_login(staff)
+        today = timezone.localdate().isoformat()
+
+        response = self.client.get(f'/admin/orders/order/export/?start={today}&end={today}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0][-1], 'Line total')
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({row[-1] for row in rows[1:]}, {'600.00'})
+
+        response = self.client.get('/admin/orders/order/export/?start=2020-01-01&end=2020-01-31')
+        self.assertEqual(len(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()), 1)
+
+    def test_admin_export_sends_xlsx(self):
+        self.add_lines(2)
+        self.checkout()
+        staff = get_user_model().objects.create_user(
+            email='accounts@example.com', username='accounts', password='secret', is_staff=True, is_superuser=True,
+        )
+        self.client.force_login(staff)
+        today = timezone.localdate()
+
+        response = self.client.get(f'/admin/orders/order/export/?start={today}&end={today}&format=xlsx')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'orders-{today:%Y%m%d}-{today:%Y%m%d}.xlsx', response['Content-Disposition'])
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)['Orders']
+        rows = list(sheet.values)
+        self.assertEqual(list(rows[0]), exports.HEADER)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row[-1] for row in rows[1:]}, {600})
+
+
+class SalesRollupTests(OrderTestCase):
+    """Daily sales rollups and the admin sales summary read from them"""
+
+    def test_sales_rollups_follow_order_changes(self):
+        self.add_lines(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout()
+        self.add_lines(1, quantity=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            second, _ = self.checkout()
+        # One refresh per day while it is still queued
+        self.assertEqual(Task.objects.filter(name__endswith='refresh_sales_day').count(), 1)
+
+        Task.objects.update(run_at=timezone.now())
+        taskqueue.run_pending()
+        sales = DailySales.objects.get()
+        self.assertEqual((sales.order_count, sales.meters, sales.is_wholesale), (2, 7, False))
+        self.assertEqual(DailyProductSales.objects.count(), 3)
+        self.assertEqual(DailyProductSales.objects.get(product=self.products[2]).line_revenue, Decimal('900.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/orders/{second.json()['order']['id']}/cancel/")
+        Task.objects.update(run_at=timezone.now())
+        taskqueue.run_pending()
+        self.assertEqual(DailySales.objects.get().meters, 4)
+        self.assertFalse(DailyProductSales.objects.filter(product=self.products[2]).exists())
+
+        staff = get_user_model().objects.create_user(
+            email='owner@example.com', username='owner', password='secret', is_staff=True,
+        )
+        self.client.force_authenticate(staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/admin/sales-summary/?group=product')
+        self.assertEqual(len(queries), 1)
+        rows = response.json()['rows']
+        self.assertEqual([(row['meters'], row['line_revenue']) for row in rows], [(2, '600.00'), (2, '600.00')])
+
+        # Per day the revenue is what the customers paid, VAT and shipping included
+        rows = self.client.get('/api/admin/sales-summary/?group=day').json()['rows']
+        paid = Order.objects.exclude(status='cancelled').get().total_amount
+        self.assertEqual([(row['order_count'], row['gross_revenue']) for row in rows], [(1, str(paid))])
+
+    def test_summary_rejects_bad_ranges_and_limits(self):
+        staff = get_user_model().objects.create_user(
+            email='owner@example.com', username='owner', password='secret', is_staff=True,
+        )
+        self.client.force_authenticate(staff)
+        for params in [
+            'group=product&limit=-3', 'limit=101', 'limit=x', 'start=2026-02-01&end=2026-01-01',
+            'start=2025-01-01&end=2026-01-02', 'start=2026-13-01',
+        ]:
+            response = self.client.get(f'/api/admin/sales-summary/?{params}')
+            self.assertEqual(response.status_code, 400, params)
+        for params in ['group=product&limit=100', 'limit=0', 'start=2025-01-01&end=2026-01-01']:
+            response = self.client.get(f'/api/admin/sales-summary/?{params}')
+            self.assertEqual(response.status_code, 200, params)
+
+
+class PricingTests(OrderTestCase):
+    """Cart summary, checkout, repricing and quotes share one set of pricing rules"""
+
+    def setUp(self):
+        super().setUp()
+        get_price_rules.cache_clear()
+        self.addCleanup(get_price_rules.cache_clear)
+
+    def test_retail_and_wholesale_amounts(self):
+        retail = price(Decimal('600'), Decimal('500'))
+        self.assertEqual(
+            (retail.subtotal, retail.discount_amount, retail.tax_amount, retail.shipping_cost, retail.total_amount),
+            (Decimal('600.00'), Decimal('0.00'), Decimal('78.00'), Decimal('100.00'), Decimal('778.00')),
+        )
+        wholesale = price(Decimal('600'), Decimal('500'), is_wholesale=True, wholesale_discount=Decimal('10'))
+        self.assertEqual(
+            (wholesale.subtotal, wholesale.discount_amount, wholesale.tax_amount, wholesale.shipping_cost,
+             wholesale.total_amount),
+            (Decimal('500.00'), Decimal('50.00'), Decimal('58.50'), Decimal('0.00'), Decimal('508.50')),
+        )
+        # The discount is a wholesale term; retail buyers never get it
+        self.assertEqual(price(Decimal('600'), Decimal('500'), wholesale_discount=Decimal('10')).discount_amount, 0)
+        self.assertEqual(price(Decimal('600'), Decimal('500'), is_wholesale=True).discount_amount, 0)
+
+    def test_vat_is_rounded_to_paisa_half_to_even(self):
+        self.assertEqual(price(Decimal('333.33'), 0).tax_amount, Decimal('43.33'))
+        self.assertEqual(price(Decimal('0.50'), 0).tax_amount, Decimal('0.06'))
+        self.assertEqual(price(Decimal('0.70'), 0).tax_amount, Decimal('0.09'))
+
+    def test_free_shipping_above_the_threshold(self):
+        self.assertEqual(price(Decimal('5000.00'), 0).shipping_cost, Decimal('100.00'))
+        self.assertEqual(price(Decimal('5000.01'), 0).shipping_cost, Decimal('0.00'))
+
+        with override_settings(PRICING={'free_shipping_threshold': '1000', 'base_shipping': '150',
+                                        'wholesale_free_shipping': False}):
+            self.assertEqual(price(Decimal('900'), 0).shipping_cost, Decimal('150.00'))
+            self.assertEqual(price(Decimal('1200'), 0).shipping_cost, Decimal('0.00'))
+            self.assertEqual(price(Decimal('900'), Decimal('800'), is_wholesale=True).shipping_cost, Decimal('150.00'))
+        self.assertEqual(price(Decimal('900'), 0).shipping_cost, Decimal('100.00'))
+
+    def test_checkout_charges_what_the_cart_summary_showed(self):
+        self.user.is_wholesale_customer = True
+        self.user.wholesale_discount = Decimal('5.00')
+        self.user.save()
+        self.add_lines(3, quantity=3)
+        summary = self.client.get('/api/cart/summary/').json()
+        self.assertEqual(price_carts(Cart.objects.filter(pk=self.cart.pk))[self.cart.pk].total_amount,
+                         Decimal(str(summary['total_amount'])))
+
+        response, _ = self.checkout()
+        order = Order.objects.get(pk=response.json()['order']['id'])
+        for field in ['subtotal', 'discount_amount', 'tax_amount', 'shipping_cost', 'total_amount']:
+            self.assertEqual(getattr(order, field), Decimal(str(summary[field])), field)
+        self.assertEqual(order.total_amount, Decimal('2415.38'))
+
+    def test_admin_reprice_recomputes_open_orders_only(self):
+        self.add_lines(1)
+        open_order = Order.objects.get(pk=self.checkout()[0].json()['order']['id'])
+        self.add_lines(1)
+        delivered = Order.objects.get(pk=self.checkout()[0].json()['order']['id'])
+        Order.objects.filter(pk=delivered.pk).update(status='delivered')
+        Order.objects.update(tax_amount=0, total_amount=1)
+
+        staff = get_user_model().objects.create_superuser(email='admin@example.com', username='admin', password='secret')
+        self.client.force_login(staff)
+        with override_settings(PRICING={'vat_rate': '0.10'}):
+            response = self.client.post('/admin/orders/order/', {
+                'action': 'reprice', '_selected_action': [str(open_order.pk), str(delivered.pk)],
+            })
+        self.assertEqual(response.status_code, 302)
+        open_order.refresh_from_db()
+        delivered.refresh_from_db()
+        self.assertEqual((open_order.tax_amount, open_order.total_amount), (Decimal('60.00'), Decimal('760.00')))
+        self.assertEqual((delivered.tax_amount, delivered.total_amount), (Decimal('0.00'), Decimal('1.00')))
+
+    def test_quote_totals_include_vat(self):
+        self.assertEqual(price_quote(Decimal('123.45'), 10), Decimal('1394.98'))
+
+        quote = QuoteRequest(
+            user=self.user, fabric_type='Silk', quantity_needed=100, preferred_colors='red',
+            usage_description='Saree', delivery_location='Pokhara', customer_message='Price?',
+            quoted_price=Decimal('450.00'),
+        )
+        QuoteRequestAdmin(QuoteRequest, admin.site).save_model(None, quote, None, False)
+        self.assertEqual(QuoteRequest.objects.get(pk=quote.pk).quoted_total, Decimal('50850.00'))
+
+        # A total given by the admin is kept
+        quote.quoted_total = Decimal('48000.00')
+        QuoteRequestAdmin(QuoteRequest, admin.site).save_model(None, quote, None, True)
+        self.assertEqual(QuoteRequest.objects.get(pk=quote.pk).quoted_total, Decimal('48000.00'))
+
+
+class OrderAdminActionTests(OrderTestCase):
+    """Bulk status changes in the admin keep the customer's totals current"""
+
+    def test_status_actions_queue_a_recount_of_customer_totals(self):
+        profile = UserProfile.objects.create(user=self.user)
+        self.add_lines(1)
+        order = Order.objects.get(pk=self.checkout()[0].json()['order']['id'])
+        Task.objects.all().delete()
+        Order.objects.filter(pk=order.pk).update(payment_status='paid')
+
+        staff = get_user_model().objects.create_superuser(email='admin@example.com', username='admin', password='secret')
+        self.client.force_login(staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/orders/order/', {
+                'action': 'mark_as_confirmed', '_selected_action': [str(order.pk)],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task.objects.filter(name__endswith='update_customer_totals').count(), 1)
+
+        taskqueue.run_pending()
+        profile.refresh_from_db()
+        self.assertEqual((profile.total_orders, profile.total_spent), (1, order.total_amount))
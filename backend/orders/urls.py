@@ -8,5 +8,6 @@ router.register('orders', views.OrderViewSet, basename='orders')
 router.register('quotes', views.QuoteRequestViewSet, basename='quotes')
 
 urlpatterns = [
+    path('admin/sales-summary/', views.SalesSummaryView.as_view(), name='admin-sales-summary'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,18 +1,32 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from datetime import date, timedelta
+
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
-from cart.models import Cart
+from django.db.models import Prefetch
+from cart.models import Cart, CartItem
+from cart.reservations import InsufficientStock
+from core.idempotency import idempotent
 from accounts.models import UserAddress
 from .models import Order, OrderItem, OrderStatusHistory, QuoteRequest
+from .pricing import price_cart
+from .rollups import SUMMARY_GROUPS, summary
+from .stats import order_stats
+from .stock import restore_stock, take_stock
+from .tasks import notify_new_quote
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, CreateOrderSerializer,
     OrderStatusHistorySerializer, QuoteRequestSerializer, CreateQuoteRequestSerializer
 )
 
+MAX_SUMMARY_DAYS = 366
+MAX_SUMMARY_LIMIT = 100
+
 
 class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     """Order management for customers"""
@@ -28,7 +42,7 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     
     def list(self, request):
         """Get user's order history"""
-        queryset = self.get_queryset().order_by('-created_at')
+        queryset = self.get_queryset().with_item_totals().order_by('-created_at')
         
         # Filter by status if provided
         status_filter = request.query_params.get('status')
@@ -45,6 +59,7 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
+    @idempotent
     def create_from_cart(self, request):
         """Create order from shopping cart"""
         serializer = CreateOrderSerializer(data=request.data, context={'request': request})
@@ -55,116 +70,103 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def _create_order_from_cart(self, request, validated_data):
-        """Internal method to create order from cart"""
+        """
+        Internal method to create order from cart. Takes a fixed number of
+        queries however many lines the cart has; stock is taken with one
+        UPDATE (see orders/stock.py).
+        """
+        # Taken outside the transaction so the number comes from this process's block
+        order_number = Order.generate_order_number()
+        try:
+            with transaction.atomic():
+                return self._place_order(request, validated_data, order_number)
+        except InsufficientStock as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def _place_order(self, request, validated_data, order_number):
+        # Lock the cart so a double-submitted checkout waits and then finds it empty
+        cart = Cart.objects.select_for_update().filter(user=request.user).prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product').order_by('created_at'))
+        ).first()
+        cart_items = list(cart.items.all()) if cart else []
+        if not cart_items:
+            return Response({
+                'error': 'कार्ट खाली छ।'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Get user's cart
-            try:
-                cart = Cart.objects.get(user=request.user)
-            except Cart.DoesNotExist:
-                return Response({
-                    'error': 'कार्ट खाली छ।'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            if not cart.items.exists():
-                return Response({
-                    'error': 'कार्ट खाली छ।'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Get addresses
-            shipping_address = get_object_or_404(
-                UserAddress, 
-                id=validated_data['shipping_address_id'], 
+        # Get addresses
+        shipping_address = get_object_or_404(
+            UserAddress, 
+            id=validated_data['shipping_address_id'], 
+            user=request.user
+        )
+        
+        billing_address = shipping_address
+        if not validated_data.get('use_shipping_as_billing') and validated_data.get('billing_address_id'):
+            billing_address = get_object_or_404(
+                UserAddress,
+                id=validated_data['billing_address_id'],
                 user=request.user
             )
-            
-            billing_address = shipping_address
-            if not validated_data.get('use_shipping_as_billing') and validated_data.get('billing_address_id'):
-                billing_address = get_object_or_404(
-                    UserAddress,
-                    id=validated_data['billing_address_id'],
-                    user=request.user
-                )
-            
-            # Calculate order totals
-            is_wholesale = request.user.is_wholesale_customer
-            subtotal = cart.total_wholesale_amount if is_wholesale else cart.total_amount
-            
-            discount_amount = 0
-            if is_wholesale and request.user.wholesale_discount > 0:
-                discount_amount = subtotal * (request.user.wholesale_discount / 100)
-            
-            taxable_amount = subtotal - discount_amount
-            tax_amount = taxable_amount * 0.13  # 13% VAT
-            
-            # Calculate shipping
-            shipping_cost = self._calculate_shipping_cost(cart, request.user)
-            
-            total_amount = subtotal - discount_amount + tax_amount + shipping_cost
-            
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                shipping_address=shipping_address,
-                billing_address=billing_address,
-                payment_method=validated_data['payment_method'],
-                subtotal=subtotal,
-                discount_amount=discount_amount,
-                tax_amount=tax_amount,
-                shipping_cost=shipping_cost,
-                total_amount=total_amount,
-                is_wholesale_order=is_wholesale,
-                wholesale_discount_percent=request.user.wholesale_discount if is_wholesale else 0,
-                delivery_instructions=validated_data.get('delivery_instructions', ''),
-                customer_notes=validated_data.get('customer_notes', ''),
-                estimated_delivery_date=self._calculate_delivery_date(),
-            )
-            
-            # Create order items from cart items
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    product_name=cart_item.product.name,
-                    quantity=cart_item.quantity,
-                    unit_price=cart_item.unit_price,
-                    wholesale_price=cart_item.wholesale_price,
-                    preferred_colors=cart_item.preferred_colors,
-                    special_instructions=cart_item.special_instructions,
-                )
-                
-                # Update product stock
-                product = cart_item.product
-                product.stock_quantity -= cart_item.quantity
-                product.save()
-            
-            # Create initial status history
-            OrderStatusHistory.objects.create(
+        
+        # Take stock first: lines are unique per product, and other carts' reservations are respected
+        take_stock({item.product_id: item.quantity for item in cart_items}, cart=cart)
+        
+        # Calculate order totals (from the prefetched items, no extra query)
+        pricing = price_cart(cart, request.user)
+        
+        # Create order
+        order = Order.objects.create(
+            order_number=order_number,
+            user=request.user,
+            shipping_address=shipping_address,
+            billing_address=billing_address,
+            payment_method=validated_data['payment_method'],
+            subtotal=pricing.subtotal,
+            discount_amount=pricing.discount_amount,
+            tax_amount=pricing.tax_amount,
+            shipping_cost=pricing.shipping_cost,
+            total_amount=pricing.total_amount,
+            is_wholesale_order=pricing.is_wholesale,
+            wholesale_discount_percent=pricing.wholesale_discount_percent,
+            delivery_instructions=validated_data.get('delivery_instructions', ''),
+            customer_notes=validated_data.get('customer_notes', ''),
+            estimated_delivery_date=self._calculate_delivery_date(),
+        )
+        
+        # Create order items from cart items
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                status='pending',
-                notes='आदेश सिर्जना गरियो।',
-                created_by=request.user
+                product=cart_item.product,
+                product_name=cart_item.product.name,
+                quantity=cart_item.quantity,
+                unit_price=cart_item.unit_price,
+                wholesale_price=cart_item.wholesale_price,
+                preferred_colors=cart_item.preferred_colors,
+                special_instructions=cart_item.special_instructions,
             )
-            
-            # Clear cart
-            cart.clear()
-            
-            # Serialize response
-            serializer = OrderDetailSerializer(order)
-            
-            return Response({
-                'message': 'आदेश सफलतापूर्वक बनाइयो।',
-                'order': serializer.data
-            }, status=status.HTTP_201_CREATED)
-    
-    def _calculate_shipping_cost(self, cart, user):
-        """Calculate shipping cost"""
-        base_shipping = 100
+            for cart_item in cart_items
+        ])
+        
+        # Create initial status history
+        OrderStatusHistory.objects.create(
+            order=order,
+            status='pending',
+            notes='आदेश सिर्जना गरियो।',
+            created_by=request.user
+        )
         
-        if user.is_wholesale_customer or cart.total_amount > 5000:
-            return 0
+        # Clear cart (its reservations go with it)
+        cart.clear()
         
-        return base_shipping
+        # Serialize response
+        serializer = OrderDetailSerializer(order)
+        
+        return Response({
+            'message': 'आदेश सफलतापूर्वक बनाइयो।',
+            'order': serializer.data
+        }, status=status.HTTP_201_CREATED)
     
     def _calculate_delivery_date(self):
         """Calculate estimated delivery date"""
@@ -176,21 +178,23 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
         """Cancel an order"""
         order = self.get_object()
         
-        if not order.can_cancel:
-            return Response({
-                'error': 'यो आदेश रद्द गर्न सकिँदैन।'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
         with transaction.atomic():
-            # Update order status
+            # Claim the order with a conditional UPDATE: of two concurrent
+            # cancels only one changes the row, so stock is restored once
+            claimed = Order.objects.filter(pk=order.pk, status__in=Order.CANCELLABLE_STATUSES).update(
+                status='cancelled', updated_at=timezone.now(),
+            )
+            if not claimed:
+                return Response({
+                    'error': 'यो आदेश रद्द गर्न सकिँदैन।'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Save as well, for the post_save receivers (rollups, customer totals)
             order.status = 'cancelled'
-            order.save()
+            order.save(update_fields=['status', 'updated_at'])
             
-            # Restore product stock
-            for item in order.items.all():
-                product = item.product
-                product.stock_quantity += item.quantity
-                product.save()
+            # Restore product stock (one UPDATE for all lines)
+            restore_stock(order.items.all())
             
             # Add status history
             OrderStatusHistory.objects.create(
@@ -213,21 +217,7 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
         """Get order dashboard statistics"""
-        user_orders = self.get_queryset()
-        
-        stats = {
-            'total_orders': user_orders.count(),
-            'pending_orders': user_orders.filter(status='pending').count(),
-            'confirmed_orders': user_orders.filter(status='confirmed').count(),
-            'shipped_orders': user_orders.filter(status='shipped').count(),
-            'delivered_orders': user_orders.filter(status='delivered').count(),
-            'cancelled_orders': user_orders.filter(status='cancelled').count(),
-            'total_spent': float(user_orders.filter(
-                payment_status='paid'
-            ).aggregate(total=models.Sum('total_amount'))['total'] or 0),
-        }
-        
-        return Response(stats)
+        return Response(order_stats(request.user.pk))
 
 
 class QuoteRequestViewSet(viewsets.ModelViewSet):
@@ -245,15 +235,16 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new quote request"""
         serializer = self.get_serializer(data=request.data)
         
         if serializer.is_valid():
-            quote_request = serializer.save()
+            quote_request = serializer.save(user=request.user)
             
-            # TODO: Send notification to admin
-            # TODO: If WhatsApp enabled, send WhatsApp message
+            # Staff are notified by the task worker
+            notify_new_quote.enqueue_on_commit(quote_id=str(quote_request.pk))
             
             response_serializer = QuoteRequestSerializer(quote_request)
             return Response({
@@ -305,5 +296,39 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
         return Response({'message': 'कोटेशन अस्वीकार गरियो।'})
 
 
-# Import models for the stats function
-from django.db import models
\ No newline at end of file
+class SalesSummaryView(APIView):
+    """
+    Admin: GET /api/admin/sales-summary/?start=YYYY-MM-DD&end=YYYY-MM-DD&group=day&limit=
+    Sales totals read from the daily rollups (orders/rollups.py), grouped by
+    day, channel, payment_method, product, category or material. Defaults to
+    the last 30 days by day; at most MAX_SUMMARY_DAYS days and
+    MAX_SUMMARY_LIMIT rows (0 for all) are allowed. Rows carry gross_revenue (order totals) when
+    grouped by day, channel or payment_method and line_revenue (line prices
+    before VAT) otherwise, as decimal strings.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        today = timezone.localdate()
+        group = request.query_params.get('group', 'day')
+        try:
+            start = date.fromisoformat(request.query_params.get('start') or (today - timedelta(days=29)).isoformat())
+            end = date.fromisoformat(request.query_params.get('end') or today.isoformat())
+            limit = int(request.query_params.get('limit') or 0)
+        except ValueError:
+            return Response({'error': 'मिति YYYY-MM-DD ढाँचामा दिनुहोस्।'}, status=status.HTTP_400_BAD_REQUEST)
+        if group not in SUMMARY_GROUPS:
+            return Response({'error': f"group यीमध्ये एक हुनुपर्छ: {', '.join(SUMMARY_GROUPS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= MAX_SUMMARY_DAYS:
+            return Response({'error': f'start end भन्दा अघि र बढीमा {MAX_SUMMARY_DAYS} दिनको हुनुपर्छ।'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= limit <= MAX_SUMMARY_LIMIT:
+            return Response({'error': f'limit 0-{MAX_SUMMARY_LIMIT} हुनुपर्छ।'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'start': start,
+            'end': end,
+            'group': group,
+            'rows': summary(start, end, group, limit=limit),
+        })
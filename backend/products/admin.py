@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductReview
+from .models import Category, Product, ProductImage, ProductReview, MediaBlob, SearchQueryLog
+from .paginators import EstimatedCountPaginator
+from .thumbnails import get_thumbnail_url
 
 
 class ProductImageInline(admin.TabularInline):
@@ -10,7 +12,7 @@ class ProductImageInline(admin.TabularInline):
 
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 50px;"/>', obj.image.url)
+            return format_html('<img src="{}" style="max-height: 50px;"/>', get_thumbnail_url(obj, (100, 100)))
         return "No image"
     image_preview.short_description = "Preview"
 
@@ -27,13 +29,18 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'material', 'gsm', 'price_per_meter', 'stock_quantity', 'is_available', 'is_featured', 'tags')
+    list_display = ('name', 'main_image_preview', 'category', 'material', 'gsm', 'price_per_meter', 'stock_quantity', 'is_available', 'is_featured', 'tags')
     list_filter = ('category', 'material', 'usage', 'is_available', 'is_featured', 'tags', 'created_at')
     search_fields = ('name', 'description', 'slug')
     list_editable = ('is_available', 'is_featured', 'stock_quantity')
     readonly_fields = ('id', 'created_at', 'updated_at', 'main_image_preview')
     prepopulated_fields = {'slug': ('name',)}
     filter_horizontal = ()
+
+    # Large catalogs: join categories, prefetch images, skip the unfiltered COUNT
+    list_select_related = ('category',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     fieldsets = (
         ('Basic Information', {
@@ -60,9 +67,13 @@ class ProductAdmin(admin.ModelAdmin):
     
     inlines = [ProductImageInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('images')
+
     def main_image_preview(self, obj):
-        if obj.main_image:
-            return format_html('<img src="{}" style="max-height: 100px;"/>', obj.main_image)
+        image = obj.primary_image
+        if image:
+            return format_html('<img src="{}" style="max-height: 100px;"/>', get_thumbnail_url(image, (200, 200)))
         return "No image"
     main_image_preview.short_description = "Main Image Preview"
 
@@ -79,16 +90,19 @@ class ProductImageAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'alt_text')
     list_editable = ('is_primary', 'sort_order')
     readonly_fields = ('id', 'image_preview_large', 'created_at')
+    list_select_related = ('product',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 50px;"/>', obj.image.url)
+            return format_html('<img src="{}" style="max-height: 50px;"/>', get_thumbnail_url(obj, (100, 100)))
         return "No image"
     image_preview.short_description = "Preview"
 
     def image_preview_large(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 200px;"/>', obj.image.url)
+            return format_html('<img src="{}" style="max-height: 200px;"/>', get_thumbnail_url(obj, (400, 400)))
         return "No image"
     image_preview_large.short_description = "Image Preview"
 
@@ -100,6 +114,9 @@ class ProductReviewAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'customer_name', 'customer_email', 'review_text')
     list_editable = ('is_approved',)
     readonly_fields = ('id', 'created_at')
+    list_select_related = ('product',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     fieldsets = (
         ('Review Information', {
@@ -112,4 +129,21 @@ class ProductReviewAdmin(admin.ModelAdmin):
             'fields': ('id', 'created_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'ref_count', 'size', 'created_at')
+    search_fields = ('name', 'digest')
+    readonly_fields = ('name', 'digest', 'size', 'ref_count', 'created_at')
+
+
+@admin.register(SearchQueryLog)
+class SearchQueryLogAdmin(admin.ModelAdmin):
+    list_display = ('query', 'result_count', 'latency_ms', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('normalized_query',)
+    readonly_fields = ('query', 'normalized_query', 'result_count', 'latency_ms', 'created_at')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
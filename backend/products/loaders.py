@@ -0,0 +1,76 @@
+"""
+Request-scoped identity map for products.
+
+Serializers, views and models that need the same Product within one request
+resolve it through the request's ProductLoader, so each product row is read
+at most once per request and lookups of several products share one
+``id__in`` query.
+"""
+import uuid
+
+from .models import Product
+
+REQUEST_ATTRIBUTE = '_product_loader'
+
+
+def _normalize(pk):
+    if isinstance(pk, uuid.UUID):
+        return pk
+    try:
+        return uuid.UUID(str(pk))
+    except ValueError:
+        return None
+
+
+class ProductLoader:
+    """Loads products by id, remembering hits and misses"""
+
+    def __init__(self, queryset=None):
+        self.queryset = queryset if queryset is not None else Product.objects.all()
+        self._products = {}
+
+    def prime(self, *products):
+        """Remember products that were already fetched elsewhere"""
+        for product in products:
+            self._products[product.pk] = product
+
+    def get_many(self, ids):
+        """Return ``{id: Product}`` for the ids that exist, in one query for the unseen ones"""
+        keys = [key for key in (_normalize(pk) for pk in ids) if key is not None]
+        missing = [key for key in keys if key not in self._products]
+        if missing:
+            found = self.queryset.in_bulk(missing)
+            for key in missing:
+                self._products[key] = found.get(key)
+        return {key: self._products[key] for key in keys if self._products[key] is not None}
+
+    def get(self, pk):
+        """Return the product with this id, or None"""
+        key = _normalize(pk)
+        if key is None:
+            return None
+        return self.get_many([key]).get(key)
+
+    def clear(self, *ids):
+        """Forget the given products (or all of them), e.g. after updating stock"""
+        if not ids:
+            self._products.clear()
+        for pk in ids:
+            self._products.pop(_normalize(pk), None)
+
+
+def get_product_loader(request):
+    """
+    Return the ProductLoader of ``request``, creating it on first use. Works
+    with both DRF and plain Django requests; without a request a throwaway
+    loader is returned.
+    """
+    if request is None:
+        return ProductLoader()
+    # Store on the underlying HttpRequest so DRF views and Django code share it
+    request = getattr(request, '_request', request)
+    loader = getattr(request, REQUEST_ATTRIBUTE, None)
+    if loader is None:
+        loader = ProductLoader()
+        setattr(request, REQUEST_ATTRIBUTE, loader)
+    return loader
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.models import ProductImage
+from products.thumbnails import build_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Build missing admin thumbnails of product images (new uploads are handled by the worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        built = 0
+        images = ProductImage.objects.filter(thumbnails_ready=False).exclude(image='').only('pk', 'image')
+        for image in images.iterator(chunk_size=options['chunk_size']):
+            if build_thumbnails(image.image):
+                ProductImage.objects.filter(pk=image.pk).update(thumbnails_ready=True)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built thumbnails for {built} images"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 17:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_media_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchQueryLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("query", models.CharField(max_length=200)),
+                ("normalized_query", models.CharField(max_length=200)),
+                ("result_count", models.PositiveIntegerField()),
+                ("latency_ms", models.FloatField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["created_at"], name="products_se_created_ea979b_idx"
+                    ),
+                    models.Index(
+                        fields=["normalized_query", "created_at"],
+                        name="products_se_normali_e34915_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
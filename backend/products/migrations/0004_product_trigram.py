@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-19 17:45
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def trigrams(text):
+    # Frozen copy of products.trigrams.trigrams, so later changes to the app
+    # code cannot change or break this migration
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def build_trigram_index(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductTrigram = apps.get_model("products", "ProductTrigram")
+    materials = dict(Product._meta.get_field("material").choices)
+
+    rows = []
+    for product in Product.objects.iterator(chunk_size=500):
+        text = " ".join([
+            product.name,
+            product.material,
+            materials.get(product.material, ""),
+            product.colors_available,
+            product.primary_color,
+        ])
+        rows.extend(
+            ProductTrigram(product_id=product.pk, trigram=gram) for gram in trigrams(text)
+        )
+    ProductTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_search_query_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductTrigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trigram", models.CharField(max_length=3)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trigrams",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("trigram", "product")},
+            },
+        ),
+        migrations.RunPython(build_trigram_index, migrations.RunPython.noop),
+    ]
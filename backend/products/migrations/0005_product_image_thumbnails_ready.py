@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_product_trigram"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="thumbnails_ready",
+            field=models.BooleanField(
+                default=False, editable=False, help_text="Set by the thumbnail task"
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .storage import product_image_storage
 import uuid
 
 User = get_user_model()
@@ -129,14 +131,53 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so post_save receivers can tell what a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def changes(self, fields):
+        """
+        ``{attname: value when loaded}`` for those of ``fields`` that differ
+        from when the product was loaded or last saved; meant for post_save
+        receivers. Products not loaded from the database count as changed in
+        every field, with None as the old value.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return dict.fromkeys(fields)
+        return {
+            field: loaded[field] for field in fields
+            if field in loaded and field in self.__dict__ and loaded[field] != self.__dict__[field]
+        }
+
+    @property
+    def primary_image(self):
+        """Return the primary ProductImage, or fallback to first image"""
+        # Use prefetched images when available so listings don't query per row
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('images')
+        if prefetched is not None:
+            images = list(prefetched)
+            for image in images:
+                if image.is_primary:
+                    return image
+            return images[0] if images else None
+        return self.images.filter(is_primary=True).first() or self.images.first()
+
     @property
     def main_image(self):
         """Return the primary image URL, or fallback to first image"""
-        primary_image = self.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image.url
-        fallback_image = self.images.first()
-        return fallback_image.image.url if fallback_image else None
+        image = self.primary_image
+        return image.image.url if image else None
         
     @property
     def available_colors_list(self):
@@ -153,10 +194,11 @@ class ProductImage(models.Model):
     """Product images model"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', storage=product_image_storage)
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     sort_order = models.PositiveIntegerField(default=0)
+    thumbnails_ready = models.BooleanField(default=False, editable=False, help_text="Set by the thumbnail task")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -172,6 +214,18 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
 
 
+class MediaBlob(models.Model):
+    """Reference-counted, content-addressed file written by ContentAddressedStorage"""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage path of the file")
+    digest = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the file content")
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
 class ProductReview(models.Model):
     """Product reviews and ratings"""
     RATING_CHOICES = [
@@ -195,4 +249,35 @@ class ProductReview(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Review for {self.product.name} by {self.customer_name}"
\ No newline at end of file
+        return f"Review for {self.product.name} by {self.customer_name}"
+
+
+class SearchQueryLog(models.Model):
+    """One product search, written in batches by products.search_analytics"""
+    query = models.CharField(max_length=200)
+    normalized_query = models.CharField(max_length=200)
+    result_count = models.PositiveIntegerField()
+    latency_ms = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['normalized_query', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.result_count} results)"
+
+
+class ProductTrigram(models.Model):
+    """Trigram of a product's name, material or colors, for typo-tolerant search"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ['trigram', 'product']
+
+    def __str__(self):
+        return f"{self.trigram!r} -> {self.product_id}"
@@ -0,0 +1,130 @@
+"""
+Buffered search logging for product_search.
+
+Requests only append to an in-process ring buffer; a daemon thread drains it
+into SearchQueryLog with bulk_create every few seconds (or sooner once a batch
+is full). If the buffer overflows before a flush the oldest entries are
+dropped, and anything still buffered when the process exits is lost; this
+is analytics, so a slow database must never back up into search latency.
+"""
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SEARCH_ANALYTICS = getattr(settings, 'SEARCH_ANALYTICS', {})
+ENABLED = SEARCH_ANALYTICS.get('ENABLED', True)
+BUFFER_SIZE = SEARCH_ANALYTICS.get('BUFFER_SIZE', 10000)
+BATCH_SIZE = SEARCH_ANALYTICS.get('BATCH_SIZE', 500)
+FLUSH_INTERVAL = SEARCH_ANALYTICS.get('FLUSH_INTERVAL', 5)
+
+_buffer = deque(maxlen=BUFFER_SIZE)
+_wakeup = threading.Event()
+_start_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_worker = None
+_worker_pid = None
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so 'Silk  Saree' == 'silk saree'"""
+    return ' '.join(query.lower().split())[:200]
+
+
+def record_search(query, result_count, latency_ms):
+    """Queue one search for logging. Never touches the database."""
+    if not ENABLED:
+        return
+    _buffer.append((query[:200], normalize_query(query), result_count, latency_ms, timezone.now()))
+    _ensure_worker()
+    if len(_buffer) >= BATCH_SIZE:
+        _wakeup.set()
+
+
+def flush():
+    """Write everything currently buffered. Returns the number of rows written."""
+    from .models import SearchQueryLog
+
+    written = 0
+    with _flush_lock:
+        while _buffer:
+            batch = []
+            while _buffer and len(batch) < BATCH_SIZE:
+                batch.append(_buffer.popleft())
+            SearchQueryLog.objects.bulk_create([
+                SearchQueryLog(
+                    query=query,
+                    normalized_query=normalized,
+                    result_count=result_count,
+                    latency_ms=latency_ms,
+                    created_at=created_at,
+                )
+                for query, normalized, result_count, latency_ms, created_at in batch
+            ])
+            written += len(batch)
+    return written
+
+
+def _run():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Failed to flush search analytics")
+        finally:
+            close_old_connections()
+
+
+def _ensure_worker():
+    global _worker, _worker_pid
+    # A forked worker process inherits the buffer but not the thread
+    if _worker is not None and _worker_pid == os.getpid() and _worker.is_alive():
+        return
+    with _start_lock:
+        if _worker is not None and _worker_pid == os.getpid() and _worker.is_alive():
+            return
+        _worker_pid = os.getpid()
+        _worker = threading.Thread(target=_run, name='search-analytics', daemon=True)
+        _worker.start()
+
+
+def search_report(since, limit=20):
+    """Top queries, top zero-result queries and latency percentiles since ``since``"""
+    from .models import SearchQueryLog
+
+    logs = SearchQueryLog.objects.filter(created_at__gte=since)
+    top_queries = (
+        logs.values('normalized_query')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'normalized_query')[:limit]
+    )
+    zero_result_queries = (
+        logs.filter(result_count=0)
+        .values('normalized_query')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'normalized_query')[:limit]
+    )
+
+    total = logs.count()
+    percentiles = {}
+    if total:
+        by_latency = logs.order_by('latency_ms').values_list('latency_ms', flat=True)
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            percentiles[name] = round(by_latency[min(total - 1, int(total * fraction))], 2)
+
+    return {
+        'total_searches': total,
+        'zero_result_searches': logs.filter(result_count=0).count(),
+        'top_queries': list(top_queries),
+        'top_zero_result_queries': list(zero_result_queries),
+        'latency_ms': percentiles,
+    }
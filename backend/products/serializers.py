@@ -16,6 +16,10 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'image', 'is_active', 'products_count']
     
     def get_products_count(self, obj):
+        # Querysets annotated with available_products_count skip the per-row COUNT
+        count = getattr(obj, 'available_products_count', None)
+        if count is not None:
+            return count
         return obj.products.filter(is_available=True).count()
 
 
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Product, ProductImage
+from .tasks import generate_thumbnails
+from .thumbnails import delete_thumbnails
+from .trigrams import INDEXED_FIELDS, index_product
+
+# Sent with ``product_ids`` after a commit in which bulk stock updates
+# (orders/stock.py), which send no post_save, ran products out of stock or
+# brought them back
+stock_status_changed = Signal()
+
+
+def _release_on_commit(storage, name):
+    # A rolled back delete or replace must keep its file
+    def release():
+        storage.delete(name)
+        # Gone with its last reference: its thumbnails have no user left either
+        if not storage.exists(name):
+            delete_thumbnails(name)
+
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=ProductImage)
+def remember_replaced_image(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    previous = ProductImage.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+    instance._replaced_image = previous if previous and previous != instance.image.name else None
+
+
+@receiver(post_save, sender=ProductImage)
+def handle_new_image_file(sender, instance, created, **kwargs):
+    """Release the file an image was replaced with another, and queue thumbnails for the new one"""
+    replaced = getattr(instance, '_replaced_image', None)
+    instance._replaced_image = None
+    if replaced and replaced != instance.image.name:
+        _release_on_commit(instance.image.storage, replaced)
+        if instance.thumbnails_ready:
+            ProductImage.objects.filter(pk=instance.pk).update(thumbnails_ready=False)
+            instance.thumbnails_ready = False
+    elif not created:
+        return
+    if instance.image:
+        generate_thumbnails.enqueue_on_commit(image_id=str(instance.pk))
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_product_image_file(sender, instance, **kwargs):
+    """Drop this image's reference so unshared files are removed from disk"""
+    if instance.image:
+        _release_on_commit(instance.image.storage, instance.image.name)
+
+
+@receiver(post_save, sender=Product)
+def update_product_trigrams(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the search trigram index in step with writes to the indexed fields"""
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    # Stock and price edits (admin list_editable) leave the index alone
+    if created or instance.changes(INDEXED_FIELDS):
+        index_product(instance)
@@ -0,0 +1,77 @@
+import hashlib
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that keeps one copy of each distinct upload.
+
+    Files are written to ``<upload dir>/<aa>/<sha256><ext>``, so uploading the
+    same fabric photo for several products lands on the same path. A MediaBlob
+    row tracks how many FileFields point at each path, and the file is only
+    removed from disk when the last reference is deleted.
+    """
+
+    def __init__(self, **kwargs):
+        # Two writers racing on the same path are writing identical bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def hash_content(content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name is derived from the content in _save()
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest = self.hash_content(content)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        blob_name = posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(
+                    name=blob_name, digest=digest, size=content.size, ref_count=1
+                )
+        except IntegrityError:
+            MediaBlob.objects.filter(name=blob_name).update(ref_count=F('ref_count') + 1)
+
+        if not self.exists(blob_name):
+            super()._save(blob_name, content)
+        return blob_name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Files stored before deduplication are not reference-counted
+                super().delete(name)
+                return
+            if blob.ref_count > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+        super().delete(name)
+
+
+product_image_storage = ContentAddressedStorage()
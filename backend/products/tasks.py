@@ -0,0 +1,15 @@
+"""Background tasks for products, run by ``manage.py runworker``"""
+from core.taskqueue import task
+from .models import ProductImage
+from .thumbnails import build_thumbnails
+
+
+@task
+def generate_thumbnails(image_id):
+    """Build the admin thumbnails of a product image and mark them ready"""
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return
+    # An unreadable upload keeps showing the original; retrying won't help
+    if build_thumbnails(image.image):
+        ProductImage.objects.filter(pk=image.pk, image=image.image.name).update(thumbnails_ready=True)
@@ -1,3 +1,294 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import uuid
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from core import taskqueue
+from . import search_analytics
+from .loaders import ProductLoader, get_product_loader
+from .models import Category, MediaBlob, Product, ProductImage, ProductTrigram, SearchQueryLog
+from .paginators import EstimatedCountPaginator, estimated_row_count
+from .storage import product_image_storage
+from .thumbnails import THUMBNAIL_SIZES, get_thumbnail_url, thumbnail_name
+
+
+def make_product(category, index=0, **fields):
+    defaults = dict(
+        name=f'Fabric {index}', slug=f'fabric-{index}', description='Fabric', category=category,
+        material='cotton', gsm=120, width='44', colors_available='blue', primary_color='blue',
+        usage='kurta', price_per_meter=Decimal('300.00'), wholesale_price=Decimal('250.00'),
+        stock_quantity=10,
+    )
+    defaults.update(fields)
+    return Product.objects.create(**defaults)
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = make_product(Category.objects.create(name='Cotton'))
+
+
+class ProductImageStorageTests(MediaTestCase):
+    """Identical uploads share one file, released when the last image lets go of it"""
+
+    def add_image(self, content, name='photo.jpg'):
+        return ProductImage.objects.create(product=self.product, image=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.add_image(b'same bytes', 'front.jpg')
+        second = self.add_image(b'same bytes', 'FRONT-copy.JPG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+        self.assertTrue(product_image_storage.exists(first.image.name))
+
+    def test_file_is_removed_with_its_last_reference(self):
+        first = self.add_image(b'shared')
+        second = self.add_image(b'shared')
+        name = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(product_image_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(product_image_storage.exists(name))
+
+    def test_delete_waits_for_the_commit(self):
+        image = self.add_image(b'kept until commit')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            image.delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(product_image_storage.exists(image.image.name))
+
+    def test_replacing_the_file_releases_the_old_one(self):
+        image = self.add_image(b'old photo')
+        old_name = image.image.name
+
+        image.image = SimpleUploadedFile('new.jpg', b'new photo')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertNotEqual(image.image.name, old_name)
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(product_image_storage.exists(old_name))
+        self.assertEqual(MediaBlob.objects.get(name=image.image.name).ref_count, 1)
+
+        # Saving without a new file keeps it
+        image.alt_text = 'Front'
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertTrue(product_image_storage.exists(image.image.name))
+
+
+class ThumbnailTests(MediaTestCase):
+    """Admin thumbnails are built by the worker, not while a changelist renders"""
+
+    def upload_photo(self):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'navy').save(buffer, format='PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile('photo.png', buffer.getvalue()), is_primary=True,
+            )
+
+    def test_worker_builds_thumbnails_and_changelist_does_no_file_io(self):
+        image = self.upload_photo()
+        self.assertFalse(image.thumbnails_ready)
+        taskqueue.run_pending()
+        image.refresh_from_db()
+        self.assertTrue(image.thumbnails_ready)
+        self.assertTrue(default_storage.exists(thumbnail_name(image.image.name, (100, 100))))
+
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret',
+        )
+        self.client.force_login(admin)
+        with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError('storage stat')):
+            response = self.client.get('/admin/products/productimage/')
+        self.assertContains(response, thumbnail_name(image.image.name, (100, 100)))
+
+    def test_thumbnails_are_deleted_with_the_last_reference(self):
+        first = self.upload_photo()
+        second = self.upload_photo()
+        taskqueue.run_pending()
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        thumbnails = [thumbnail_name(name, size) for size in THUMBNAIL_SIZES]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(default_storage.exists(thumbnail) for thumbnail in thumbnails))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(any(default_storage.exists(thumbnail) for thumbnail in thumbnails))
+
+    def test_original_is_shown_until_thumbnails_exist(self):
+        image = self.upload_photo()
+        self.assertEqual(get_thumbnail_url(image, (100, 100)), image.image.url)
+
+
+class EstimatedCountTests(TestCase):
+    """Unfiltered changelists of big tables take their count from table statistics"""
+
+    def test_sqlite_estimate_comes_from_index_statistics(self):
+        category = Category.objects.create(name='Linen')
+        for i in range(3):
+            make_product(category, i)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for i in range(3, 5):
+            make_product(category, i)
+
+        self.assertEqual(estimated_row_count(Product), 3)
+        with mock.patch('products.paginators.ESTIMATE_THRESHOLD', 1):
+            paginator = EstimatedCountPaginator(Product.objects.all(), 100)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(paginator.count, 3)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+            filtered = EstimatedCountPaginator(Product.objects.filter(gsm=120), 100)
+            self.assertEqual(filtered.count, 5)
+
+
+@mock.patch('products.search_analytics._ensure_worker')
+class SearchAnalyticsTests(TestCase):
+    """Searches are buffered in memory and written in batches; admins get a report"""
+
+    def setUp(self):
+        search_analytics._buffer.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            email='admin@example.com', username='admin', password='secret', is_staff=True,
+        ))
+
+    def test_buffered_searches_are_flushed_in_batches(self, ensure_worker):
+        with mock.patch.object(search_analytics, 'BATCH_SIZE', 2):
+            for query, results, latency in [('Silk  Saree', 3, 10.0), ('silk saree', 1, 20.0), ('chifon', 0, 30.0)]:
+                search_analytics.record_search(query, results, latency)
+            self.assertFalse(SearchQueryLog.objects.exists())
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(search_analytics.flush(), 3)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(search_analytics.flush(), 0)
+
+        report = self.client.get('/api/admin/search-analytics/?days=7&limit=1').json()
+        self.assertEqual(report['total_searches'], 3)
+        self.assertEqual(report['zero_result_searches'], 1)
+        self.assertEqual(report['top_queries'], [{'normalized_query': 'silk saree', 'count': 2}])
+        self.assertEqual(report['top_zero_result_queries'], [{'normalized_query': 'chifon', 'count': 1}])
+        self.assertEqual(report['latency_ms']['p50'], 20.0)
+
+    def test_full_buffer_drops_the_oldest_searches(self, ensure_worker):
+        with mock.patch.object(search_analytics, '_buffer', search_analytics.deque(maxlen=2)):
+            for query in ['linen', 'silk', 'wool']:
+                search_analytics.record_search(query, 1, 5.0)
+            search_analytics.flush()
+        self.assertEqual(sorted(SearchQueryLog.objects.values_list('query', flat=True)), ['silk', 'wool'])
+
+    def test_out_of_range_parameters_are_rejected(self, ensure_worker):
+        for params in ['limit=-1', 'limit=0', 'limit=1000', 'days=0', 'days=-5', 'days=100000', 'days=x']:
+            response = self.client.get(f'/api/admin/search-analytics/?{params}')
+            self.assertEqual(response.status_code, 400, params)
+
+
+@mock.patch('products.search_analytics._ensure_worker')
+class TrigramSearchTests(TestCase):
+    """Misspelt searches find products through the trigram index"""
+
+    def setUp(self):
+        search_analytics._buffer.clear()
+        category = Category.objects.create(name='Georgette')
+        self.georgette = make_product(category, 0, name='Printed Georgette', material='georgette')
+        make_product(category, 1, name='Plain Khadi', material='khadi')
+
+    def search(self, query):
+        response = APIClient().get('/api/search/', {'q': query})
+        return [product['name'] for product in response.json()['results']]
+
+    def test_misspelling_finds_the_product(self, ensure_worker):
+        self.assertEqual(self.search('georgete'), ['Printed Georgette'])
+        self.assertEqual(self.search('khaddi'), ['Plain Khadi'])
+        self.assertEqual(self.search('velvet'), [])
+
+    def test_only_indexed_field_changes_reindex(self, ensure_worker):
+        product = Product.objects.get(pk=self.georgette.pk)
+        with mock.patch('products.signals.index_product') as index_product:
+            product.stock_quantity = 3
+            product.price_per_meter = Decimal('350.00')
+            product.save()
+            index_product.assert_not_called()
+
+            product.name = 'Printed Chiffon'
+            product.save()
+            index_product.assert_called_once_with(product)
+
+    def test_renamed_product_is_found_under_its_new_name(self, ensure_worker):
+        product = Product.objects.get(pk=self.georgette.pk)
+        product.name = 'Printed Chiffon'
+        product.material = 'chiffon'
+        product.save()
+        self.assertEqual(self.search('chifon'), ['Printed Chiffon'])
+        self.assertFalse(ProductTrigram.objects.filter(product=product, trigram='geo').exists())
+
+
+class ProductLoaderTests(TestCase):
+    """Each product is read at most once per loader, and unseen ones in one query"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Chiffon')
+        self.first = make_product(category, 0)
+        self.second = make_product(category, 1)
+
+    def test_second_load_is_served_from_the_identity_map(self):
+        loader = ProductLoader()
+        with self.assertNumQueries(1):
+            product = loader.get(self.first.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(loader.get(str(self.first.pk)), product)
+            self.assertIs(loader.get_many([self.first.pk])[self.first.pk], product)
+
+    def test_unseen_products_are_loaded_together_and_misses_remembered(self):
+        loader = ProductLoader()
+        loader.get(self.first.pk)
+        missing = uuid.uuid4()
+        with self.assertNumQueries(1):
+            products = loader.get_many([self.first.pk, self.second.pk, missing, 'not-a-uuid'])
+        self.assertEqual(set(products), {self.first.pk, self.second.pk})
+        with self.assertNumQueries(0):
+            self.assertIsNone(loader.get(missing))
+            self.assertIsNone(loader.get('not-a-uuid'))
+
+    def test_primed_products_are_not_read_and_cleared_ones_are_read_again(self):
+        loader = ProductLoader()
+        loader.prime(self.first)
+        with self.assertNumQueries(0):
+            self.assertIs(loader.get(self.first.pk), self.first)
+        loader.clear(self.first.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNot(loader.get(self.first.pk), self.first)
+
+    def test_drf_and_django_requests_share_one_loader(self):
+        request = RequestFactory().get('/')
+        self.assertIs(get_product_loader(Request(request)), get_product_loader(request))
+        self.assertIsNot(get_product_loader(None), get_product_loader(None))
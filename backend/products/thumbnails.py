@@ -0,0 +1,64 @@
+"""
+Downscaled JPEG previews of product images for the admin.
+
+Thumbnails are built in the background after an image is saved (the
+generate_thumbnails task in products/tasks.py), never while a changelist
+renders. ProductImage.thumbnails_ready records that they exist, so the
+admin picks the URL without touching storage and shows the original until
+the worker has caught up. Product images are stored under their content
+hash, so each derivative is built once per distinct image, and is deleted
+with the image file when its last reference goes (products/signals.py).
+"""
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_SIZES = [(100, 100), (200, 200), (400, 400)]
+
+
+def thumbnail_name(name, size):
+    width, height = size
+    root = posixpath.splitext(name)[0]
+    return posixpath.join(THUMBNAIL_DIR, f"{width}x{height}", f"{root}.jpg")
+
+
+def build_thumbnails(image_field, sizes=THUMBNAIL_SIZES):
+    """Write the missing thumbnails of ``image_field``; returns False if the source can't be read"""
+    missing = [size for size in sizes if not default_storage.exists(thumbnail_name(image_field.name, size))]
+    if not missing:
+        return True
+    try:
+        with image_field.open('rb') as source:
+            original = Image.open(source)
+            original.load()
+    except (OSError, UnidentifiedImageError):
+        return False
+
+    for size in missing:
+        image = original.copy()
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        default_storage.save(thumbnail_name(image_field.name, size), ContentFile(buffer.getvalue()))
+    return True
+
+
+def delete_thumbnails(name, sizes=THUMBNAIL_SIZES):
+    """Remove the thumbnails built from the file ``name``"""
+    for size in sizes:
+        default_storage.delete(thumbnail_name(name, size))
+
+
+def get_thumbnail_url(product_image, size=(100, 100)):
+    """URL of a ``size`` thumbnail of ``product_image``, or of the original until it is built"""
+    if not product_image.image:
+        return None
+    if product_image.thumbnails_ready and size in THUMBNAIL_SIZES:
+        return default_storage.url(thumbnail_name(product_image.image.name, size))
+    return product_image.image.url
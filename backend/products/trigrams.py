@@ -0,0 +1,88 @@
+"""
+Trigram index over product names, materials and colors.
+
+Each word is padded ("  silk ") and split into overlapping three-letter
+chunks, so a misspelling like "chifon" still shares most of its trigrams with
+"chiffon". A product's score for a query is the share of the query's trigrams
+it contains, which is cheap to compute with a single GROUP BY.
+"""
+import math
+import re
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Product, ProductTrigram
+
+INDEXED_FIELDS = ('name', 'material', 'colors_available', 'primary_color')
+MIN_SIMILARITY = 0.5
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def trigrams(text):
+    """Return the set of padded word trigrams in ``text``"""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def product_text(product):
+    material = dict(Product.MATERIAL_CHOICES).get(product.material, product.material)
+    return ' '.join([
+        product.name or '',
+        product.material or '',
+        material or '',
+        product.colors_available or '',
+        product.primary_color or '',
+    ])
+
+
+def _rows(product):
+    return [ProductTrigram(product_id=product.pk, trigram=gram) for gram in trigrams(product_text(product))]
+
+
+def index_product(product):
+    """Replace the trigrams of a single product"""
+    with transaction.atomic():
+        ProductTrigram.objects.filter(product_id=product.pk).delete()
+        ProductTrigram.objects.bulk_create(_rows(product))
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild the whole index in bulk. Returns the number of products indexed."""
+    indexed = 0
+    with transaction.atomic():
+        ProductTrigram.objects.all().delete()
+        rows = []
+        products = Product.objects.only('id', *INDEXED_FIELDS).order_by().iterator(chunk_size=batch_size)
+        for product in products:
+            rows.extend(_rows(product))
+            indexed += 1
+            if len(rows) >= batch_size * 20:
+                ProductTrigram.objects.bulk_create(rows, batch_size=batch_size * 20)
+                rows = []
+        ProductTrigram.objects.bulk_create(rows, batch_size=batch_size * 20)
+    return indexed
+
+
+def similar_product_ids(query, limit=20, exclude=(), min_similarity=MIN_SIMILARITY):
+    """
+    Return ``[(product_id, similarity)]`` for available products that share
+    at least ``min_similarity`` of the query's trigrams, best first.
+    """
+    grams = trigrams(query)
+    if not grams:
+        return []
+
+    matches = (
+        ProductTrigram.objects.filter(trigram__in=grams, product__is_available=True)
+        .exclude(product_id__in=exclude)
+        .values('product_id')
+        .annotate(hits=Count('id'))
+        .filter(hits__gte=max(1, math.ceil(len(grams) * min_similarity)))
+        .order_by('-hits')[:limit]
+    )
+    return [(match['product_id'], match['hits'] / len(grams)) for match in matches]
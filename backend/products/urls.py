@@ -21,5 +21,6 @@ urlpatterns = [
     
     # Additional endpoints
     path('search/', views.product_search, name='product-search'),
+    path('admin/search-analytics/', views.search_analytics, name='admin-search-analytics'),
     path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
 ]
\ No newline at end of file
@@ -1,23 +1,36 @@
 from rest_framework import generics, viewsets, filters, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count, Avg, Min, Max
 from django.db import models
+from django.utils import timezone
+from datetime import timedelta
+import time
+from core.idempotency import idempotent
 from .models import Category, Product, ProductImage, ProductReview
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
     ProductCreateUpdateSerializer, ProductImageSerializer, 
     ProductReviewSerializer, ProductReviewCreateSerializer
 )
+from .search_analytics import record_search, search_report
+from .trigrams import similar_product_ids
+
+SEARCH_LIMIT = 20
+# Bounds of the search analytics report parameters
+MAX_REPORT_DAYS = 365
+MAX_REPORT_LIMIT = 100
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for categories - read only for frontend
     """
-    queryset = Category.objects.filter(is_active=True).order_by('sort_order', 'name')
+    queryset = Category.objects.filter(is_active=True).annotate(
+        available_products_count=Count('products', filter=Q(products__is_available=True))
+    ).order_by('sort_order', 'name')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
     lookup_field = 'id'
@@ -144,6 +157,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    @idempotent
     def add_review(self, request, slug=None):
         """Add a review for a product"""
         product = self.get_object()
@@ -260,16 +274,52 @@ def product_search(request):
     if not query:
         return Response({'results': []})
     
-    products = Product.objects.filter(
+    started = time.perf_counter()
+    products = list(Product.objects.filter(
         Q(name__icontains=query) | 
         Q(description__icontains=query) |
         Q(material__icontains=query) |
         Q(colors_available__icontains=query),
         is_available=True
-    ).select_related('category').prefetch_related('images')[:20]
+    ).select_related('category').prefetch_related('images')[:SEARCH_LIMIT])
+    
+    # Top up with trigram matches so misspellings ("chifon") still find fabrics
+    if len(products) < SEARCH_LIMIT:
+        similar = similar_product_ids(
+            query, limit=SEARCH_LIMIT - len(products), exclude=[p.id for p in products]
+        )
+        if similar:
+            fuzzy = Product.objects.filter(id__in=[pk for pk, _ in similar]).select_related(
+                'category'
+            ).prefetch_related('images').in_bulk()
+            products.extend(fuzzy[pk] for pk, _ in similar if pk in fuzzy)
     
     serializer = ProductListSerializer(products, many=True)
-    return Response({'results': serializer.data})
+    results = serializer.data
+    record_search(query, len(results), (time.perf_counter() - started) * 1000)
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def search_analytics(request):
+    """
+    Search analytics for admins: top queries, top zero-result queries and
+    latency percentiles over the last ``days`` days (default 30)
+    """
+    try:
+        days = int(request.GET.get('days', 30))
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return Response({'error': 'days and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= MAX_REPORT_DAYS or not 1 <= limit <= MAX_REPORT_LIMIT:
+        return Response(
+            {'error': f'days must be 1-{MAX_REPORT_DAYS} and limit 1-{MAX_REPORT_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    
+    since = timezone.now() - timedelta(days=days)
+    return Response(search_report(since, limit=limit))
 
 
 @api_view(['GET'])
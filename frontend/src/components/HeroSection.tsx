@@ -1,20 +1,9 @@
-import axios from "axios";
 import { ArrowRight, Play } from "lucide-react";
-import { useEffect, useMemo, useState } from "react";
 import "swiper/css";
 import "swiper/css/effect-fade";
 import { Autoplay, EffectFade } from "swiper/modules";
 import { Swiper, SwiperSlide } from "swiper/react";
-
-type Slide = {
-  id: string;
-  title: string;
-  subtitle: string;
-  button_text: string;
-  button_link: string;
-  image: string;      // absolute URL from backend
-  sort_order: number;
-};
+import { useApp } from "../contexts/AppContext";
 
 const FALLBACK_IMAGES = [
   "/images/banner (1).jpg",
@@ -25,28 +14,9 @@ const FALLBACK_IMAGES = [
 ];
 
 const HeroSection = () => {
-  const backendUrl = import.meta.env.VITE_BACKEND_URL || "https://arun.yougletech.com/";
-  const [slides, setSlides] = useState<Slide[] | null>(null);
-
-  const LIST_URL = `${backendUrl}api/hero-slides/`;
-
-  const fetchSlides = useMemo(
-    () => async () => {
-      try {
-        const res = await axios.get(LIST_URL);
-        const data: Slide[] = Array.isArray(res.data) ? res.data : (res.data?.results ?? []);
-        setSlides(data);
-      } catch (e) {
-        console.error("Failed to load hero slides, using fallbacks.", e);
-        setSlides([]); // force fallback
-      }
-    },
-    []
-  );
-
-  useEffect(() => {
-    fetchSlides();
-  }, [fetchSlides]);
+  // Slides arrive with the rest of the home page via /api/home/
+  const { state } = useApp();
+  const slides = state.heroSlides;
 
   const hasSlides = slides && slides.length > 0;
 
@@ -1,13 +1,15 @@
 import React, { createContext, useContext, useReducer, useEffect } from 'react';
 import type { ReactNode } from 'react';
-import type { Category, Product, FilterOptions, DashboardStats } from '../types';
+import type { BlogPost, Category, Product, FilterOptions, DashboardStats, HeroSlide, HomeData } from '../types';
 import { apiService } from '../services/api';
 
 // State interface
 interface AppState {
+  heroSlides: HeroSlide[];
   categories: Category[];
   featuredProducts: Product[];
   latestProducts: Product[];
+  latestBlogPosts: BlogPost[];
   filterOptions: FilterOptions | null;
   dashboardStats: DashboardStats | null;
   loading: {
@@ -33,14 +35,17 @@ type AppAction =
   | { type: 'SET_CATEGORIES'; payload: Category[] }
   | { type: 'SET_FEATURED_PRODUCTS'; payload: Product[] }
   | { type: 'SET_LATEST_PRODUCTS'; payload: Product[] }
+  | { type: 'SET_HOME'; payload: HomeData }
   | { type: 'SET_FILTER_OPTIONS'; payload: FilterOptions }
   | { type: 'SET_DASHBOARD_STATS'; payload: DashboardStats };
 
 // Initial state
 const initialState: AppState = {
+  heroSlides: [],
   categories: [],
   featuredProducts: [],
   latestProducts: [],
+  latestBlogPosts: [],
   filterOptions: null,
   dashboardStats: null,
   loading: {
@@ -84,6 +89,15 @@ function appReducer(state: AppState, action: AppAction): AppState {
       return { ...state, featuredProducts: action.payload };
     case 'SET_LATEST_PRODUCTS':
       return { ...state, latestProducts: action.payload };
+    case 'SET_HOME':
+      return {
+        ...state,
+        heroSlides: action.payload.hero_slides,
+        categories: action.payload.categories,
+        featuredProducts: action.payload.featured_products,
+        latestProducts: action.payload.latest_products,
+        latestBlogPosts: action.payload.latest_blog_posts,
+      };
     case 'SET_FILTER_OPTIONS':
       return { ...state, filterOptions: action.payload };
     case 'SET_DASHBOARD_STATS':
@@ -97,6 +111,7 @@ function appReducer(state: AppState, action: AppAction): AppState {
 interface AppContextType {
   state: AppState;
   actions: {
+    loadHome: () => Promise<void>;
     loadCategories: () => Promise<void>;
     loadFeaturedProducts: () => Promise<void>;
     loadLatestProducts: () => Promise<void>;
@@ -135,6 +150,26 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   };
 
   // Actions
+  const homeKeys: Array<keyof AppState['loading']> = ['categories', 'featuredProducts', 'latestProducts'];
+
+  // One request for every home page section instead of one per section
+  const loadHome = async () => {
+    homeKeys.forEach((key) => {
+      dispatch({ type: 'SET_LOADING', payload: { key, loading: true } });
+      dispatch({ type: 'SET_ERROR', payload: { key, error: null } });
+    });
+
+    try {
+      const data = await apiService.getHome();
+      dispatch({ type: 'SET_HOME', payload: data });
+    } catch (error) {
+      const errorMessage = error instanceof Error ? error.message : 'An error occurred';
+      homeKeys.forEach((key) => dispatch({ type: 'SET_ERROR', payload: { key, error: errorMessage } }));
+    } finally {
+      homeKeys.forEach((key) => dispatch({ type: 'SET_LOADING', payload: { key, loading: false } }));
+    }
+  };
+
   const loadCategories = createAsyncAction(
     'categories',
     async () => {
@@ -170,9 +205,7 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
 
   const refreshData = async () => {
     await Promise.all([
-      loadCategories(),
-      loadFeaturedProducts(),
-      loadLatestProducts(),
+      loadHome(),
       loadFilterOptions(),
       loadDashboardStats(),
     ]);
@@ -186,6 +219,7 @@ export const AppProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   const contextValue: AppContextType = {
     state,
     actions: {
+      loadHome,
       loadCategories,
       loadFeaturedProducts,
       loadLatestProducts,
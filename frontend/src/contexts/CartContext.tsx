@@ -27,6 +27,7 @@ interface CartItem {
   wholesale_total_price: string;
   preferred_colors: string;
   special_instructions: string;
+  version: number;
   created_at: string;
   updated_at: string;
 }
@@ -37,10 +38,33 @@ interface Cart {
   total_items: number;
   total_amount: string;
   total_wholesale_amount: string;
+  version: number;
   created_at: string;
   updated_at: string;
 }
 
+// Returned by cart mutations when requested with `X-Cart-Response: delta`
+interface CartDelta {
+  id: string;
+  total_items: number;
+  total_amount: string;
+  total_wholesale_amount: string;
+  version: number;
+  updated_at: string;
+  item: CartItem | null;
+  removed_id: string | null;
+}
+
+// One operation of POST /cart/batch/; lines are addressed by item_id or product_id
+export interface CartOperation {
+  op: 'add' | 'update' | 'remove';
+  product_id?: string;
+  item_id?: string;
+  quantity?: number;
+  preferred_colors?: string;
+  special_instructions?: string;
+}
+
 interface CartSummary {
   items_count: number;
   subtotal: string;
@@ -64,6 +88,8 @@ interface CartState {
   cart: Cart | null;
   cartSummary: CartSummary | null;
   savedItems: SavedItem[];
+  // Set when a delta did not follow the cart we hold; the provider reloads it
+  cartStale: boolean;
   loading: {
     cart: boolean;
     addItem: boolean;
@@ -86,6 +112,7 @@ type CartAction =
   | { type: 'SET_LOADING'; payload: { key: keyof CartState['loading']; loading: boolean } }
   | { type: 'SET_ERROR'; payload: { key: keyof CartState['error']; error: string | null } }
   | { type: 'SET_CART'; payload: Cart | null }
+  | { type: 'APPLY_CART_DELTA'; payload: CartDelta }
   | { type: 'SET_CART_SUMMARY'; payload: CartSummary }
   | { type: 'SET_SAVED_ITEMS'; payload: SavedItem[] }
   | { type: 'CLEAR_CART' };
@@ -95,6 +122,7 @@ const initialState: CartState = {
   cart: null,
   cartSummary: null,
   savedItems: [],
+  cartStale: false,
   loading: {
     cart: false,
     addItem: false,
@@ -133,13 +161,28 @@ function cartReducer(state: CartState, action: CartAction): CartState {
         },
       };
     case 'SET_CART':
-      return { ...state, cart: action.payload };
+      return { ...state, cart: action.payload, cartStale: false };
+    case 'APPLY_CART_DELTA': {
+      // Checked against the current state, not the one a pending request
+      // started from: a version gap means another tab or device changed the
+      // cart in between, so mark it for a full reload instead of patching.
+      if (!state.cart || action.payload.version !== state.cart.version + 1) {
+        return { ...state, cartStale: true };
+      }
+      const { item, removed_id, ...totals } = action.payload;
+      let items = state.cart.items.filter((existing) => existing.id !== removed_id);
+      if (item) {
+        const index = items.findIndex((existing) => existing.id === item.id);
+        items = index === -1 ? [...items, item] : items.map((existing, i) => (i === index ? item : existing));
+      }
+      return { ...state, cart: { ...state.cart, ...totals, items } };
+    }
     case 'SET_CART_SUMMARY':
       return { ...state, cartSummary: action.payload };
     case 'SET_SAVED_ITEMS':
       return { ...state, savedItems: action.payload };
     case 'CLEAR_CART':
-      return { ...state, cart: null, cartSummary: null };
+      return { ...state, cart: null, cartSummary: null, cartStale: false };
     default:
       return state;
   }
@@ -148,6 +191,16 @@ function cartReducer(state: CartState, action: CartAction): CartState {
 // Cart Service
 const API_BASE_URL = import.meta.env.VITE_BACKEND_URL || 'https://arun.yougletech.com/api';
 
+// Thrown on 409: another tab or request changed the cart first. Carries the current cart.
+class CartConflictError extends Error {
+  cart: Cart;
+
+  constructor(message: string, cart: Cart) {
+    super(message);
+    this.cart = cart;
+  }
+}
+
 class CartService {
   private async request<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
     const url = `${API_BASE_URL}${endpoint}`;
@@ -163,6 +216,9 @@ const config: RequestInit = {
     const response = await fetch(url, config);
     const data = await response.json();
     
+    if (response.status === 409 && data.cart) {
+      throw new CartConflictError(data.error, data.cart);
+    }
     if (!response.ok) {
       throw new Error(data.error || data.message || 'An error occurred');
     }
@@ -176,10 +232,10 @@ const config: RequestInit = {
     });
   }
 
-  async addToCart(token: string, productId: string, quantity: number, preferredColors?: string, specialInstructions?: string): Promise<{ cart: Cart; message: string }> {
+  async addToCart(token: string, productId: string, quantity: number, preferredColors?: string, specialInstructions?: string): Promise<{ delta: CartDelta; message: string }> {
     return this.request('/cart/add_item/', {
       method: 'POST',
-      headers: { Authorization: `Bearer ${token}` },
+      headers: { Authorization: `Bearer ${token}`, 'X-Cart-Response': 'delta' },
       body: JSON.stringify({
         product_id: productId,
         quantity,
@@ -189,24 +245,25 @@ const config: RequestInit = {
     });
   }
 
-  async updateCartItem(token: string, itemId: string, quantity: number, preferredColors?: string, specialInstructions?: string): Promise<{ cart: Cart; message: string }> {
+  async updateCartItem(token: string, itemId: string, quantity: number, preferredColors?: string, specialInstructions?: string, version?: number): Promise<{ delta: CartDelta; message: string }> {
     return this.request('/cart/update_item/', {
       method: 'PUT',
-      headers: { Authorization: `Bearer ${token}` },
+      headers: { Authorization: `Bearer ${token}`, 'X-Cart-Response': 'delta' },
       body: JSON.stringify({
         item_id: itemId,
         quantity,
         preferred_colors: preferredColors,
         special_instructions: specialInstructions,
+        version,
       }),
     });
   }
 
-  async removeFromCart(token: string, itemId: string): Promise<{ cart: Cart; message: string }> {
+  async removeFromCart(token: string, itemId: string, version?: number): Promise<{ delta: CartDelta; message: string }> {
     return this.request('/cart/remove_item/', {
       method: 'DELETE',
-      headers: { Authorization: `Bearer ${token}` },
-      body: JSON.stringify({ item_id: itemId }),
+      headers: { Authorization: `Bearer ${token}`, 'X-Cart-Response': 'delta' },
+      body: JSON.stringify({ item_id: itemId, version }),
     });
   }
 
@@ -217,6 +274,14 @@ const config: RequestInit = {
     });
   }
 
+  async batchUpdateCart(token: string, operations: CartOperation[]): Promise<{ cart: Cart; message: string }> {
+    return this.request('/cart/batch/', {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${token}` },
+      body: JSON.stringify({ operations }),
+    });
+  }
+
   async saveForLater(token: string, itemId: string): Promise<{ message: string }> {
     return this.request('/cart/save_for_later/', {
       method: 'POST',
@@ -244,6 +309,14 @@ const config: RequestInit = {
     });
   }
 
+  async moveSavedItemsToCart(token: string, ids?: string[]): Promise<{ message: string; moved: number; skipped: { id: string; product_id: string; error: string }[] }> {
+    return this.request('/saved-items/move_all_to_cart/', {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${token}` },
+      body: JSON.stringify(ids ? { ids } : {}),
+    });
+  }
+
   async removeSavedItem(token: string, savedItemId: string): Promise<void> {
     return this.request(`/saved-items/${savedItemId}/`, {
       method: 'DELETE',
@@ -263,10 +336,12 @@ interface CartContextType {
     updateCartItem: (itemId: string, quantity: number, preferredColors?: string, specialInstructions?: string) => Promise<void>;
     removeFromCart: (itemId: string) => Promise<void>;
     clearCart: () => Promise<void>;
+    batchUpdateCart: (operations: CartOperation[]) => Promise<void>;
     saveForLater: (itemId: string) => Promise<void>;
     loadCartSummary: () => Promise<void>;
     loadSavedItems: () => Promise<void>;
     moveToCart: (savedItemId: string) => Promise<void>;
+    moveSavedItemsToCart: (ids?: string[]) => Promise<void>;
     removeSavedItem: (savedItemId: string) => Promise<void>;
   };
 }
@@ -321,6 +396,17 @@ const loadCart = createAsyncAction(
   }
 );
 
+  // Patch local state with a mutation delta; the reducer flags a stale cart
+  const applyCartDelta = (delta: CartDelta) => {
+    dispatch({ type: 'APPLY_CART_DELTA', payload: delta });
+  };
+
+  useEffect(() => {
+    if (state.cartStale) {
+      loadCart();
+    }
+  }, [state.cartStale]);
+
   const addToCart = async (productId: string, quantity: number, preferredColors?: string, specialInstructions?: string) => {
     if (!authState.isAuthenticated || !authState.tokens) {
       dispatch({ type: 'SET_ERROR', payload: { key: 'addItem', error: 'Not authenticated' } });
@@ -332,7 +418,7 @@ const loadCart = createAsyncAction(
     
     try {
       const response = await cartService.addToCart(authState.tokens.access, productId, quantity, preferredColors, specialInstructions);
-      dispatch({ type: 'SET_CART', payload: response.cart });
+      applyCartDelta(response.delta);
     } catch (error) {
       const errorMessage = error instanceof Error ? error.message : 'An error occurred';
       dispatch({ type: 'SET_ERROR', payload: { key: 'addItem', error: errorMessage } });
@@ -349,9 +435,14 @@ const loadCart = createAsyncAction(
     dispatch({ type: 'SET_ERROR', payload: { key: 'updateItem', error: null } });
     
     try {
-      const response = await cartService.updateCartItem(authState.tokens.access, itemId, quantity, preferredColors, specialInstructions);
-      dispatch({ type: 'SET_CART', payload: response.cart });
+      // Send the version we last saw so a change from another tab is not overwritten
+      const version = state.cart?.items.find((item) => item.id === itemId)?.version;
+      const response = await cartService.updateCartItem(authState.tokens.access, itemId, quantity, preferredColors, specialInstructions, version);
+      applyCartDelta(response.delta);
     } catch (error) {
+      if (error instanceof CartConflictError) {
+        dispatch({ type: 'SET_CART', payload: error.cart });
+      }
       const errorMessage = error instanceof Error ? error.message : 'An error occurred';
       dispatch({ type: 'SET_ERROR', payload: { key: 'updateItem', error: errorMessage } });
       throw error;
@@ -367,9 +458,13 @@ const loadCart = createAsyncAction(
     dispatch({ type: 'SET_ERROR', payload: { key: 'removeItem', error: null } });
     
     try {
-      const response = await cartService.removeFromCart(authState.tokens.access, itemId);
-      dispatch({ type: 'SET_CART', payload: response.cart });
+      const version = state.cart?.items.find((item) => item.id === itemId)?.version;
+      const response = await cartService.removeFromCart(authState.tokens.access, itemId, version);
+      applyCartDelta(response.delta);
     } catch (error) {
+      if (error instanceof CartConflictError) {
+        dispatch({ type: 'SET_CART', payload: error.cart });
+      }
       const errorMessage = error instanceof Error ? error.message : 'An error occurred';
       dispatch({ type: 'SET_ERROR', payload: { key: 'removeItem', error: errorMessage } });
       throw error;
@@ -389,6 +484,28 @@ const loadCart = createAsyncAction(
     }
   };
 
+  // Add, update or remove many lines in one all-or-nothing request
+  const batchUpdateCart = async (operations: CartOperation[]) => {
+    if (!authState.isAuthenticated || !authState.tokens) {
+      dispatch({ type: 'SET_ERROR', payload: { key: 'addItem', error: 'Not authenticated' } });
+      return;
+    }
+
+    dispatch({ type: 'SET_LOADING', payload: { key: 'addItem', loading: true } });
+    dispatch({ type: 'SET_ERROR', payload: { key: 'addItem', error: null } });
+
+    try {
+      const response = await cartService.batchUpdateCart(authState.tokens.access, operations);
+      dispatch({ type: 'SET_CART', payload: response.cart });
+    } catch (error) {
+      const errorMessage = error instanceof Error ? error.message : 'An error occurred';
+      dispatch({ type: 'SET_ERROR', payload: { key: 'addItem', error: errorMessage } });
+      throw error;
+    } finally {
+      dispatch({ type: 'SET_LOADING', payload: { key: 'addItem', loading: false } });
+    }
+  };
+
   const saveForLater = async (itemId: string) => {
     if (!authState.isAuthenticated || !authState.tokens) return;
 
@@ -425,6 +542,22 @@ const loadCart = createAsyncAction(
     }
   };
 
+  // Move the given saved items (or all of them) in one request
+  const moveSavedItemsToCart = async (ids?: string[]) => {
+    if (!authState.isAuthenticated || !authState.tokens) return;
+
+    try {
+      const response = await cartService.moveSavedItemsToCart(authState.tokens.access, ids);
+      if (response.skipped.length) {
+        dispatch({ type: 'SET_ERROR', payload: { key: 'savedItems', error: response.skipped[0].error } });
+      }
+      await loadCart();
+      await loadSavedItems();
+    } catch (error) {
+      console.error('Error moving saved items to cart:', error);
+    }
+  };
+
   const removeSavedItem = async (savedItemId: string) => {
     if (!authState.isAuthenticated || !authState.tokens) return;
 
@@ -455,10 +588,12 @@ useEffect(() => {
       updateCartItem,
       removeFromCart,
       clearCart,
+      batchUpdateCart,
       saveForLater,
       loadCartSummary,
       loadSavedItems,
       moveToCart,
+      moveSavedItemsToCart,
       removeSavedItem,
     },
   };
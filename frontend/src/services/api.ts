@@ -6,6 +6,7 @@ import type {
   CreateBlogPost,
   DashboardStats,
   FilterOptions,
+  HomeData,
   PaginatedResponse,
   Product,
   ProductDetail,
@@ -46,6 +47,11 @@ class ApiService {
     }
   }
 
+  // Home API - every landing page section in one round trip
+  async getHome(): Promise<HomeData> {
+    return this.request<HomeData>('/home/');
+  }
+
   // Categories API
   async getCategories(): Promise<PaginatedResponse<Category>> {
     return this.request<PaginatedResponse<Category>>('/categories/');
@@ -169,3 +169,23 @@ export interface CreateBlogPost {
 export interface UpdateBlogPost extends Partial<CreateBlogPost> {
   id: string;
 }
+
+// Home page (single aggregated request)
+export interface HeroSlide {
+  id: string;
+  title: string;
+  subtitle: string;
+  button_text: string;
+  button_link: string;
+  image: string;
+  sort_order: number;
+}
+
+export interface HomeData {
+  hero_slides: HeroSlide[];
+  categories: Category[];
+  featured_products: Product[];
+  latest_products: Product[];
+  latest_blog_posts: BlogPost[];
+  versions: Record<string, string>;
+}